@@ -0,0 +1,408 @@
+"""
+Inference backends for ai_model, selected with AI_BACKEND.
+
+Every backend exposes create_chat_completion() with llama-cpp-python's
+signature and response shape (OpenAI-style dicts, `stream=True` yields
+chunks), so ai_model does not care which one is loaded:
+
+- llama: llama.cpp through llama-cpp-python and a GGUF file (AI_MODEL_PATH).
+  llama_cpp is imported only when this backend is created. Threads and
+  context size come from LLAMA_* settings (settings.LlamaSettings); unset ones
+  are tuned at load: n_threads = physical cores, n_threads_batch = usable
+  CPUs (affinity and cgroup quota), n_ctx = the longest prompt the app sends
+  (ai_model.worst_case_prompts, counted with the model's tokenizer) plus
+  its max_tokens. benchmarks/llama_calibrate.py measures the alternatives.
+- stub: no model. Replies after AI_STUB_FIRST_TOKEN_MS plus one token every
+  1/AI_STUB_TOKENS_PER_SECOND seconds, at most AI_STUB_CONCURRENCY requests
+  at a time (like one model instance), with text derived only from the prompt
+  - the same prompt always gets the same reply. For load tests and CI boxes
+  without a model file.
+- remote: the shared inference service (ai_service.py) at AI_SERVICE_URL,
+  http://host:port or unix:///path/to.sock, so N API workers share one
+  model instead of loading N copies. One pooled keep-alive httpx client per
+  process, connect/read timeouts, and a circuit breaker: after
+  AI_SERVICE_FAILURE_THRESHOLD consecutive failures calls fail fast (the
+  routers fall back to rule-based text) until a /health probe succeeds,
+  at most every AI_SERVICE_RETRY_SECONDS.
+"""
+import hashlib
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+AI_BACKEND = os.getenv("AI_BACKEND", "llama").lower()  # llama | stub | remote
+AI_MODEL_PATH = os.getenv("AI_MODEL_PATH", r"C:\BinaryGame\BinaryGameBackEnd\model\gemma-2-2b-it-Q4_K_M.gguf")
+
+AI_STUB_FIRST_TOKEN_MS = float(os.getenv("AI_STUB_FIRST_TOKEN_MS", "150"))
+AI_STUB_TOKENS_PER_SECOND = float(os.getenv("AI_STUB_TOKENS_PER_SECOND", "40"))
+AI_STUB_CONCURRENCY = int(os.getenv("AI_STUB_CONCURRENCY", "1"))
+AI_STUB_REPLY_TOKENS = int(os.getenv("AI_STUB_REPLY_TOKENS", "30"))
+
+AI_SERVICE_URL = os.getenv("AI_SERVICE_URL", "http://127.0.0.1:8100")
+AI_SERVICE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("AI_SERVICE_CONNECT_TIMEOUT_SECONDS", "1"))
+AI_SERVICE_TIMEOUT_SECONDS = float(os.getenv("AI_SERVICE_TIMEOUT_SECONDS", "30"))
+AI_SERVICE_MAX_CONNECTIONS = int(os.getenv("AI_SERVICE_MAX_CONNECTIONS", "8"))
+AI_SERVICE_FAILURE_THRESHOLD = int(os.getenv("AI_SERVICE_FAILURE_THRESHOLD", "3"))
+AI_SERVICE_RETRY_SECONDS = float(os.getenv("AI_SERVICE_RETRY_SECONDS", "10"))
+
+# set by ai_service on completions: seconds the request waited for the model
+QUEUE_WAIT_HEADER = "X-Queue-Wait-Seconds"
+# n_ctx slack over the counted prompt + reply: BOS/EOS and turn markers when the
+# model has no chat template to count them with, tokenizer differences otherwise
+CHAT_TEMPLATE_HEADROOM_TOKENS = 32
+
+STUB_PHRASES = ("my tail tells me", "I feel it in my whiskers", "my paws are sure")
+STUB_FILLER = (
+    "this", "cell", "fits", "the", "rules", "because", "no", "three", "in", "a", "row",
+    "and", "the", "counts", "stay", "even", "so", "try", "it", "now",
+)
+
+
+def _cgroup_cpu_limit() -> float | None:
+    """CPUs allowed by the cgroup v2 quota (containers), None if unlimited."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        return None
+    return None if quota == "max" else int(quota) / int(period)
+
+
+def cpu_topology() -> tuple[int, int]:
+    """(physical cores, logical CPUs) this process may actually use."""
+    logical = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        logical = max(1, min(logical, math.ceil(limit)))
+    cores = set()
+    try:
+        with open("/proc/cpuinfo") as f:
+            physical_id = core_id = None
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    core_id = value.strip()
+                elif not key and core_id is not None:
+                    cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+            if core_id is not None:
+                cores.add((physical_id, core_id))
+    except OSError:
+        pass
+    if cores and os.cpu_count():
+        # SMT siblings share a core: scale the usable CPUs by cores / hardware threads
+        physical = round(logical * len(cores) / os.cpu_count())
+    else:
+        physical = logical
+    return max(1, min(physical, logical)), logical
+
+
+def context_size(prompts: list[tuple[str, int]], count_tokens, step: int = 256,
+                 headroom: int = CHAT_TEMPLATE_HEADROOM_TOKENS) -> int:
+    """Smallest multiple of step that fits every (prompt, max_tokens) pair plus headroom."""
+    needed = max(count_tokens(prompt) + max_tokens for prompt, max_tokens in prompts) + headroom
+    return max(step, math.ceil(needed / step) * step)
+
+
+def llama_options(model_path: str, settings=None) -> dict:
+    """Llama() keyword arguments: LLAMA_* settings, with unset values tuned to this host and the app's prompts."""
+    from settings import get_llama_settings
+
+    settings = settings or get_llama_settings()
+    physical, logical = cpu_topology()
+    n_ctx = settings.n_ctx
+    if n_ctx is None:
+        from ai_model import worst_case_prompts
+
+        n_ctx = context_size(worst_case_prompts(), vocab_token_counter(model_path), settings.n_ctx_step)
+    return {
+        "n_ctx": n_ctx,
+        "n_batch": min(settings.n_batch, n_ctx),
+        # generation is memory-bound: SMT siblings only add contention
+        "n_threads": settings.n_threads or physical,
+        # prompt processing is compute-bound: every usable CPU helps
+        "n_threads_batch": settings.n_threads_batch or logical,
+        "n_gpu_layers": settings.n_gpu_layers,
+        "use_mmap": settings.use_mmap,
+        "use_mlock": settings.use_mlock,
+    }
+
+
+def vocab_token_counter(model_path: str):
+    """Token counter using only the model's vocabulary (loads in milliseconds, no weights).
+
+    Counts the prompt as create_chat_completion() feeds it to the model: a user
+    message wrapped in the GGUF chat template (turn markers, BOS), when the
+    model ships one.
+    """
+    from llama_cpp import Llama
+
+    vocab = Llama(model_path=model_path, vocab_only=True, verbose=False)
+    template = vocab.metadata.get("tokenizer.chat_template")
+    if not template:
+        return lambda text: len(vocab.tokenize(text.encode("utf-8")))
+
+    from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+
+    def token_text(token: int) -> str:
+        return vocab._model.token_get_text(token) if token != -1 else ""
+
+    formatter = Jinja2ChatFormatter(template=template, eos_token=token_text(vocab.token_eos()),
+                                    bos_token=token_text(vocab.token_bos()))
+
+    def count(text: str) -> int:
+        prompt = formatter(messages=[{"role": "user", "content": text}]).prompt
+        return len(vocab.tokenize(prompt.encode("utf-8"), add_bos=True, special=True))
+
+    return count
+
+
+class LlamaCppBackend:
+    name = "llama"
+
+    def __init__(self, model_path: str = AI_MODEL_PATH, options: dict | None = None):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"Model not found at {model_path}. "
+                f"Download it from: https://huggingface.co/bartowski/gemma-2-2b-it-GGUF"
+            )
+        from llama_cpp import Llama
+
+        self.options = options or llama_options(model_path)
+        start = time.perf_counter()
+        self._llm = Llama(model_path=model_path, verbose=False, **self.options)
+        self.load_seconds = time.perf_counter() - start
+        # a llama.cpp context is not thread-safe: one generation at a time
+        self._lock = threading.Lock()
+        logger.info(f"Llama model loaded in {self.load_seconds:.1f}s", extra=self.options)
+
+    def create_chat_completion(self, messages: list[dict], queue_wait=None, **options):
+        """queue_wait(seconds), if given, is called with the time spent waiting for the model."""
+        submitted = time.perf_counter()
+        with self._lock:
+            if queue_wait is not None:
+                queue_wait(time.perf_counter() - submitted)
+            return self._llm.create_chat_completion(messages=messages, **options)
+
+    def info(self) -> dict:
+        return {"load_seconds": round(self.load_seconds, 3), **self.options}
+
+
+class StubBackend:
+    name = "stub"
+
+    def __init__(self, first_token_ms: float = AI_STUB_FIRST_TOKEN_MS,
+                 tokens_per_second: float = AI_STUB_TOKENS_PER_SECOND,
+                 concurrency: int = AI_STUB_CONCURRENCY, reply_tokens: int = AI_STUB_REPLY_TOKENS):
+        self.first_token_seconds = first_token_ms / 1000
+        self.token_seconds = 1 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.reply_tokens = reply_tokens
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+
+    def reply(self, prompt: str, max_tokens: int) -> list[str]:
+        """Deterministic reply tokens for the prompt."""
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        # answer with the first suggested move, if the prompt lists any
+        move = re.search(r"^- (Row \d+, Column \S+: Put \d)", prompt, re.MULTILINE)
+        words = f"{rng.choice(STUB_PHRASES)}:".split()
+        words += (move.group(1) if move else "put 0 in the first empty cell").split()
+        while len(words) < self.reply_tokens:
+            words.append(rng.choice(STUB_FILLER))
+        words = words[:max(1, min(max_tokens, self.reply_tokens))]
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _tokens(self, tokens: list[str], queue_wait=None):
+        submitted = time.perf_counter()
+        with self._slots:
+            if queue_wait is not None:
+                queue_wait(time.perf_counter() - submitted)
+            time.sleep(self.first_token_seconds)
+            for token in tokens:
+                time.sleep(self.token_seconds)
+                yield token
+
+    def create_chat_completion(self, messages: list[dict], max_tokens: int = 256, stream: bool = False,
+                               queue_wait=None, **options):
+        prompt = "\n".join(message["content"] for message in messages)
+        tokens = self.reply(prompt, max_tokens)
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens),
+                 "total_tokens": len(prompt.split()) + len(tokens)}
+        if stream:
+            return self._stream(tokens, queue_wait)
+        text = "".join(self._tokens(tokens, queue_wait))
+        return {
+            "object": "chat.completion",
+            "model": "stub",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    def _stream(self, tokens: list[str], queue_wait=None):
+        for token in self._tokens(tokens, queue_wait):
+            yield {
+                "object": "chat.completion.chunk",
+                "model": "stub",
+                "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+            }
+        yield {"object": "chat.completion.chunk", "model": "stub",
+               "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half-open after
+    `retry_seconds` (one probe decides) -> closed or open again."""
+
+    def __init__(self, threshold: int = AI_SERVICE_FAILURE_THRESHOLD, retry_seconds: float = AI_SERVICE_RETRY_SECONDS):
+        self.threshold = max(1, threshold)
+        self.retry_seconds = retry_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.retry_seconds else "open"
+
+    def try_probe(self) -> bool:
+        """In half-open state, True for exactly one caller, which must then record the outcome."""
+        with self._lock:
+            if self.state != "half_open":
+                return False
+            # the next probe waits another retry_seconds
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    self.times_opened += 1
+                self.opened_at = time.monotonic()
+
+
+class RemoteBackend:
+    name = "remote"
+
+    def __init__(self, url: str = AI_SERVICE_URL, client=None, breaker: CircuitBreaker | None = None):
+        import httpx
+
+        self.url = url
+        self.breaker = breaker or CircuitBreaker()
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_error: str | None = None
+        self._stats_lock = threading.Lock()
+        if client is not None:
+            self._client = client
+            return
+        transport = None
+        base_url = url
+        if url.startswith("unix://"):
+            transport = httpx.HTTPTransport(uds=url[len("unix://"):])
+            base_url = "http://ai-service"
+        self._client = httpx.Client(
+            base_url=base_url,
+            transport=transport,
+            timeout=httpx.Timeout(AI_SERVICE_TIMEOUT_SECONDS, connect=AI_SERVICE_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=AI_SERVICE_MAX_CONNECTIONS,
+                                max_keepalive_connections=AI_SERVICE_MAX_CONNECTIONS),
+        )
+
+    def health(self) -> dict | None:
+        """The service's /health body, None if it is down or not ready."""
+        import httpx
+
+        try:
+            response = self._client.get("/health", timeout=AI_SERVICE_CONNECT_TIMEOUT_SECONDS)
+        except httpx.HTTPError:
+            return None
+        return response.json() if response.status_code == 200 else None
+
+    def _count(self, field: str) -> None:
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _fail(self, error: str) -> RuntimeError:
+        self._count("failures")
+        self.last_error = error
+        self.breaker.record_failure()
+        return RuntimeError(f"AI service: {error}")
+
+    def create_chat_completion(self, messages: list[dict], stream: bool = False, queue_wait=None, **options):
+        """queue_wait(seconds) gets the time the service kept the request waiting for its model."""
+        import httpx
+
+        if stream:
+            raise ValueError("The remote backend does not stream")
+        if self.breaker.state != "closed":
+            if not self.breaker.try_probe():
+                self._count("rejected")
+                raise RuntimeError("AI service circuit open")
+            if self.health() is None:
+                raise self._fail("health check failed")
+            # the service is up: close the circuit even if this call is then
+            # turned away as busy (503), which records neither outcome
+            self.breaker.record_success()
+        self._count("requests")
+        try:
+            response = self._client.post("/v1/chat/completions", json={"messages": messages, **options})
+        except httpx.HTTPError as e:
+            raise self._fail(repr(e))
+        if response.status_code == 503:
+            # busy, not broken: no fallback storm from tripping the breaker on load
+            self._count("rejected")
+            raise RuntimeError("AI service busy")
+        if response.status_code != 200:
+            raise self._fail(f"HTTP {response.status_code}")
+        self.breaker.record_success()
+        if queue_wait is not None and QUEUE_WAIT_HEADER in response.headers:
+            queue_wait(float(response.headers[QUEUE_WAIT_HEADER]))
+        return response.json()
+
+    def info(self) -> dict:
+        return {
+            "backend": self.name,
+            "url": self.url,
+            "circuit_state": self.breaker.state,
+            "circuit_open": int(self.breaker.state != "closed"),
+            "circuit_opened_total": self.breaker.times_opened,
+            "consecutive_failures": self.breaker.failures,
+            "requests": self.requests,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+BACKENDS = {
+    LlamaCppBackend.name: LlamaCppBackend,
+    StubBackend.name: StubBackend,
+    RemoteBackend.name: RemoteBackend,
+}
+
+
+def create_backend(name: str = AI_BACKEND):
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown AI_BACKEND {name!r}, expected one of: {', '.join(BACKENDS)}")
+    return backend()
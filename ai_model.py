@@ -1,58 +1,82 @@
-from llama_cpp import Llama
 import json
-import os
+import logging
 import random
+import threading
+import time
+
+from ai_backends import AI_BACKEND, create_backend
+from metrics import AI_GENERATION_SECONDS, AI_QUEUE_WAIT_SECONDS, AI_TOKENS
+from logging_config import debug_sampled
+
+logger = logging.getLogger(__name__)
+
+HINT_MAX_TOKENS = 100
+ERROR_FEEDBACK_MAX_TOKENS = 500
+# the prompts carry at most this many moves / errors, which bounds their length
+AI_PROMPT_MAX_HINTS = 3
+AI_PROMPT_MAX_ERRORS = 5
+# client-sent error descriptions are cut to this many ASCII characters (at most
+# one token each), so worst_case_prompts() bounds them too
+AI_PROMPT_MAX_ERROR_CHARS = 100
+# largest board the prompts are sized for (n_ctx, see ai_backends.context_size)
+AI_PROMPT_MAX_BOARD = 10
 
 # Singleton instance of the model
 _llm = None
+_llm_lock = threading.Lock()
 
 def get_llm():
-    """Initialize and return the LLM instance (singleton)."""
+    """Initialize and return the inference backend (singleton, see ai_backends)."""
     global _llm
     if _llm is None:
-        model_path = os.getenv(
-            "AI_MODEL_PATH",
-            r"C:\BinaryGame\BinaryGameBackEnd\model\gemma-2-2b-it-Q4_K_M.gguf",
-        )
-        
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(
-                f"Model not found at {model_path}. "
-                f"Download it from: https://huggingface.co/bartowski/gemma-2-2b-it-GGUF"
-            )
-        
-        _llm = Llama(
-            model_path=model_path,
-            n_ctx=2048,  # Context window
-            n_threads=4,  # CPU threads
-            n_gpu_layers=0,  # Set to 0 for CPU only, increase for GPU
-            verbose=False
-        )
+        with _llm_lock:
+            if _llm is None:
+                _llm = create_backend()
     return _llm
 
 
-def generate_hint_text(grid: str, hints: list[dict]) -> str:
-    """
-    Generate natural language hint using local AI model.
-    
-    Args:
-        grid: JSON string of the current puzzle state
-        hints: List of possible moves from get_possible_moves()
-    
-    Returns:
-        Natural language hint text
-    """
-    
+def backend_info() -> dict:
+    """Which backend serves the model, and its own stats (circuit breaker for remote)."""
+    llm = _llm
+    if llm is None:
+        return {"backend": AI_BACKEND, "loaded": False}
+    info = llm.info() if hasattr(llm, "info") else {}
+    return {"backend": llm.name, "loaded": True, **info}
+
+
+def _chat_completion(kind: str, prompt: str, **options) -> dict:
+    """create_chat_completion() on the shared model, recording queue wait, time and tokens."""
+    llm = get_llm()
+    waited = [0.0]
+
+    def queue_wait(seconds: float) -> None:
+        waited[0] = seconds
+        AI_QUEUE_WAIT_SECONDS.observe(seconds, kind=kind)
+
+    start = time.perf_counter()
+    response = llm.create_chat_completion(
+        messages=[
+            {"role": "user", "content": prompt}
+        ],
+        queue_wait=queue_wait,
+        **options
+    )
+    AI_GENERATION_SECONDS.observe(time.perf_counter() - start - waited[0], kind=kind)
+    AI_TOKENS.inc(response.get("usage", {}).get("completion_tokens", 0), kind=kind)
+    return response
+
+
+def hint_prompt(grid: str, hints: list[dict]) -> str:
     # Format hints for the prompt
     hints_text = "\n".join([
         f"- Row {h['row']+1}, Column {h['col']}: Put {h['value']} ({h['reason']})"
-        for h in hints  # Use top 3 hints
+        for h in hints[:AI_PROMPT_MAX_HINTS]  # Use top 3 hints
     ])
 
-    print("Formatted hints for prompt:")
-    print(hints_text)
+    if debug_sampled(logger):
+        logger.debug("Formatted hints for prompt", extra={"hints": hints_text})
     
-    prompt = f"""You are a helpful assistant for a binary puzzle game. You are a raccoon named Bystrzacha Brightpaw, but your reply must be plain text only (no markdown, no asterisks, no quotes, no bullets).
+    return f"""You are a helpful assistant for a binary puzzle game. You are a raccoon named Bystrzacha Brightpaw, but your reply must be plain text only (no markdown, no asterisks, no quotes, no bullets).
     
 
 Rules of the game:
@@ -82,13 +106,23 @@ If possible next moves is empty, still provide one concrete suggestion based on
 
 Give ONE short hint (1-2 sentences). Focus on ONLY ONE move."""
 
-    llm = get_llm()
-    response = llm.create_chat_completion(
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
+
+def generate_hint_text(grid: str, hints: list[dict]) -> str:
+    """
+    Generate natural language hint using local AI model.
+    
+    Args:
+        grid: JSON string of the current puzzle state
+        hints: List of possible moves from get_possible_moves()
+    
+    Returns:
+        Natural language hint text
+    """
+    response = _chat_completion(
+        "hint",
+        hint_prompt(grid, hints),
         temperature=0.9,
-        max_tokens=100,
+        max_tokens=HINT_MAX_TOKENS,
         stop=["\n\n"]  # Stop at double newline
     )
     
@@ -98,23 +132,11 @@ Give ONE short hint (1-2 sentences). Focus on ONLY ONE move."""
     return hint
 
 
-def generate_error_feedback(grid: str, errors: list) -> str:
-    """
-    Generate friendly error feedback using local AI model.
-    
-    Args:
-        grid: JSON string of the current puzzle state
-        errors: List of error objects (flexible format)
-    
-    Returns:
-        Natural language feedback about the errors
-    """
-    if not errors:
-        return "Great! No errors detected in this move."
-    
-    # Format errors for the prompt - handle flexible error format
+def error_feedback_prompt(grid: str, errors: list) -> str:
+    # Format errors for the prompt - handle flexible error format.
+    # Pick the (at most 5) errors first: the list comes from the client, unbounded
     errors_text_list = []
-    for error in errors:
+    for error in random.sample(errors, min(len(errors), AI_PROMPT_MAX_ERRORS)):
         if isinstance(error, dict):
             # Try to build readable error description from whatever fields exist
             if 'row' in error and 'col' in error:
@@ -124,18 +146,17 @@ def generate_error_feedback(grid: str, errors: list) -> str:
             else:
                 # Fallback: just stringify the error
                 error_desc = str(error)
-            errors_text_list.append(f"- {error_desc}")
         else:
-            errors_text_list.append(f"- {str(error)}")
-    
-    random.shuffle(errors_text_list)
+            error_desc = str(error)
+        error_desc = error_desc[:AI_PROMPT_MAX_ERROR_CHARS].encode("ascii", "replace").decode("ascii")
+        errors_text_list.append(f"- {error_desc}")
 
-    errors_text = "\n".join(errors_text_list)  # Limit to 5 errors
+    errors_text = "\n".join(errors_text_list)
 
-    print("Formatted errors for prompt:")
-    print(errors_text)
+    if debug_sampled(logger):
+        logger.debug("Formatted errors for prompt", extra={"errors": errors_text})
     
-    prompt = f"""You are a friendly assistant for a binary puzzle game. You are a raccoon named Bystrzacha Brightpaw, but your reply must be plain text only (no markdown, no asterisks, no quotes, no bullets).
+    return f"""You are a friendly assistant for a binary puzzle game. You are a raccoon named Bystrzacha Brightpaw, but your reply must be plain text only (no markdown, no asterisks, no quotes, no bullets).
 
 Rules of the game:
 
@@ -158,13 +179,41 @@ Keep it simple and calm. No jokes, no emojis, no extra styling.
 Always state at least one concrete mistake and which rule it breaks. Do not leave the answer blank.
 Give a SHORT explanation (1-2 sentences max). Don't give solutions, just explain the problem."""
 
-    llm = get_llm()
-    response = llm.create_chat_completion(
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
+
+def worst_case_prompts() -> list[tuple[str, int]]:
+    """(prompt, max_tokens) for the longest prompts the app sends: the largest board, all of it empty,
+    and error descriptions at their length cap."""
+    size = AI_PROMPT_MAX_BOARD
+    grid = json.dumps([[None] * size for _ in range(size)])
+    hints = [{"row": size - 1, "col": chr(64 + size), "value": 1,
+              "reason": f"Column {size} already has {size // 2} zeros, remaining cells must be 1s"}]
+    # scattered printable characters: close to one token each, unlike real words
+    errors = ["".join(chr(33 + i * 37 % 94) for i in range(AI_PROMPT_MAX_ERROR_CHARS))]
+    return [
+        (hint_prompt(grid, hints * AI_PROMPT_MAX_HINTS), HINT_MAX_TOKENS),
+        (error_feedback_prompt(grid, errors * AI_PROMPT_MAX_ERRORS), ERROR_FEEDBACK_MAX_TOKENS),
+    ]
+
+
+def generate_error_feedback(grid: str, errors: list) -> str:
+    """
+    Generate friendly error feedback using local AI model.
+    
+    Args:
+        grid: JSON string of the current puzzle state
+        errors: List of error objects (flexible format)
+    
+    Returns:
+        Natural language feedback about the errors
+    """
+    if not errors:
+        return "Great! No errors detected in this move."
+
+    response = _chat_completion(
+        "error_feedback",
+        error_feedback_prompt(grid, errors),
         temperature=0.8,
-        max_tokens=500,
+        max_tokens=ERROR_FEEDBACK_MAX_TOKENS,
         stop=["\n\n"]
     )
     
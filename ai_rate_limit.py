@@ -0,0 +1,208 @@
+"""
+Token-bucket rate limits for the AI endpoints.
+
+Every model call takes one token from two buckets: the caller's (user id, or
+client IP for anonymous calls; AI_USER_RATE_PER_MINUTE, burst AI_USER_BURST)
+and the global one sized to what the model can serve
+(AI_GLOBAL_RATE_PER_MINUTE, burst AI_GLOBAL_BURST). Both are taken or
+neither, so a request refused by the global bucket does not cost the user.
+A refused request is not queued: routers.ai answers it with the rule-based
+text right away.
+
+Backends (AI_RATE_LIMIT_BACKEND):
+- "memory" (default) - per worker process; with N workers the effective
+                       limits are N times higher
+- "file"   - SQLite file shared by all workers on the host (AI_RATE_LIMIT_PATH);
+             if the file stays locked past AI_RATE_LIMIT_LOCK_TIMEOUT_SECONDS
+             the call is answered as throttled by the global bucket (the
+             rule-based degrade is cheap) and counted in store_errors
+- "off"    - no limits
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+AI_RATE_LIMIT_BACKEND = os.getenv("AI_RATE_LIMIT_BACKEND", "memory").lower()
+AI_RATE_LIMIT_PATH = os.getenv("AI_RATE_LIMIT_PATH", os.path.join("cache", "ai_rate_limit.sqlite3"))
+AI_USER_RATE_PER_MINUTE = float(os.getenv("AI_USER_RATE_PER_MINUTE", "6"))
+AI_USER_BURST = float(os.getenv("AI_USER_BURST", "3"))
+AI_GLOBAL_RATE_PER_MINUTE = float(os.getenv("AI_GLOBAL_RATE_PER_MINUTE", "60"))
+AI_GLOBAL_BURST = float(os.getenv("AI_GLOBAL_BURST", "5"))
+AI_RATE_LIMIT_MAX_KEYS = int(os.getenv("AI_RATE_LIMIT_MAX_KEYS", "100000"))
+AI_RATE_LIMIT_LOCK_TIMEOUT_SECONDS = float(os.getenv("AI_RATE_LIMIT_LOCK_TIMEOUT_SECONDS", "0.2"))
+
+GLOBAL_KEY = "global"
+
+
+def refill(tokens: float, updated_at: float, now: float, rate_per_second: float, burst: float) -> float:
+    return min(burst, tokens + max(0.0, now - updated_at) * rate_per_second)
+
+
+class NullRateLimiter:
+    name = "off"
+
+    def __init__(self, user_rate_per_minute: float = AI_USER_RATE_PER_MINUTE, user_burst: float = AI_USER_BURST,
+                 global_rate_per_minute: float = AI_GLOBAL_RATE_PER_MINUTE, global_burst: float = AI_GLOBAL_BURST):
+        self.limits = {
+            "user": (user_rate_per_minute / 60, user_burst),
+            "global": (global_rate_per_minute / 60, global_burst),
+        }
+        self._stats_lock = threading.Lock()
+        self.allowed = 0
+        self.throttled_user = 0
+        self.throttled_global = 0
+
+    def _take(self, buckets: list[tuple[str, float, float]], now: float) -> str | None:
+        """Takes a token from every (key, rate, burst) bucket, or from none; the scope that ran out."""
+        return None
+
+    def acquire(self, key: str) -> str | None:
+        """One model call for the caller's bucket key ("user:<id>" / "ip:<addr>", see
+        routers.ai.rate_limit_key). None: allowed; "user" / "global": the bucket that is empty."""
+        user_rate, user_burst = self.limits["user"]
+        global_rate, global_burst = self.limits["global"]
+        refused = self._take([(key, user_rate, user_burst), (GLOBAL_KEY, global_rate, global_burst)], time.time())
+        with self._stats_lock:
+            if refused is None:
+                self.allowed += 1
+            else:
+                setattr(self, f"throttled_{refused}", getattr(self, f"throttled_{refused}") + 1)
+        return refused
+
+    def info(self) -> dict:
+        user_rate, user_burst = self.limits["user"]
+        global_rate, global_burst = self.limits["global"]
+        with self._stats_lock:
+            return {
+                "backend": self.name,
+                "user_rate_per_minute": user_rate * 60,
+                "user_burst": user_burst,
+                "global_rate_per_minute": global_rate * 60,
+                "global_burst": global_burst,
+                "allowed": self.allowed,
+                "throttled_user": self.throttled_user,
+                "throttled_global": self.throttled_global,
+            }
+
+
+class MemoryRateLimiter(NullRateLimiter):
+    """Buckets in a bounded LRU dict; an evicted bucket was idle, i.e. full anyway."""
+    name = "memory"
+
+    def __init__(self, max_keys: int = AI_RATE_LIMIT_MAX_KEYS, **limits):
+        super().__init__(**limits)
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _take(self, buckets, now):
+        with self._lock:
+            levels = []
+            for key, rate, burst in buckets:
+                tokens, updated_at = self._buckets.get(key, (burst, now))
+                tokens = refill(tokens, updated_at, now, rate, burst)
+                if tokens < 1:
+                    return "global" if key == GLOBAL_KEY else "user"
+                levels.append((key, tokens))
+            for key, tokens in levels:
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return None
+
+    def info(self) -> dict:
+        return {**super().info(), "keys": len(self._buckets)}
+
+
+class FileRateLimiter(NullRateLimiter):
+    """SQLite file shared by all worker processes on one host."""
+    name = "file"
+
+    def __init__(self, path: str = AI_RATE_LIMIT_PATH, max_keys: int = AI_RATE_LIMIT_MAX_KEYS,
+                 lock_timeout: float = AI_RATE_LIMIT_LOCK_TIMEOUT_SECONDS, **limits):
+        super().__init__(**limits)
+        self.path = path
+        self.max_keys = max_keys
+        self.lock_timeout = lock_timeout
+        self.store_errors = 0
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS ai_rate_limit ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.lock_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _take(self, buckets, now):
+        try:
+            return self._take_locked(buckets, now)
+        except sqlite3.OperationalError:
+            # "database is locked" (another worker holds the write lock past the
+            # timeout) or a broken file: throttle instead of failing the request
+            # with a 500 or letting every call through to the model
+            with self._stats_lock:
+                self.store_errors += 1
+            return "global"
+
+    def _take_locked(self, buckets, now):
+        conn = self._conn()
+        try:
+            # IMMEDIATE: the read-modify-write of the buckets is atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            levels = []
+            for key, rate, burst in buckets:
+                row = conn.execute("SELECT tokens, updated_at FROM ai_rate_limit WHERE key = ?", (key,)).fetchone()
+                tokens = refill(*(row or (burst, now)), now, rate, burst)
+                if tokens < 1:
+                    conn.execute("ROLLBACK")
+                    return "global" if key == GLOBAL_KEY else "user"
+                levels.append((key, tokens - 1, now))
+            conn.executemany("INSERT OR REPLACE INTO ai_rate_limit (key, tokens, updated_at) VALUES (?, ?, ?)", levels)
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._prune(conn)
+        return None
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "DELETE FROM ai_rate_limit WHERE key IN ("
+            "SELECT key FROM ai_rate_limit ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_keys,)
+        )
+
+    def info(self) -> dict:
+        with self._stats_lock:
+            store_errors = self.store_errors
+        return {**super().info(), "store_errors": store_errors}
+
+
+def create_rate_limiter(backend: str = AI_RATE_LIMIT_BACKEND) -> NullRateLimiter:
+    if backend == "memory":
+        return MemoryRateLimiter()
+    if backend == "file":
+        return FileRateLimiter()
+    if backend in {"off", "none", "0", "false"}:
+        return NullRateLimiter()
+    raise ValueError(f"Unknown AI_RATE_LIMIT_BACKEND: {backend!r}")
+
+
+rate_limiter = create_rate_limiter()
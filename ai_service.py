@@ -0,0 +1,165 @@
+"""
+Standalone inference service: one model instance shared by every API worker.
+
+With `uvicorn main:app --workers N` and AI_BACKEND=llama each worker loads its
+own copy of the model (N x the RAM, N x 4 threads fighting over the cores).
+Instead, run this once per host and start the API with AI_BACKEND=remote:
+
+    python ai_service.py [--port 8100 | --uds /run/binarygame-ai.sock]
+    AI_BACKEND=remote AI_SERVICE_URL=http://127.0.0.1:8100 uvicorn main:app --workers 4
+    (or AI_SERVICE_URL=unix:///run/binarygame-ai.sock)
+
+The service starts listening right away and loads AI_SERVICE_BACKEND (llama,
+or stub for tests) in a background thread, then runs one generation at a time
+on it; up to AI_SERVICE_MAX_PENDING requests
+wait, anything beyond gets 503 right away, so the API falls back to rule-based
+text instead of queueing behind a long line.
+
+- POST /v1/chat/completions: the create_chat_completion() body of the backend,
+  with the time it waited for the model in X-Queue-Wait-Seconds
+- GET /health: 200 once the model is loaded, 503 while it loads (or if it failed to)
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+from fastapi import FastAPI, HTTPException, Response
+from pydantic import BaseModel
+
+from ai_backends import QUEUE_WAIT_HEADER, create_backend
+from logging_config import configure_logging
+
+AI_SERVICE_BACKEND = os.getenv("AI_SERVICE_BACKEND", "llama")
+AI_SERVICE_MAX_PENDING = int(os.getenv("AI_SERVICE_MAX_PENDING", "16"))
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+class ChatCompletionRequest(BaseModel):
+    messages: list[dict]
+    max_tokens: int = 256
+    temperature: float = 0.8
+    stop: list[str] | None = None
+
+
+class InferenceService:
+    def __init__(self, backend_name: str = AI_SERVICE_BACKEND, max_pending: int = AI_SERVICE_MAX_PENDING):
+        self.backend_name = backend_name
+        self.backend = None
+        # llama.cpp contexts are not thread-safe: one generation at a time
+        self._model_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(1 + max(0, max_pending))
+        self._stats_lock = threading.Lock()
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.load_seconds: float | None = None
+        self.load_error: str | None = None
+        self.loaded = threading.Event()
+
+    def load(self) -> None:
+        start = time.perf_counter()
+        try:
+            self.backend = create_backend(self.backend_name)
+        except Exception as e:
+            self.load_error = repr(e)
+            logger.exception(f"AI service: loading the {self.backend_name} backend failed")
+            return
+        finally:
+            self.loaded.set()
+        self.load_seconds = time.perf_counter() - start
+        logger.info(f"AI service: {self.backend_name} backend loaded in {self.load_seconds:.1f}s")
+
+    def start_loading(self) -> None:
+        """Loads the model in a background thread, so /health can answer 503 meanwhile."""
+        threading.Thread(target=self.load, name="ai-service-load", daemon=True).start()
+
+    def complete(self, request: ChatCompletionRequest) -> tuple[dict, float]:
+        """The completion, and the seconds it waited for the model."""
+        if self.backend is None:
+            raise HTTPException(status_code=503, detail="Model not loaded")
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise HTTPException(status_code=503, detail="Busy", headers={"Retry-After": "1"})
+        with self._stats_lock:
+            self.in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            with self._model_lock:
+                waited = time.perf_counter() - submitted
+                response = self.backend.create_chat_completion(**request.model_dump(exclude_none=True))
+            with self._stats_lock:
+                self.completed += 1
+            return response, waited
+        except Exception:
+            with self._stats_lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def info(self) -> dict:
+        with self._stats_lock:
+            return {
+                "status": "ok" if self.backend is not None else "failed" if self.load_error else "loading",
+                "load_error": self.load_error,
+                "backend": self.backend_name,
+                "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+                "in_flight": self.in_flight,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+
+service = InferenceService()
+
+app = FastAPI(title="Binary Game AI service", version="1.0.0")
+
+
+@app.on_event("startup")
+def load_model():
+    service.start_loading()
+
+
+@app.get("/health")
+def health():
+    """200 when the model is loaded and requests can be served."""
+    info = service.info()
+    if service.backend is None:
+        raise HTTPException(status_code=503, detail=info)
+    return info
+
+
+@app.post("/v1/chat/completions")
+def chat_completions(payload: ChatCompletionRequest, response: Response):
+    """One chat completion on the shared model (llama-cpp-python response shape)."""
+    completion, waited = service.complete(payload)
+    response.headers[QUEUE_WAIT_HEADER] = f"{waited:.6f}"
+    return completion
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serves one AI model to all API workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--uds", help="listen on this Unix socket instead of host:port")
+    args = parser.parse_args()
+
+    # a single process on purpose: the point is one model instance per host
+    uvicorn.run(app, host=args.host, port=args.port, uds=args.uds, workers=1, log_config=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,13 +9,18 @@ import sys
 import os
 sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
 
-from db import Base
-from models import User, Session, Puzzle, StoryPuzzle, DailyPuzzle, Solve, DailyRanking, AiHint
+from db import Base, db_settings
+from models import User, UserAvatar, Session, Puzzle, StoryPuzzle, DailyPuzzle, Solve, DailyRanking, AiHint, AiHintCounter
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
+# The app's DATABASE_URL (env / .env) wins over sqlalchemy.url from alembic.ini,
+# so migrations run against the same database as the API (SQL Server or SQLite).
+if os.getenv("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", db_settings.url.replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -52,6 +57,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
+        user_module_prefix="",
     )
 
     with context.begin_transaction():
@@ -73,7 +80,12 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things - use copy-and-move batch migrations
+            render_as_batch=connection.dialect.name == "sqlite",
+            # custom column types (models.types.GUID) are imported by script.py.mako
+            user_module_prefix="",
         )
 
         with context.begin_transaction():
@@ -0,0 +1,54 @@
+"""add indexes for hot query predicates
+
+Revision ID: 3f1c2a9b7d01
+Revises: 
+Create Date: 2026-10-19 09:12:44.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9b7d01'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) - must stay in sync with __table_args__ in models.models
+INDEXES = [
+    ("ix_sessions_token_expires_at", "sessions", ["token", "expires_at"]),
+    ("ix_story_puzzles_order_index", "story_puzzles", ["order_index"]),
+    ("ix_daily_puzzles_puzzle_id", "daily_puzzles", ["puzzle_id"]),
+    ("ix_solves_user_id_puzzle_id", "solves", ["user_id", "puzzle_id"]),
+    ("ix_solves_puzzle_id_completed", "solves", ["puzzle_id", "completed"]),
+    ("ix_solves_user_id_completed", "solves", ["user_id", "completed"]),
+    ("ix_ai_hints_user_id_puzzle_id", "ai_hints", ["user_id", "puzzle_id"]),
+]
+
+
+def _existing_indexes(table: str) -> set[str]:
+    if op.get_context().as_sql:
+        # offline (--sql) mode has no connection to inspect
+        return set()
+    inspector = sa.inspect(op.get_bind())
+    return {ix["name"] for ix in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tables are created with Base.metadata.create_all (create_db.py), which
+    # already emits these indexes on fresh databases - skip the ones present.
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,52 @@
+"""add denormalized stats counters
+
+Revision ID: 8c4d1e7f2a35
+Revises: 3f1c2a9b7d01
+Create Date: 2026-10-19 11:40:02.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from models.types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4d1e7f2a35'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a9b7d01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "users",
+        sa.Column("total_solves", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_table(
+        "ai_hint_counters",
+        sa.Column("user_id", GUID(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("puzzle_id", GUID(), sa.ForeignKey("puzzles.id"), primary_key=True),
+        sa.Column("hints_used", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+    # Backfill from the source tables (same numbers reconcile_counters.py computes)
+    op.execute(
+        "UPDATE users SET total_solves = ("
+        "SELECT COUNT(*) FROM solves "
+        "WHERE solves.user_id = users.id AND solves.completed = 1)"
+    )
+    op.execute(
+        "INSERT INTO ai_hint_counters (user_id, puzzle_id, hints_used) "
+        "SELECT user_id, puzzle_id, COUNT(*) FROM ai_hints "
+        "GROUP BY user_id, puzzle_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("ai_hint_counters")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("total_solves")
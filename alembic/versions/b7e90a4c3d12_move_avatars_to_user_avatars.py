@@ -0,0 +1,100 @@
+"""move avatars to user_avatars as decoded bytes
+
+Revision ID: b7e90a4c3d12
+Revises: 8c4d1e7f2a35
+Create Date: 2026-10-19 14:05:51.204477
+
+"""
+from typing import Sequence, Union
+import base64
+import binascii
+import hashlib
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+from models.types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e90a4c3d12'
+down_revision: Union[str, Sequence[str], None] = '8c4d1e7f2a35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+users = sa.table(
+    "users",
+    sa.column("id", GUID()),
+    sa.column("avatar", sa.Text()),
+    sa.column("avatar_hash", sa.String(64)),
+)
+user_avatars = sa.table(
+    "user_avatars",
+    sa.column("user_id", GUID()),
+    sa.column("content_type", sa.String(50)),
+    sa.column("data", sa.LargeBinary()),
+    sa.column("etag", sa.String(64)),
+    sa.column("updated_at", sa.DateTime()),
+)
+
+
+def _decode(data_url: str) -> tuple[str, bytes] | None:
+    header, _, b64 = data_url.strip().partition(",")
+    if not header.startswith("data:image/") or ";base64" not in header or not b64:
+        return None
+    try:
+        return header[len("data:"):].split(";", 1)[0], base64.b64decode(b64)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "user_avatars",
+        sa.Column("user_id", GUID(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("content_type", sa.String(50), nullable=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("etag", sa.String(64), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.add_column("users", sa.Column("avatar_hash", sa.String(64), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(users.c.id, users.c.avatar).where(users.c.avatar.is_not(None))
+    ).all()
+    now = datetime.utcnow()
+    for user_id, avatar in rows:
+        decoded = _decode(avatar)
+        if decoded is None:
+            continue  # unreadable legacy value - user falls back to no avatar
+        content_type, data = decoded
+        digest = hashlib.sha256(data).hexdigest()
+        bind.execute(user_avatars.insert().values(
+            user_id=user_id, content_type=content_type, data=data, etag=digest, updated_at=now
+        ))
+        bind.execute(users.update().where(users.c.id == user_id).values(avatar_hash=digest))
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("avatar")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column("users", sa.Column("avatar", sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(user_avatars.c.user_id, user_avatars.c.content_type, user_avatars.c.data)
+    ).all()
+    for user_id, content_type, data in rows:
+        encoded = base64.b64encode(data).decode("utf-8")
+        bind.execute(users.update().where(users.c.id == user_id).values(
+            avatar=f"data:{content_type};base64,{encoded}"
+        ))
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("avatar_hash")
+    op.drop_table("user_avatars")
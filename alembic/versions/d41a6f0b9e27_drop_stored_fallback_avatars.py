@@ -0,0 +1,60 @@
+"""drop per-user copies of the generated initials avatar
+
+Revision ID: d41a6f0b9e27
+Revises: b7e90a4c3d12
+Create Date: 2026-10-19 15:32:18.660154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from models.types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a6f0b9e27'
+down_revision: Union[str, Sequence[str], None] = 'b7e90a4c3d12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Start of the SVG routers/auth.normalize_avatar used to store for every user
+# registered without an avatar; these are now served from the shared
+# /users/avatars/initials/{XX}.svg resource instead.
+GENERATED_SVG_PREFIX = (
+    b"<svg xmlns='http://www.w3.org/2000/svg' width='200' height='200'>"
+    b"<rect width='100%' height='100%' fill='#2b2b2b'/>"
+)
+
+users = sa.table(
+    "users",
+    sa.column("id", GUID()),
+    sa.column("avatar_hash", sa.String(64)),
+)
+user_avatars = sa.table(
+    "user_avatars",
+    sa.column("user_id", GUID()),
+    sa.column("content_type", sa.String(50)),
+    sa.column("data", sa.LargeBinary()),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(user_avatars.c.user_id, user_avatars.c.data)
+        .where(user_avatars.c.content_type == "image/svg+xml")
+    ).all()
+    for user_id, data in rows:
+        if not data.startswith(GENERATED_SVG_PREFIX):
+            continue
+        bind.execute(user_avatars.delete().where(user_avatars.c.user_id == user_id))
+        bind.execute(users.update().where(users.c.id == user_id).values(avatar_hash=None))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Nothing to restore - the initials avatar is derived from nick/login.
+    pass
@@ -0,0 +1,100 @@
+"""store sha256 of session tokens instead of the raw token
+
+Revision ID: e5b2c8d94f16
+Revises: d41a6f0b9e27
+Create Date: 2026-10-19 17:05:41.302771
+
+"""
+import hashlib
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from models.types import GUID
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b2c8d94f16'
+down_revision: Union[str, Sequence[str], None] = 'd41a6f0b9e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+sessions = sa.table(
+    "sessions",
+    sa.column("id", GUID()),
+    sa.column("token", sa.String(255)),
+    sa.column("token_hash", sa.CHAR(64)),
+    sa.column("expires_at", sa.DateTime()),
+)
+
+# must stay in sync with __table_args__ in models.models
+NEW_INDEXES = [
+    ("ix_sessions_token_hash_expires_at", ["token_hash", "expires_at"]),
+    ("ix_sessions_expires_at", ["expires_at"]),
+    ("ix_sessions_user_id_created_at", ["user_id", "created_at"]),
+]
+
+
+def _existing_indexes() -> set[str]:
+    if op.get_context().as_sql:
+        # offline (--sql) mode has no connection to inspect
+        return set()
+    return {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes("sessions")}
+
+
+def _token_unique_constraints() -> list[str]:
+    """Names of the (server generated) unique constraints on sessions.token."""
+    if op.get_context().as_sql:
+        return []
+    return [
+        uc["name"] for uc in sa.inspect(op.get_bind()).get_unique_constraints("sessions")
+        if uc["name"] and uc["column_names"] == ["token"]
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    # Expired rows are never looked up again - don't bother hashing them
+    bind.execute(sessions.delete().where(sessions.c.expires_at <= datetime.utcnow()))
+
+    op.add_column("sessions", sa.Column("token_hash", sa.CHAR(64), nullable=True))
+    rows = bind.execute(sa.select(sessions.c.id, sessions.c.token)).all()
+    for session_id, token in rows:
+        bind.execute(sessions.update().where(sessions.c.id == session_id).values(
+            token_hash=hashlib.sha256(token.encode("utf-8")).hexdigest()
+        ))
+
+    if "ix_sessions_token_expires_at" in _existing_indexes():
+        op.drop_index("ix_sessions_token_expires_at", table_name="sessions")
+    unique_constraints = _token_unique_constraints()
+    with op.batch_alter_table("sessions") as batch_op:
+        for name in unique_constraints:
+            batch_op.drop_constraint(name, type_="unique")
+        batch_op.drop_column("token")
+        batch_op.alter_column("token_hash", existing_type=sa.CHAR(64), nullable=False)
+        batch_op.create_unique_constraint("uq_sessions_token_hash", ["token_hash"])
+
+    existing = _existing_indexes()
+    for name, columns in NEW_INDEXES:
+        if name not in existing:
+            op.create_index(name, "sessions", columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Raw tokens cannot be recovered from their hashes - everyone logs in again.
+    op.execute(sessions.delete())
+
+    existing = _existing_indexes()
+    for name, _ in reversed(NEW_INDEXES):
+        if name in existing:
+            op.drop_index(name, table_name="sessions")
+    with op.batch_alter_table("sessions") as batch_op:
+        batch_op.drop_constraint("uq_sessions_token_hash", type_="unique")
+        batch_op.drop_column("token_hash")
+        batch_op.add_column(sa.Column("token", sa.String(255), nullable=False))
+        batch_op.create_unique_constraint("uq_sessions_token", ["token"])
+    op.create_index("ix_sessions_token_expires_at", "sessions", ["token", "expires_at"])
@@ -0,0 +1,214 @@
+"""
+PBKDF2 password hashing off the API worker threads.
+
+Hashes and verifications run on a small dedicated process pool, so a login
+storm burns those processes' CPU instead of the API worker's GIL and thread
+pool. Admission is bounded: at most PASSWORD_HASH_WORKERS jobs run and
+PASSWORD_HASH_MAX_PENDING wait, anything beyond is rejected with 503 instead
+of piling up threads.
+
+The routes calling hash()/verify() are sync endpoints, so every admitted job
+also holds one of anyio's 40 threadpool threads while it waits. Admission
+(workers + max_pending) is therefore capped at MAX_ADMITTED, a quarter of that
+pool, leaving the rest for the other sync endpoints during a login storm.
+
+A job that times out is abandoned, not stopped: cancel() only works on jobs
+that have not started, and a pool process cannot be interrupted mid-pbkdf2.
+An abandoned job that is already running keeps its admission slot until it
+really finishes, so the slots always match the work queued on the pool.
+
+The pbkdf2 rounds are calibrated at startup so one hash takes about
+PASSWORD_HASH_TARGET_MS (never below passlib's default), unless
+PASSWORD_HASH_ROUNDS pins them. Hashes with noticeably fewer rounds than the
+current target are reported by needs_rehash() and upgraded on login.
+
+This module is imported by the pool processes - keep it free of app imports,
+and of fastapi at module level (half a second per spawned worker).
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from passlib.context import CryptContext
+from passlib.hash import pbkdf2_sha256
+
+PASSWORD_HASH_POOL = os.getenv("PASSWORD_HASH_POOL", "process").lower()  # process | inline
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, min(2, os.cpu_count() or 1)))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "6"))
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+PASSWORD_HASH_TARGET_MS = float(os.getenv("PASSWORD_HASH_TARGET_MS", "250"))
+PASSWORD_HASH_ROUNDS = os.getenv("PASSWORD_HASH_ROUNDS")
+
+# anyio's default threadpool has 40 threads; admitted jobs block one each
+MAX_ADMITTED = 10
+
+MIN_ROUNDS = pbkdf2_sha256.default_rounds
+MAX_ROUNDS = 2_000_000
+# Stored hashes below this fraction of the target get rehashed on login;
+# the slack keeps calibration jitter between restarts from rehashing everyone.
+REHASH_RATIO = 0.8
+
+
+def _hash_in_worker(password: str, rounds: int) -> tuple[str, float]:
+    start = time.perf_counter()
+    hashed = pbkdf2_sha256.using(rounds=rounds).hash(password)
+    return hashed, time.perf_counter() - start
+
+
+def _verify_in_worker(password: str, hashed: str) -> tuple[bool, float]:
+    start = time.perf_counter()
+    ok = pbkdf2_sha256.verify(password, hashed)
+    return ok, time.perf_counter() - start
+
+
+def _build_context(rounds: int) -> CryptContext:
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=max(MIN_ROUNDS, int(rounds * REHASH_RATIO)),
+    )
+
+
+def _server_busy():
+    # only the API process gets here; the pool processes never import fastapi
+    from fastapi import HTTPException, status
+
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, try again.",
+        headers={"Retry-After": "1"},
+    )
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING,
+                 mode: str = PASSWORD_HASH_POOL, rounds: int = MIN_ROUNDS):
+        self.workers = workers
+        self.max_pending = max(0, min(max_pending, MAX_ADMITTED - workers))
+        self.mode = mode
+        self._slots = threading.BoundedSemaphore(workers + self.max_pending)
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.set_rounds(rounds)
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.in_flight = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_compute_seconds = 0.0
+
+    def set_rounds(self, rounds: int) -> None:
+        self.rounds = rounds
+        self.context = _build_context(rounds)
+
+    def calibrate(self, target_ms: float = PASSWORD_HASH_TARGET_MS) -> int:
+        """Sets rounds so that one hash takes about target_ms on this host."""
+        if PASSWORD_HASH_ROUNDS:
+            self.set_rounds(int(PASSWORD_HASH_ROUNDS))
+            return self.rounds
+        _, elapsed = _hash_in_worker("calibration", MIN_ROUNDS)
+        rounds = int(MIN_ROUNDS * (target_ms / 1000.0) / max(elapsed, 1e-6))
+        rounds = max(MIN_ROUNDS, min(MAX_ROUNDS, rounds // 1000 * 1000))
+        self.set_rounds(rounds)
+        return rounds
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn: forking a process with live threads/DB connections is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def start(self) -> None:
+        """Spawns the pool processes up front so the first logins don't pay for it."""
+        if self.mode == "inline":
+            return
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_hash_in_worker, "warm-up", MIN_ROUNDS)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise _server_busy()
+        with self._stats_lock:
+            self.submitted += 1
+            self.in_flight += 1
+        start = time.perf_counter()
+        release_slot = True
+        try:
+            if self.mode == "inline":
+                result, compute = fn(*args)
+            else:
+                future = self._get_executor().submit(fn, *args)
+                try:
+                    result, compute = future.result(timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+                except FutureTimeoutError:
+                    with self._stats_lock:
+                        self.abandoned += 1
+                    if not future.cancel():
+                        # already running in a pool process: the slot is freed when it ends
+                        release_slot = False
+                        future.add_done_callback(lambda _: self._slots.release())
+                    raise _server_busy()
+            wait = max(0.0, time.perf_counter() - start - compute)
+            with self._stats_lock:
+                self.completed += 1
+                self.total_wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+                self.total_compute_seconds += compute
+            return result
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+            if release_slot:
+                self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash_in_worker, password, self.rounds)
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run(_verify_in_worker, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        # Only parses the hash string - no pbkdf2 work
+        return self.context.needs_update(hashed)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def info(self) -> dict:
+        with self._stats_lock:
+            completed = self.completed
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "rounds": self.rounds,
+                "submitted": self.submitted,
+                "completed": completed,
+                "rejected": self.rejected,
+                "abandoned": self.abandoned,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.workers),
+                "avg_queue_wait_ms": round(self.total_wait_seconds / completed * 1000, 2) if completed else 0.0,
+                "max_queue_wait_ms": round(self.max_wait_seconds * 1000, 2),
+                "avg_hash_ms": round(self.total_compute_seconds / completed * 1000, 2) if completed else 0.0,
+            }
+
+
+password_hasher = PasswordHasher()
@@ -1,17 +1,21 @@
 from datetime import datetime, timedelta
+import hashlib
+import os
 import secrets
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 
 from db import get_db
 from models import User, Session as DbSession
+from auth import session_cache as cache
+from auth.hashing import password_hasher
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 MAX_PASSWORD_BYTES = 1024
+SESSION_MAX_PER_USER = int(os.getenv("SESSION_MAX_PER_USER", "10"))
 
 
 def hash_password(password: str) -> str:
@@ -20,47 +24,109 @@ def hash_password(password: str) -> str:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password is too long (max 1024 bytes).",
         )
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     if len(plain_password.encode("utf-8")) > MAX_PASSWORD_BYTES:
         return False
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when the hash uses fewer rounds than the current (calibrated) target."""
+    return password_hasher.needs_rehash(hashed_password)
 
 def new_session_token() -> str:
     return secrets.token_urlsafe(32)
 
+
+def hash_token(token: str) -> str:
+    """sha256 hex of a session token - what sessions.token_hash and the session cache store."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 def create_session(db: Session, user: User, days: int = 30) -> str:
     token = new_session_token()
     expires_at = datetime.utcnow() + timedelta(days=days)
 
     s = DbSession(
         user_id=user.id,
-        token=token,
+        token_hash=hash_token(token),
         expires_at=expires_at
     )
     db.add(s)
+    db.flush()
+    evict_oldest_sessions(db, user.id)
     db.commit()
     return token
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def evict_oldest_sessions(db: Session, user_id, keep: int = SESSION_MAX_PER_USER) -> int:
+    """Deletes the user's sessions beyond the newest `keep`. Does not commit."""
+    stale = db.query(DbSession.id, DbSession.token_hash).filter(
+        DbSession.user_id == user_id
+    ).order_by(DbSession.created_at.desc(), DbSession.expires_at.desc()).offset(keep).all()
+    if not stale:
+        return 0
+
+    db.query(DbSession).filter(
+        DbSession.id.in_([row.id for row in stale])
+    ).delete(synchronize_session=False)
+    for row in stale:
+        cache.get_session_cache().invalidate(row.token_hash)
+    return len(stale)
+
+def get_current_session(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> cache.CachedSession:
+    """Resolves the bearer token to the session (user id, login, nick).
+
+    Served from the session cache when possible; on a miss the session and user
+    are loaded with one joined query and cached. Routes that only need to know
+    who is calling should depend on this rather than on get_current_user."""
     now = datetime.utcnow()
+    key = hash_token(token)
+
+    cached = cache.get_session_cache().get(key)
+    if cached and cached.expires_at > now:
+        return cached
 
-    sess = db.query(DbSession).filter(
-        DbSession.token == token,
+    row = db.query(DbSession.expires_at, User.id, User.login, User.nick).join(
+        User, User.id == DbSession.user_id
+    ).filter(
+        DbSession.token_hash == key,
         DbSession.expires_at > now
     ).first()
 
-    if not sess:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired session token",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = db.query(User).filter(User.id == sess.user_id).first()
+    current = cache.CachedSession(
+        user_id=str(row.id),
+        expires_at=row.expires_at,
+        login=row.login,
+        nick=row.nick,
+    )
+    cache.get_session_cache().set(key, current)
+    return current
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    """Resolves the bearer token to the ORM user: the session check goes through
+    the session cache (get_current_session), the user is one primary-key read."""
+    current = get_current_session(token, db)
+    user = db.get(User, current.user_id)
     if not user:
+        invalidate_session(token)
         raise HTTPException(status_code=401, detail="User not found")
-
     return user
+
+
+def invalidate_session(token: str) -> None:
+    cache.get_session_cache().invalidate(hash_token(token))
+
+
+def invalidate_user_sessions(user_id) -> None:
+    """Drops cached sessions of the user (password change, profile change)."""
+    cache.get_session_cache().invalidate_user(user_id)
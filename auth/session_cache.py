@@ -0,0 +1,268 @@
+"""
+Session token cache for auth.security.get_current_session (and get_current_user).
+
+Maps sha256(token) -> CachedSession (user id, session expiry, minimal user
+fields), so authenticated requests do not hit the sessions/users tables.
+
+Backends (SESSION_CACHE_BACKEND):
+- "memory" (default) - bounded LRU with TTL, per worker process
+- "file"   - SQLite file shared by all workers on the host (SESSION_CACHE_PATH),
+             invalidation done by one worker is seen by all of them
+- "off"    - no caching
+
+Entries live at most SESSION_CACHE_TTL_SECONDS (and never past the session
+expiry), which bounds staleness of the per-process memory backend.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from datetime import datetime
+
+SESSION_CACHE_BACKEND = os.getenv("SESSION_CACHE_BACKEND", "memory").lower()
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "60"))
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000"))
+SESSION_CACHE_PATH = os.getenv("SESSION_CACHE_PATH", os.path.join("cache", "sessions.sqlite3"))
+
+
+@dataclass(frozen=True)
+class CachedSession:
+    user_id: str
+    expires_at: datetime
+    login: str
+    nick: str | None = None
+
+    @property
+    def id(self) -> str:
+        """Same attribute name as User.id, for code written against the ORM user."""
+        return self.user_id
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def add(self, field: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def as_dict(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class NullSessionCache:
+    name = "off"
+
+    def __init__(self):
+        self.stats = _Stats()
+
+    def get(self, key: str) -> CachedSession | None:
+        self.stats.add("misses")
+        return None
+
+    def set(self, key: str, entry: CachedSession) -> None:
+        pass
+
+    def invalidate(self, key: str) -> None:
+        pass
+
+    def invalidate_user(self, user_id) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def size(self) -> int:
+        return 0
+
+    def info(self) -> dict:
+        return {"backend": self.name, "size": self.size(), **self.stats.as_dict()}
+
+
+class MemorySessionCache(NullSessionCache):
+    """Bounded LRU with per-entry deadline, local to the worker process."""
+    name = "memory"
+
+    def __init__(self, ttl_seconds: float = SESSION_CACHE_TTL_SECONDS, max_entries: int = SESSION_CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, CachedSession]] = OrderedDict()
+
+    def get(self, key: str) -> CachedSession | None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] > now:
+                self._entries.move_to_end(key)
+                self.stats.add("hits")
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+        self.stats.add("misses")
+        return None
+
+    def set(self, key: str, entry: CachedSession) -> None:
+        deadline = time.monotonic() + _ttl_for(entry, self.ttl_seconds)
+        evicted = 0
+        with self._lock:
+            self._entries[key] = (deadline, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            self.stats.add("evictions", evicted)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            removed = self._entries.pop(key, None)
+        if removed is not None:
+            self.stats.add("invalidations")
+
+    def invalidate_user(self, user_id) -> None:
+        user_id = str(user_id)
+        with self._lock:
+            keys = [k for k, (_, e) in self._entries.items() if e.user_id == user_id]
+            for k in keys:
+                del self._entries[k]
+        if keys:
+            self.stats.add("invalidations", len(keys))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class FileSessionCache(NullSessionCache):
+    """SQLite file shared by all worker processes on one host."""
+    name = "file"
+
+    def __init__(self, path: str = SESSION_CACHE_PATH, ttl_seconds: float = SESSION_CACHE_TTL_SECONDS,
+                 max_entries: int = SESSION_CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_cache ("
+                "key TEXT PRIMARY KEY, user_id TEXT NOT NULL, "
+                "deadline REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_session_cache_user_id ON session_cache (user_id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> CachedSession | None:
+        row = self._conn().execute(
+            "SELECT payload FROM session_cache WHERE key = ? AND deadline > ?",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            self.stats.add("misses")
+            return None
+        data = json.loads(row[0])
+        data["expires_at"] = datetime.fromisoformat(data["expires_at"])
+        self.stats.add("hits")
+        return CachedSession(**data)
+
+    def set(self, key: str, entry: CachedSession) -> None:
+        payload = asdict(entry)
+        payload["expires_at"] = entry.expires_at.isoformat()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO session_cache (key, user_id, deadline, payload) VALUES (?, ?, ?, ?)",
+            (key, entry.user_id, time.time() + _ttl_for(entry, self.ttl_seconds), json.dumps(payload))
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        expired = conn.execute("DELETE FROM session_cache WHERE deadline <= ?", (time.time(),)).rowcount
+        overflow = conn.execute(
+            "DELETE FROM session_cache WHERE key IN ("
+            "SELECT key FROM session_cache ORDER BY deadline DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        ).rowcount
+        if expired + overflow:
+            self.stats.add("evictions", expired + overflow)
+
+    def invalidate(self, key: str) -> None:
+        removed = self._conn().execute("DELETE FROM session_cache WHERE key = ?", (key,)).rowcount
+        if removed:
+            self.stats.add("invalidations", removed)
+
+    def invalidate_user(self, user_id) -> None:
+        removed = self._conn().execute(
+            "DELETE FROM session_cache WHERE user_id = ?", (str(user_id),)
+        ).rowcount
+        if removed:
+            self.stats.add("invalidations", removed)
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM session_cache")
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM session_cache").fetchone()[0]
+
+
+def _ttl_for(entry: CachedSession, ttl_seconds: float) -> float:
+    """Cache TTL, cut short so an entry never outlives its session."""
+    remaining = (entry.expires_at - datetime.utcnow()).total_seconds()
+    return max(0.0, min(ttl_seconds, remaining))
+
+
+def create_session_cache(backend: str = SESSION_CACHE_BACKEND) -> NullSessionCache:
+    if backend == "memory":
+        return MemorySessionCache()
+    if backend == "file":
+        return FileSessionCache()
+    if backend in {"off", "none", "0", "false"}:
+        return NullSessionCache()
+    raise ValueError(f"Unknown SESSION_CACHE_BACKEND: {backend!r}")
+
+
+session_cache = create_session_cache()
+
+
+def configure_session_cache(backend: str) -> NullSessionCache:
+    """Swaps the process-wide cache (used by benchmarks and tests)."""
+    global session_cache
+    session_cache = create_session_cache(backend)
+    return session_cache
+
+
+def get_session_cache() -> NullSessionCache:
+    return session_cache
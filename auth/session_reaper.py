@@ -0,0 +1,138 @@
+"""
+Background deletion of expired sessions.
+
+A daemon thread wakes every SESSION_REAP_INTERVAL_SECONDS and deletes expired
+rows in batches of SESSION_REAP_BATCH_SIZE, one short transaction per batch
+(ids are picked through ix_sessions_expires_at, then deleted by primary key),
+so the sessions table is never locked for long and logins keep going while a
+large backlog is drained.
+
+Set SESSION_REAP_INTERVAL_SECONDS=0 to disable the thread (e.g. when only one
+of several app instances should reap); session_reaper.reap() can still be
+called directly.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from db import SessionLocal
+from models import Session as DbSession
+
+logger = logging.getLogger(__name__)
+
+SESSION_REAP_INTERVAL_SECONDS = float(os.getenv("SESSION_REAP_INTERVAL_SECONDS", "3600"))
+SESSION_REAP_BATCH_SIZE = int(os.getenv("SESSION_REAP_BATCH_SIZE", "500"))
+SESSION_REAP_BATCH_PAUSE_SECONDS = float(os.getenv("SESSION_REAP_BATCH_PAUSE_SECONDS", "0.05"))
+
+
+def delete_expired_batch(db: Session, now: datetime, batch_size: int = SESSION_REAP_BATCH_SIZE) -> int:
+    """Deletes up to batch_size expired sessions and commits. Returns the deleted count."""
+    ids = [
+        row.id for row in db.query(DbSession.id)
+        .filter(DbSession.expires_at <= now)
+        .order_by(DbSession.expires_at)
+        .limit(batch_size)
+    ]
+    if not ids:
+        return 0
+    db.query(DbSession).filter(DbSession.id.in_(ids)).delete(synchronize_session=False)
+    db.commit()
+    return len(ids)
+
+
+class SessionReaper:
+    def __init__(self, interval_seconds: float = SESSION_REAP_INTERVAL_SECONDS,
+                 batch_size: int = SESSION_REAP_BATCH_SIZE,
+                 batch_pause_seconds: float = SESSION_REAP_BATCH_PAUSE_SECONDS):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.batch_pause_seconds = batch_pause_seconds
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats_lock = threading.Lock()
+
+        self.runs = 0
+        self.last_run_at: datetime | None = None
+        self.last_run_reaped = 0
+        self.last_run_seconds = 0.0
+        self.total_reaped = 0
+        self.last_error: str | None = None
+
+    def reap(self) -> int:
+        """Deletes all sessions expired as of now, batch by batch. Returns the total."""
+        now = datetime.utcnow()
+        start = time.perf_counter()
+        reaped = 0
+        db = SessionLocal()
+        try:
+            while not self._stop.is_set():
+                deleted = delete_expired_batch(db, now, self.batch_size)
+                reaped += deleted
+                if deleted < self.batch_size:
+                    break
+                # let concurrent writers in between batches
+                self._stop.wait(self.batch_pause_seconds)
+        finally:
+            db.close()
+
+        with self._stats_lock:
+            self.runs += 1
+            self.last_run_at = now
+            self.last_run_reaped = reaped
+            self.last_run_seconds = time.perf_counter() - start
+            self.total_reaped += reaped
+        return reaped
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                reaped = self.reap()
+                self.last_error = None
+                if reaped:
+                    logger.info(f"Session reaper: deleted {reaped} expired sessions")
+            except Exception as e:
+                self.last_error = repr(e)
+                logger.exception("Session reaper failed")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="session-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def info(self, db: Session) -> dict:
+        now = datetime.utcnow()
+        total, expired = db.query(
+            func.count(DbSession.id),
+            func.sum(case((DbSession.expires_at <= now, 1), else_=0))
+        ).one()
+        with self._stats_lock:
+            return {
+                "table_rows": total,
+                "expired_rows": expired or 0,
+                "running": self._thread is not None,
+                "interval_seconds": self.interval_seconds,
+                "batch_size": self.batch_size,
+                "runs": self.runs,
+                "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+                "last_run_reaped": self.last_run_reaped,
+                "last_run_ms": round(self.last_run_seconds * 1000, 2),
+                "total_reaped": self.total_reaped,
+                "last_error": self.last_error,
+            }
+
+
+session_reaper = SessionReaper()
@@ -0,0 +1,117 @@
+"""
+Avatar storage.
+
+Avatars arrive as base64 data URLs (register / PATCH /users/me) and are stored
+decoded in the user_avatars table. Profile JSON only carries avatar_url(user),
+the bytes are served by GET /users/{id}/avatar with a strong ETag.
+
+Users without an uploaded avatar get a shared SVG keyed by their initials
+(GET /users/avatars/initials/{XX}.svg). It is rendered once per initials,
+cached in memory and on disk, and never stored per user.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import string
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from fastapi import HTTPException
+
+from models.models import User, UserAvatar
+
+MAX_AVATAR_BYTES = 500 * 1024
+# Raster types only: an uploaded SVG or HTML "avatar" served from this origin
+# would run its scripts (stored XSS). All of them fit UserAvatar.content_type.
+AVATAR_CONTENT_TYPES = frozenset({"image/png", "image/jpeg", "image/webp", "image/gif"})
+
+AVATAR_CACHE_DIR = os.getenv("AVATAR_CACHE_DIR", os.path.join("cache", "avatars"))
+FALLBACK_INITIALS = "BG"
+# 36 * 36 + 36 possible initials: the unauthenticated initials route can only
+# ever write that many files into AVATAR_CACHE_DIR
+INITIALS_ALPHABET = frozenset(string.ascii_uppercase + string.digits)
+
+
+def decode_data_url(value: str) -> tuple[str, bytes]:
+    """Splits "data:image/png;base64,..." into (content type, decoded bytes)."""
+    header, _, b64 = value.partition(",")
+    content_type = header[len("data:"):].split(";", 1)[0].strip().lower()
+    if not header.startswith("data:image/") or ";base64" not in header or not b64:
+        raise HTTPException(status_code=400, detail="Avatar must be base64 data URL.")
+    if content_type not in AVATAR_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Avatar must be a PNG, JPEG, WebP or GIF image.")
+    try:
+        data = base64.b64decode(b64, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid avatar data.")
+    if len(data) > MAX_AVATAR_BYTES:
+        raise HTTPException(status_code=400, detail="Avatar is too large.")
+    return content_type, data
+
+
+def set_avatar(user: User, data_url: str | None) -> None:
+    """Stores (or with None removes) the user's avatar. Does not commit."""
+    if data_url is None:
+        user.avatar_image = None
+        user.avatar_hash = None
+        return
+
+    content_type, data = decode_data_url(data_url)
+    digest = hashlib.sha256(data).hexdigest()
+    if user.avatar_hash == digest:
+        return
+
+    image = user.avatar_image
+    if image is None:
+        image = UserAvatar()
+        user.avatar_image = image
+    image.content_type = content_type
+    image.data = data
+    image.etag = digest
+    image.updated_at = datetime.utcnow()
+    user.avatar_hash = digest
+
+
+def avatar_url(user: User) -> str:
+    """URL of the user's avatar: versioned upload or the shared initials SVG."""
+    if user.avatar_hash:
+        return f"/users/{user.id}/avatar?v={user.avatar_hash[:16]}"
+    return initials_avatar_url(initials_for(user.nick or user.login or ""))
+
+
+def initials_for(seed: str) -> str:
+    # ASCII letters and digits only: "/" or "." would not survive the URL path
+    # (Starlette decodes %2F before routing), and a closed alphabet bounds the
+    # SVGs cached on disk; other characters (e.g. "Ł") are skipped
+    letters = "".join(ch for ch in seed.upper() if ch in INITIALS_ALPHABET)
+    return letters[:2] or FALLBACK_INITIALS
+
+
+def initials_avatar_url(initials: str) -> str:
+    return f"/users/avatars/initials/{quote(initials, safe='')}.svg"
+
+
+@lru_cache(maxsize=2048)
+def initials_svg(initials: str) -> bytes:
+    """SVG for the given (already normalized) initials, rendered at most once."""
+    path = os.path.join(AVATAR_CACHE_DIR, initials + ".svg")
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        pass
+
+    svg = f"<svg xmlns='http://www.w3.org/2000/svg' width='200' height='200'><rect width='100%' height='100%' fill='#2b2b2b'/><text x='50%' y='54%' text-anchor='middle' font-family='Arial' font-size='72' fill='#ffffff'>{escape(initials)}</text></svg>"
+    data = svg.encode("utf-8")
+    try:
+        os.makedirs(AVATAR_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # disk cache is best effort, memory cache still applies
+    return data
@@ -0,0 +1,200 @@
+"""
+Throughput of the hot read endpoints on the async DB path (get_async_db)
+versus the same queries on the sync path (get_db in def endpoints).
+
+Both apps run in-process behind httpx's ASGI transport against one SQLite
+file (aiosqlite for the async path). Sync endpoints run on anyio's worker
+threadpool (40 threads by default, as under uvicorn), async ones on the event
+loop. Requests cycle through /puzzles/daily/today, /puzzles/daily/{date},
+/rankings/daily/{date}/top and /users/{id}.
+
+Run: python benchmarks/bench_async_db.py [--concurrency 200] [--requests 4000] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_async_db_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(TMP_DIR, 'bench.db')}")
+
+import httpx
+from fastapi import FastAPI, Depends, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import schemas
+from db import Base, engine, SessionLocal, get_db, dispose_async_engine, DATABASE_URL
+from models import User, Puzzle, DailyPuzzle, Solve
+from routers import puzzles, rankings, users
+from routers.rankings import calculate_daily_ranking
+from avatars import avatar_url
+
+DAYS = 30
+USERS = 200
+
+
+def seed() -> tuple[list[str], list[str]]:
+    """Creates DAYS daily puzzles solved by USERS users. Returns (dates, user ids)."""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        rng = random.Random(0)
+        user_ids = [str(uuid.uuid4()) for _ in range(USERS)]
+        db.add_all([
+            User(id=user_id, login=f"bench_{i}", email=f"bench_{i}@example.com",
+                 password_hash="x", nick=f"Bench {i}", total_solves=DAYS)
+            for i, user_id in enumerate(user_ids)
+        ])
+        today = datetime.utcnow().date()
+        dates = []
+        for offset in range(DAYS):
+            day = today - timedelta(days=offset)
+            puzzle_id = str(uuid.uuid4())
+            db.add(Puzzle(id=puzzle_id, type="daily", difficulty=3, size=6,
+                          grid_solution="0" * 36, grid_initial="." * 36, created_at=datetime.utcnow()))
+            db.add(DailyPuzzle(date=day, puzzle_id=puzzle_id))
+            db.add_all([
+                Solve(user_id=user_id, puzzle_id=puzzle_id, completed=True,
+                      mistakes=rng.randint(0, 5), hints_used=rng.randint(0, 3),
+                      time_seconds=rng.randint(30, 600))
+                for user_id in user_ids
+            ])
+            dates.append(day.isoformat())
+        db.commit()
+        return dates, user_ids
+    finally:
+        db.close()
+
+
+def build_async_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(puzzles.router, prefix="/puzzles")
+    app.include_router(rankings.router, prefix="/rankings")
+    app.include_router(users.router, prefix="/users")
+    return app
+
+
+def build_sync_app() -> FastAPI:
+    """The same endpoints as they were before the async port (def + SessionLocal)."""
+    app = FastAPI()
+
+    def daily_puzzle(db: Session, day):
+        dp = db.query(DailyPuzzle).filter(DailyPuzzle.date == day).first()
+        puzzle = dp and db.query(Puzzle).filter(Puzzle.id == dp.puzzle_id).first()
+        if not puzzle:
+            raise HTTPException(status_code=404, detail="Brak daily puzzle")
+        return puzzle
+
+    @app.get("/puzzles/daily/today", response_model=schemas.PuzzlePublic)
+    def get_daily_today(db: Session = Depends(get_db)):
+        return daily_puzzle(db, datetime.utcnow().date())
+
+    @app.get("/puzzles/daily/{date}", response_model=schemas.PuzzlePublic)
+    def get_daily_by_date(date: str, db: Session = Depends(get_db)):
+        return daily_puzzle(db, datetime.strptime(date, "%Y-%m-%d").date())
+
+    @app.get("/rankings/daily/{date}/top", response_model=list[schemas.DailyRankingPublic])
+    def get_daily_top(date: str, limit: int = 10, db: Session = Depends(get_db)):
+        result = []
+        for r in calculate_daily_ranking(datetime.strptime(date, "%Y-%m-%d").date(), db)[:limit]:
+            user = db.query(User).filter(User.id == r["user_id"]).first()
+            result.append({**r, "user_nick": user.nick if user else "Unknown"})
+        return result
+
+    @app.get("/users/{user_id}", response_model=schemas.UserPublicProfile)
+    def get_public_profile(user_id: str, db: Session = Depends(get_db)):
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return {"id": str(user.id), "nick": user.nick, "avatar_url": avatar_url(user),
+                "total_solves": user.total_solves or 0}
+
+    return app
+
+
+def request_paths(dates: list[str], user_ids: list[str], count: int) -> list[str]:
+    rng = random.Random(1)
+    kinds = [
+        lambda: "/puzzles/daily/today",
+        lambda: f"/puzzles/daily/{rng.choice(dates)}",
+        lambda: f"/rankings/daily/{rng.choice(dates)}/top",
+        lambda: f"/users/{rng.choice(user_ids)}",
+    ]
+    return [kinds[i % len(kinds)]() for i in range(count)]
+
+
+async def run_load(app: FastAPI, paths: list[str], concurrency: int) -> dict:
+    latencies = []
+    queue = iter(paths)
+
+    async def client_loop(client: httpx.AsyncClient):
+        for path in queue:
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, (path, response.status_code, response.text)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # warm-up (connection pools, first-query compilation)
+        for path in paths[:20]:
+            await client.get(path)
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+async def main_async(args) -> list[dict]:
+    dates, user_ids = seed()
+    paths = request_paths(dates, user_ids, args.requests)
+    # With the default pool (5 + 10 overflow) the sync path stalls at this
+    # concurrency: sessions keep their connection while waiting for a worker
+    # thread to run get_db's cleanup. Give it one connection per client.
+    SessionLocal.configure(bind=create_engine(DATABASE_URL, pool_size=args.concurrency, max_overflow=0))
+    results = []
+    for name, app in (("sync", build_sync_app()), ("async", build_async_app())):
+        stats = await run_load(app, paths, args.concurrency)
+        results.append({"name": f"db.{name}", "concurrency": args.concurrency, **stats})
+    await dispose_async_engine()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'benchmark':<12} {'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for r in results:
+        print(f"{r['name']:<12} {r['concurrency']:>8} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Authenticated request overhead of auth.security.get_current_session
+with the session cache off, in memory and in the shared file backend.
+
+Drives a minimal app in-process (TestClient) against the database from
+DATABASE_URL (default: a throwaway SQLite file) and compares the latency of an
+authenticated route to the same route without auth.
+
+Run: python benchmarks/bench_auth.py [--requests 2000] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_auth_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(TMP_DIR, 'bench.db')}")
+os.environ.setdefault("SESSION_CACHE_PATH", os.path.join(TMP_DIR, "sessions.sqlite3"))
+
+from fastapi import FastAPI, Depends
+from fastapi.testclient import TestClient
+
+from db import Base, engine, SessionLocal
+from models import User
+from auth import session_cache
+from auth.security import get_current_session, create_session
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/anon")
+    def anon():
+        return {"ok": True}
+
+    @app.get("/whoami")
+    def whoami(current_user=Depends(get_current_session)):
+        return {"id": current_user.id}
+
+    return app
+
+
+def create_token() -> str:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(login=f"bench_{time.time_ns()}", email=f"bench_{time.time_ns()}@example.com",
+                    password_hash="x", nick="bench")
+        db.add(user)
+        db.commit()
+        return create_session(db, user)
+    finally:
+        db.close()
+
+
+def measure(client: TestClient, path: str, headers: dict, requests: int) -> float:
+    """Mean latency in microseconds."""
+    for _ in range(min(50, requests)):
+        client.get(path, headers=headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    token = create_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    client = TestClient(build_app())
+
+    baseline_us = measure(client, "/anon", {}, args.requests)
+    results = [{"name": "auth.anon", "mean_us": round(baseline_us, 1)}]
+    for backend in ("off", "memory", "file"):
+        cache = session_cache.configure_session_cache(backend)
+        mean_us = measure(client, "/whoami", headers, args.requests)
+        info = cache.info()
+        results.append({
+            "name": f"auth.cache_{backend}",
+            "mean_us": round(mean_us, 1),
+            "overhead_us": round(mean_us - baseline_us, 1),
+            "hit_rate": info["hit_rate"],
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'benchmark':<20} {'mean us':>10} {'overhead us':>12} {'hit rate':>9}")
+    for r in results:
+        print(f"{r['name']:<20} {r['mean_us']:>10} {r.get('overhead_us', ''):>12} {r.get('hit_rate', ''):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Tokens/sec of the llama.cpp model for several thread / context configurations.
+
+Loads AI_MODEL_PATH once per configuration (ai_backends.llama_options with the
+given overrides) and runs the longest hint prompt the app sends
+(ai_model.worst_case_prompts) with an empty KV cache each run, streaming:
+
+- prompt tok/s: prompt tokens / time to the first generated token
+- gen tok/s:    generated tokens after the first / the rest of the time
+
+The default grid compares 1, half the physical cores, the physical cores and
+all usable CPUs for n_threads, and the auto-sized n_ctx against the old fixed
+2048; the auto-tuned configuration is marked with *. Needs llama-cpp-python
+and the model file.
+
+Run:
+    python benchmarks/llama_calibrate.py [--threads 2,4,auto] [--threads-batch auto] \
+        [--ctx auto,2048] [--tokens 64] [--runs 3] [--json]
+"""
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from ai_backends import AI_MODEL_PATH, cpu_topology, llama_options, vocab_token_counter
+from ai_model import worst_case_prompts
+
+
+def parse_values(spec: str, auto: int) -> list[int]:
+    return sorted({auto if value.strip() == "auto" else int(value) for value in spec.split(",")})
+
+
+def run_once(llm, prompt: str, max_tokens: int) -> tuple[float, int, float]:
+    """(seconds to first token, generated tokens, total seconds) on an empty KV cache."""
+    llm.reset()
+    start = time.perf_counter()
+    first = None
+    tokens = 0
+    for chunk in llm.create_chat_completion(messages=[{"role": "user", "content": prompt}], max_tokens=max_tokens,
+                                            temperature=0.0, stream=True):
+        if chunk["choices"][0]["delta"].get("content"):
+            tokens += 1
+            if first is None:
+                first = time.perf_counter() - start
+    return first or 0.0, tokens, time.perf_counter() - start
+
+
+def calibrate(model_path: str, options: dict, prompt: str, prompt_tokens: int, max_tokens: int, runs: int) -> dict:
+    from llama_cpp import Llama
+
+    start = time.perf_counter()
+    llm = Llama(model_path=model_path, verbose=False, **options)
+    load_seconds = time.perf_counter() - start
+    run_once(llm, prompt, 8)  # warm-up: page in the weights
+
+    prompt_rates, gen_rates, first_tokens = [], [], []
+    for _ in range(runs):
+        first, tokens, total = run_once(llm, prompt, max_tokens)
+        first_tokens.append(first)
+        prompt_rates.append(prompt_tokens / first if first else 0.0)
+        if tokens > 1:
+            gen_rates.append((tokens - 1) / (total - first))
+    del llm
+    return {
+        **options,
+        "load_s": round(load_seconds, 2),
+        "first_token_ms": round(statistics.median(first_tokens) * 1000, 1),
+        "prompt_tok_s": round(statistics.median(prompt_rates), 1),
+        "gen_tok_s": round(statistics.median(gen_rates), 1) if gen_rates else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=AI_MODEL_PATH, help="GGUF file (default: AI_MODEL_PATH)")
+    parser.add_argument("--threads", help="n_threads values, 'auto' = physical cores")
+    parser.add_argument("--threads-batch", default="auto", help="n_threads_batch values, 'auto' = usable CPUs")
+    parser.add_argument("--ctx", default="auto,2048", help="n_ctx values, 'auto' = sized to the prompts")
+    parser.add_argument("--tokens", type=int, default=64, help="tokens to generate per run")
+    parser.add_argument("--runs", type=int, default=3, help="timed runs per configuration")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    try:
+        import llama_cpp  # noqa: F401
+    except ImportError:
+        sys.exit("llama-cpp-python is not installed")
+    if not os.path.exists(args.model):
+        sys.exit(f"Model not found at {args.model}")
+
+    physical, logical = cpu_topology()
+    auto = llama_options(args.model)
+    threads = parse_values(args.threads or f"1,{max(1, physical // 2)},{physical},{logical}", physical)
+    threads_batch = parse_values(args.threads_batch, logical)
+    contexts = parse_values(args.ctx, auto["n_ctx"])
+
+    prompt, _ = worst_case_prompts()[0]
+    prompt_tokens = vocab_token_counter(args.model)(prompt)
+
+    results = []
+    for n_threads, n_threads_batch, n_ctx in itertools.product(threads, threads_batch, contexts):
+        options = {**auto, "n_threads": n_threads, "n_threads_batch": n_threads_batch, "n_ctx": n_ctx,
+                   "n_batch": min(auto["n_batch"], n_ctx)}
+        result = calibrate(args.model, options, prompt, prompt_tokens, args.tokens, args.runs)
+        result["auto"] = options == auto
+        results.append(result)
+        if not args.json:
+            print(f"{'*' if result['auto'] else ' '} threads={n_threads:<3} batch_threads={n_threads_batch:<3} "
+                  f"n_ctx={n_ctx:<5} load {result['load_s']:>5}s  first token {result['first_token_ms']:>8} ms  "
+                  f"prompt {result['prompt_tok_s']:>7} tok/s  gen {result['gen_tok_s']:>6} tok/s")
+
+    if args.json:
+        print(json.dumps({"physical_cores": physical, "usable_cpus": logical, "prompt_tokens": prompt_tokens,
+                          "results": results}, indent=2))
+    else:
+        best = max(results, key=lambda r: r["gen_tok_s"])
+        print(f"\n{physical} physical cores, {logical} usable CPUs, prompt {prompt_tokens} tokens; "
+              f"fastest generation: n_threads={best['n_threads']} ({best['gen_tok_s']} tok/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Load test with a realistic game traffic mix, per-route latency percentiles.
+
+Each virtual player loops through a session:
+
+    login -> daily puzzle -> 3-6 progress saves (POST /solves, not completed)
+    -> hint (30%) -> final solve -> 2-4 leaderboard polls -> calendar (30%)
+
+In-process (default) the full app (main.app) runs behind httpx's ASGI
+transport on a throwaway SQLite database, with AI_BACKEND=stub standing in for
+the model (see ai_backends.StubBackend, tuned with --llm-* options) and the AI
+rate limiter off, so /ai/hint measures the model path (--ai-rate-limit keeps
+the configured limits). With --url the same traffic goes to a running server
+(e.g. uvicorn with --workers N); start it with AI_BACKEND=stub and
+AI_RATE_LIMIT_BACKEND=off too, unless it has a model file or the limits are
+what is being tested. Responses answered by rules instead of the model
+(X-AI-Degraded) are counted in the "degraded" column.
+
+Several --concurrency steps run back to back, so the table shows where
+throughput stops growing and tail latency takes off.
+
+Run:
+    python benchmarks/loadtest.py [--concurrency 1,10,50] [--duration 20] [--json]
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --concurrency 50,200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import httpx
+
+PLAYER_PASSWORD = "loadtest-password"
+HISTORY_DAYS = 30
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.degraded: dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool, degraded: bool = False) -> None:
+        self.latencies[route].append(seconds)
+        if not ok:
+            self.errors[route] += 1
+        if degraded:
+            self.degraded[route] += 1
+
+    def summary(self, elapsed: float) -> list[dict]:
+        rows = []
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            rows.append({
+                "route": route,
+                "requests": len(values),
+                "errors": self.errors[route],
+                "degraded": self.degraded[route],
+                "rps": round(len(values) / elapsed, 1),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            })
+        everything = sorted(v for values in self.latencies.values() for v in values)
+        rows.append({
+            "route": "TOTAL",
+            "requests": len(everything),
+            "errors": sum(self.errors.values()),
+            "degraded": sum(self.degraded.values()),
+            "rps": round(len(everything) / elapsed, 1),
+            "p50_ms": round(percentile(everything, 50) * 1000, 2),
+            "p95_ms": round(percentile(everything, 95) * 1000, 2),
+            "p99_ms": round(percentile(everything, 99) * 1000, 2),
+            "max_ms": round(everything[-1] * 1000, 2) if everything else 0.0,
+        })
+        return rows
+
+
+class Player:
+    def __init__(self, client: httpx.AsyncClient, login: str, stats: Stats, rng: random.Random, think_time: float):
+        self.client = client
+        self.login = login
+        self.stats = stats
+        self.rng = rng
+        self.think_time = think_time
+        self.token: str | None = None
+
+    async def call(self, route: str, method: str, path: str, **kwargs) -> httpx.Response | None:
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=headers, **kwargs)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        degraded = response is not None and "x-ai-degraded" in response.headers
+        self.stats.record(route, time.perf_counter() - start, ok, degraded)
+        if self.think_time:
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+        return response
+
+    async def session(self) -> None:
+        response = await self.call("POST /auth/login", "POST", "/auth/login",
+                                   json={"login_or_email": self.login, "password": PLAYER_PASSWORD})
+        if response is not None and response.status_code == 200:
+            self.token = response.json()["access_token"]
+
+        response = await self.call("GET /puzzles/daily/today", "GET", "/puzzles/daily/today")
+        if response is None or response.status_code != 200:
+            return
+        puzzle = response.json()
+        today = datetime.utcnow().date().isoformat()
+
+        elapsed = 0
+        for _ in range(self.rng.randint(3, 6)):
+            elapsed += self.rng.randint(10, 40)
+            await self.call("POST /solves (progress)", "POST", "/solves", json={
+                "puzzle_id": puzzle["id"], "time_seconds": elapsed,
+                "mistakes": self.rng.randint(0, 2), "hints_used": 0, "completed": False,
+            })
+        if self.rng.random() < 0.3:
+            await self.call("POST /ai/hint", "POST", "/ai/hint",
+                            json={"puzzle_id": puzzle["id"], "grid_state": puzzle["grid_initial"]})
+        await self.call("POST /solves (final)", "POST", "/solves", json={
+            "puzzle_id": puzzle["id"], "time_seconds": elapsed + self.rng.randint(10, 60),
+            "mistakes": self.rng.randint(0, 3), "hints_used": self.rng.randint(0, 1), "completed": True,
+        })
+        for _ in range(self.rng.randint(2, 4)):
+            await self.call("GET /rankings/daily/{date}/top", "GET", f"/rankings/daily/{today}/top")
+        if self.rng.random() < 0.3:
+            await self.call("GET /calendar/daily", "GET", "/calendar/daily?days=30")
+
+
+async def seed(client: httpx.AsyncClient, players: int) -> list[str]:
+    """Registers the players and generates the daily puzzles through the API."""
+    today = datetime.utcnow().date()
+    response = await client.post("/admin/daily/generate-missing", params={
+        "start": (today - timedelta(days=HISTORY_DAYS)).isoformat(), "end": today.isoformat(),
+    })
+    response.raise_for_status()
+
+    logins = [f"loadtest_{i}" for i in range(players)]
+
+    async def register(login: str) -> None:
+        response = await client.post("/auth/register", json={
+            "login": login, "email": f"{login}@example.com", "password": PLAYER_PASSWORD, "nick": login,
+        })
+        # re-runs against the same server find the players already registered
+        if response.status_code not in (200, 400):
+            response.raise_for_status()
+
+    # a few at a time: registration hashes the password
+    for i in range(0, len(logins), 8):
+        await asyncio.gather(*(register(login) for login in logins[i:i + 8]))
+    return logins
+
+
+async def run_step(client: httpx.AsyncClient, logins: list[str], concurrency: int,
+                   duration: float, think_time: float) -> tuple[Stats, float]:
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    async def player_loop(index: int) -> None:
+        rng = random.Random(index)
+        player = Player(client, logins[index % len(logins)], stats, rng, think_time)
+        while time.perf_counter() < deadline:
+            await player.session()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(player_loop(i) for i in range(concurrency)))
+    return stats, time.perf_counter() - start
+
+
+async def main_async(args) -> list[dict]:
+    steps = [int(c) for c in args.concurrency.split(",")]
+    players = args.players or max(steps)
+    app = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix="loadtest_")
+        os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tmp_dir, 'loadtest.db')}")
+        # seed() generates the puzzles; keep the scheduler's top-up out of the way
+        os.environ.setdefault("DAILY_SCHEDULER_ENABLED", "0")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        # the real AI code path on the stub model (ai_backends.StubBackend)
+        os.environ["AI_BACKEND"] = "stub"
+        os.environ["AI_ENABLED"] = "1"
+        if not args.ai_rate_limit:
+            os.environ["AI_RATE_LIMIT_BACKEND"] = "off"
+        os.environ.setdefault("AI_STUB_FIRST_TOKEN_MS", str(args.llm_first_token_ms))
+        os.environ.setdefault("AI_STUB_TOKENS_PER_SECOND", str(args.llm_tokens_per_second))
+        from main import app
+        from db import Base, engine
+
+        Base.metadata.create_all(bind=engine)
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                                   timeout=args.timeout)
+
+    results = []
+    try:
+        logins = await seed(client, players)
+        for concurrency in steps:
+            stats, elapsed = await run_step(client, logins, concurrency, args.duration, args.think_time_ms / 1000)
+            for row in stats.summary(elapsed):
+                results.append({"concurrency": concurrency, **row})
+    finally:
+        await client.aclose()
+        if app is not None:
+            await app.router.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="base URL of a running server (default: in-process app)")
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated virtual player counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency step")
+    parser.add_argument("--players", type=int, help="registered accounts (default: max concurrency)")
+    parser.add_argument("--think-time-ms", type=float, default=0.0, help="mean pause between a player's requests")
+    parser.add_argument("--llm-first-token-ms", type=float, default=150.0,
+                        help="stub model time to first token (in-process only)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=40.0,
+                        help="stub model generation speed (in-process only)")
+    parser.add_argument("--ai-rate-limit", action="store_true",
+                        help="keep the AI rate limits from the environment (in-process only, default: off)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = asyncio.run(main_async(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'clients':>7} {'route':<32} {'reqs':>7} {'err':>5} {'degr':>5} {'req/s':>8} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for r in results:
+        print(f"{r['concurrency']:>7} {r['route']:<32} {r['requests']:>7} {r['errors']:>5} {r['degraded']:>5} "
+              f"{r['rps']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['max_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+Micro-benchmark suite for the CPU-bound code paths, with baseline comparison.
+
+Cases:
+- generator.<size>x<size>.f<fullness>   puzzles.generate_binary_puzzle
+- hints.get_possible_moves.<size>       rule-based move finder behind /ai/hint
+- hints.parse_grid_state.<size>.<fmt>   flat ("01.") and JSON grid parsing
+- ranking.rank_solves.<n>               ranking of n completed solves (in memory)
+- ranking.calculate_daily_ranking.<n>   the same through the database (SQLite)
+- startup.import_<module>               fresh interpreter importing main / auth.hashing
+                                        (per-module breakdown: benchmarks/startup.py)
+
+Cases are generators of (name, per_call, setup); setup() does the expensive
+preparation (database seeding, puzzle generation) and returns the function to
+time, so cases filtered out with -k cost nothing. Every case is timed with timeit (auto-ranged loop count, best-of-N rounds)
+from fixed random seeds, so runs on one machine are comparable.
+
+Run:
+    python benchmarks/run.py [-k ranking] [--quick] [--output results.json]
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --compare benchmarks/baseline.json [--threshold 0.15]
+
+--compare exits with status 1 when a case's best round (min_us, the least
+noisy statistic on a shared machine) is more than --threshold (default 20%)
+slower than in the baseline.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+import uuid
+from datetime import datetime, date
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_run_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(TMP_DIR, 'bench.db')}")
+
+from puzzles import generate_binary_puzzle
+
+SIZES = (4, 6, 8, 10)
+FULLNESS = (20, 50, 80)
+SOLVE_COUNTS = (1_000, 10_000, 100_000)
+GENERATOR_BATCH = 20
+
+
+def measure(fn, repeat: int, min_time: float, per_call: int = 1) -> dict:
+    timer = timeit.Timer(fn)
+    loops = 1
+    while True:
+        elapsed = timer.timeit(loops)
+        if elapsed >= min_time:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+    rounds = [t / loops / per_call for t in timer.repeat(repeat=repeat, number=loops)]
+    return {
+        "median_us": round(statistics.median(rounds) * 1e6, 3),
+        "min_us": round(min(rounds) * 1e6, 3),
+        "mean_us": round(statistics.mean(rounds) * 1e6, 3),
+        "ops_per_sec": round(1 / statistics.median(rounds), 1),
+        "loops": loops,
+        "rounds": repeat,
+    }
+
+
+def generator_cases():
+    # the backtracking time varies a lot between boards: every call generates
+    # the same GENERATOR_BATCH boards (fixed seed), timings are per board
+    for size in SIZES:
+        for fullness in FULLNESS:
+            def run(size=size, fullness=fullness):
+                random.seed(size * 100 + fullness)
+                for _ in range(GENERATOR_BATCH):
+                    generate_binary_puzzle(size, fullness)
+            yield f"generator.{size}x{size}.f{fullness}", GENERATOR_BATCH, lambda run=run: run
+
+
+@functools.cache
+def hint_grid(size: int) -> tuple[str, str]:
+    """(flat, JSON) initial grid of a fixed-seed puzzle of the size."""
+    from routers.ai import parse_grid_state
+
+    random.seed(size)
+    _, initial = generate_binary_puzzle(size, 50)
+    return initial, json.dumps(parse_grid_state(initial, size))
+
+
+def hint_cases():
+    try:
+        from routers.ai import get_possible_moves, parse_grid_state
+    except ImportError as e:
+        print(f"skipping hints.*: {e}", file=sys.stderr)
+        return
+    for size in SIZES:
+        def moves(s=size):
+            grid = hint_grid(s)[0]
+            return lambda: get_possible_moves(grid, s)
+
+        def parse(s=size, fmt=0):
+            grid = hint_grid(s)[fmt]
+            return lambda: parse_grid_state(grid, s)
+
+        yield f"hints.get_possible_moves.{size}", 1, moves
+        yield f"hints.parse_grid_state.{size}.flat", 1, parse
+        yield f"hints.parse_grid_state.{size}.json", 1, lambda s=size: parse(s, 1)
+
+
+def synthetic_solves(count: int, rng: random.Random) -> list[dict]:
+    return [
+        {
+            "user_id": uuid.UUID(int=rng.getrandbits(128)),
+            "mistakes": rng.randint(0, 5),
+            "hints_used": rng.randint(0, 3),
+            "time_seconds": rng.randint(30, 900),
+        }
+        for _ in range(count)
+    ]
+
+
+@functools.cache
+def seed_rankings(counts: tuple[int, ...]) -> dict[int, date]:
+    """One daily puzzle per count, solved by that many users. Returns {count: date}."""
+    from sqlalchemy import insert
+
+    from db import Base, engine, SessionLocal
+    from models import User, Puzzle, DailyPuzzle, Solve
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(0)
+    user_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(max(counts))]
+    days = {}
+    db = SessionLocal()
+    try:
+        db.execute(insert(User), [
+            {"id": user_id, "login": f"bench_{i}", "email": f"bench_{i}@example.com",
+             "password_hash": "x", "nick": f"Bench {i}"}
+            for i, user_id in enumerate(user_ids)
+        ])
+        for offset, count in enumerate(counts):
+            puzzle_id = uuid.uuid4()
+            days[count] = date(2020, 1, 1 + offset)
+            db.execute(insert(Puzzle), [{"id": puzzle_id, "type": "daily", "difficulty": 3, "size": 6,
+                                         "grid_solution": "0" * 36, "grid_initial": "." * 36,
+                                         "created_at": datetime.utcnow()}])
+            db.execute(insert(DailyPuzzle), [{"date": days[count], "puzzle_id": puzzle_id}])
+            db.execute(insert(Solve), [
+                {"id": uuid.uuid4(), "puzzle_id": puzzle_id, "completed": True, **solve, "user_id": user_id}
+                for solve, user_id in zip(synthetic_solves(count, rng), user_ids)
+            ])
+        db.commit()
+    finally:
+        db.close()
+    return days
+
+
+def ranking_cases(counts, with_db: bool):
+    from routers.rankings import rank_solves, calculate_daily_ranking
+
+    for count in counts:
+        def in_memory(count=count):
+            solves = [SimpleNamespace(**solve) for solve in synthetic_solves(count, random.Random(count))]
+            return lambda: rank_solves(solves)
+        yield f"ranking.rank_solves.{count}", 1, in_memory
+
+    if not with_db:
+        return
+    from db import SessionLocal
+
+    for count in counts:
+        def through_db(count=count):
+            # seeded once, on the first database case that is not filtered out
+            day = seed_rankings(tuple(counts))[count]
+
+            def run():
+                db = SessionLocal()
+                try:
+                    calculate_daily_ranking(day, db)
+                finally:
+                    db.close()
+            return run
+        yield f"ranking.calculate_daily_ranking.{count}", 1, through_db
+
+
+def startup_cases():
+    # a new process per call, interpreter start included; the hash worker is
+    # what every spawned password-hashing process imports
+    for name, module in (("main", "main"), ("hash_worker", "auth.hashing")):
+        command = [sys.executable, "-c", f"import {module}"]
+        yield (f"startup.import_{name}", 1,
+               lambda command=command: lambda: subprocess.run(command, cwd=ROOT_DIR, check=True, capture_output=True))
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    """Prints the comparison table; returns the names of regressed cases."""
+    previous = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'benchmark':<42} {'base min':>11} {'now min':>11} {'change':>8}")
+    for r in results:
+        base = previous.get(r["name"])
+        if base is None:
+            print(f"{r['name']:<42} {'-':>11} {r['min_us']:>11} {'new':>8}")
+            continue
+        change = r["min_us"] / base["min_us"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(r["name"])
+            flag = "  REGRESSION"
+        print(f"{r['name']:<42} {base['min_us']:>11} {r['min_us']:>11} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-k", dest="keyword", help="only cases whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="fewer rounds, no 100k ranking")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--no-db", action="store_true", help="skip the database-backed ranking cases")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write results as the new baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown vs baseline")
+    args = parser.parse_args()
+
+    repeat, min_time = (3, 0.05) if args.quick else (args.repeat, args.min_time)
+    counts = SOLVE_COUNTS[:2] if args.quick else SOLVE_COUNTS
+    groups = (generator_cases(), hint_cases(), ranking_cases(counts, with_db=not args.no_db), startup_cases())
+
+    results = []
+    print(f"{'benchmark':<42} {'median us':>11} {'min us':>11} {'ops/s':>11}")
+    for group in groups:
+        for name, per_call, setup in group:
+            if args.keyword and args.keyword not in name:
+                continue
+            stats = measure(setup(), repeat, min_time, per_call)
+            results.append({"name": name, **stats})
+            print(f"{name:<42} {stats['median_us']:>11} {stats['min_us']:>11} {stats['ops_per_sec']:>11}")
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpu)",
+        "results": results,
+    }
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
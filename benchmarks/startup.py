@@ -0,0 +1,118 @@
+"""
+Cold start of the API process: import time of main, broken down by module.
+
+Every measurement runs in a fresh interpreter (`python -X importtime`), so
+nothing is cached in sys.modules. Reported:
+
+- wall time to `import main` (median / min over --runs), also with
+  AI_ROUTES_ENABLED=0 and for auth.hashing alone (what every spawned
+  password-hashing worker imports);
+- the app's own modules with their self / cumulative import time;
+- the heaviest third-party packages imported directly by app modules.
+
+Run:
+    python benchmarks/startup.py [--runs 5] [--top 15] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_startup_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(TMP_DIR, 'bench.db')}")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+VARIANTS = (
+    ("import main", "main", {}),
+    ("import main (AI_ROUTES_ENABLED=0)", "main", {"AI_ROUTES_ENABLED": "0"}),
+    ("import auth.hashing (hash worker)", "auth.hashing", {}),
+)
+
+
+def local_packages() -> set[str]:
+    names = set()
+    for entry in os.listdir(ROOT_DIR):
+        path = os.path.join(ROOT_DIR, entry)
+        if entry.endswith(".py"):
+            names.add(entry[:-3])
+        elif os.path.isdir(path) and not entry.startswith((".", "_")) and entry != "benchmarks":
+            names.add(entry)
+    return names
+
+
+def import_seconds(module: str, env: dict) -> float:
+    """Time a fresh interpreter spends importing module."""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, env={**os.environ, **env},
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def import_tree(module: str, env: dict) -> list[tuple[int, int, int, str]]:
+    """(self_us, cumulative_us, depth, name) per module, in -X importtime order."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT_DIR,
+                            env={**os.environ, **env}, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append((int(match[1]), int(match[2]), len(match[3]) // 2, match[4]))
+    return rows
+
+
+def breakdown(rows, local: set[str], top: int) -> tuple[list[dict], list[dict]]:
+    """App modules, and the heaviest third-party imports made directly by app modules."""
+    app_modules, third_party = [], {}
+    for i, (self_us, cumulative_us, depth, name) in enumerate(rows):
+        if name.split(".")[0] in local:
+            app_modules.append({"module": name, "self_ms": round(self_us / 1000, 1),
+                                "cumulative_ms": round(cumulative_us / 1000, 1)})
+            continue
+        # children are listed before their parent: the importer is the next shallower row
+        parent = next((row[3] for row in rows[i + 1:] if row[2] < depth), None)
+        if parent is not None and parent.split(".")[0] in local:
+            package = name.split(".")[0]
+            third_party[package] = third_party.get(package, 0) + cumulative_us
+    heaviest = sorted(third_party.items(), key=lambda item: item[1], reverse=True)[:top]
+    return app_modules, [{"package": name, "cumulative_ms": round(us / 1000, 1)} for name, us in heaviest]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per variant")
+    parser.add_argument("--top", type=int, default=15, help="third-party packages to list")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    timings = []
+    for label, module, env in VARIANTS:
+        runs = [import_seconds(module, env) for _ in range(args.runs)]
+        timings.append({"variant": label, "median_ms": round(statistics.median(runs) * 1000, 1),
+                        "min_ms": round(min(runs) * 1000, 1)})
+
+    app_modules, third_party = breakdown(import_tree("main", {}), local_packages(), args.top)
+    report = {"timings": timings, "app_modules": app_modules, "third_party": third_party}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'variant':<40} {'median ms':>10} {'min ms':>10}")
+    for t in timings:
+        print(f"{t['variant']:<40} {t['median_ms']:>10} {t['min_ms']:>10}")
+    print(f"\n{'app module':<40} {'self ms':>10} {'cum ms':>10}")
+    for m in app_modules:
+        print(f"{m['module']:<40} {m['self_ms']:>10} {m['cumulative_ms']:>10}")
+    print(f"\n{'third-party (imported by app modules)':<40} {'cum ms':>10}")
+    for p in third_party:
+        print(f"{p['package']:<40} {p['cumulative_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Creates a ready-to-use SQLite database, so the API and its benchmarks run on
+one box without SQL Server.
+
+    python bootstrap_sqlite.py [--path binarygame.db] [--reset] [--no-seed]
+
+Creates all tables, stamps the Alembic head (later migrations then apply with
+`alembic upgrade head`), and seeds the story levels and the daily puzzles.
+Start the API against it with:
+
+    DATABASE_URL=sqlite:///binarygame.db python -m uvicorn main:app
+"""
+import argparse
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--path", default="binarygame.db", help="SQLite database file")
+    parser.add_argument("--reset", action="store_true", help="delete an existing database first")
+    parser.add_argument("--no-seed", action="store_true", help="skip story levels and daily puzzles")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.path)
+    if args.reset:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    url = f"sqlite:///{path}"
+    # db reads DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = url
+
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+
+    from db import Base, engine, SessionLocal, describe_engine
+    import models  # noqa: F401 - registers the tables on Base.metadata
+
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+    print(f"Database: {describe_engine()}")
+    print(f"  ✓ Tables created ({len(Base.metadata.tables)}), journal_mode={journal_mode}")
+
+    alembic_cfg = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    command.stamp(alembic_cfg, "head")
+    print("  ✓ Alembic stamped at head")
+
+    if not args.no_seed:
+        from routers.admin import populate_story_mode, generate_missing_daily_puzzles
+
+        db = SessionLocal()
+        try:
+            story = populate_story_mode(db=db)
+            daily = generate_missing_daily_puzzles(db=db)
+        finally:
+            db.close()
+        print(f"  ✓ Story levels: {story['created']} created, {story['skipped']} unchanged")
+        print(f"  ✓ Daily puzzles: {daily['created']} created ({daily['start_date']} .. {daily['end_date']})")
+
+    print(f"\n✅ SQLite database ready: DATABASE_URL={url}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Denormalized stats counters.
+
+- User.total_solves      - number of completed solves of the user
+- AiHintCounter.hints_used - number of AI hints used per (user, puzzle)
+
+Counters are changed with SQL-side increments inside the same transaction that
+writes the Solve / AiHint rows, so they commit (or roll back) together.
+reconcile_counters() recomputes them from the source tables and repairs drift
+(run: python reconcile_counters.py).
+"""
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.models import User, Solve, AiHint, AiHintCounter
+
+
+def add_completed_solves(db: Session, user_id, delta: int) -> None:
+    """Changes User.total_solves by delta (no-op for 0). Does not commit."""
+    if not delta:
+        return
+    db.query(User).filter(User.id == user_id).update(
+        {User.total_solves: User.total_solves + delta},
+        synchronize_session=False
+    )
+
+
+def remove_puzzle_solves(db: Session, puzzle_id) -> None:
+    """Decrements total_solves of every user with a completed solve of the puzzle
+    (call before the puzzle and its solves are deleted). Does not commit."""
+    solvers = select(Solve.user_id).where(
+        Solve.puzzle_id == puzzle_id,
+        Solve.completed == True
+    )
+    db.query(User).filter(User.id.in_(solvers)).update(
+        {User.total_solves: User.total_solves - 1},
+        synchronize_session=False
+    )
+
+
+def increment_hints_used(db: Session, user_id, puzzle_id) -> int:
+    """Increments the hint counter of (user, puzzle) and returns the new value.
+    Does not commit."""
+    counter = db.query(AiHintCounter).filter(
+        AiHintCounter.user_id == user_id,
+        AiHintCounter.puzzle_id == puzzle_id
+    ).with_for_update().first()
+
+    if counter is None:
+        try:
+            with db.begin_nested():
+                counter = AiHintCounter(user_id=user_id, puzzle_id=puzzle_id, hints_used=1)
+                db.add(counter)
+            return 1
+        except IntegrityError:
+            # Concurrent first hint for the same pair - fall back to the increment
+            counter = db.query(AiHintCounter).filter(
+                AiHintCounter.user_id == user_id,
+                AiHintCounter.puzzle_id == puzzle_id
+            ).with_for_update().one()
+
+    counter.hints_used = AiHintCounter.hints_used + 1
+    db.flush()
+    return counter.hints_used
+
+
+def reconcile_counters(db: Session) -> dict:
+    """Recomputes all counters from solves / ai_hints and fixes the ones that drifted.
+    Commits the repairs and returns how many rows were changed."""
+    completed = (
+        select(func.count(Solve.id))
+        .where(Solve.user_id == User.id, Solve.completed == True)
+        .scalar_subquery()
+    )
+    users_fixed = db.query(User).filter(User.total_solves != completed).update(
+        {User.total_solves: completed},
+        synchronize_session=False
+    )
+
+    actual = {
+        (str(user_id), str(puzzle_id)): (user_id, puzzle_id, count)
+        for user_id, puzzle_id, count in db.query(
+            AiHint.user_id, AiHint.puzzle_id, func.count(AiHint.id)
+        ).group_by(AiHint.user_id, AiHint.puzzle_id)
+    }
+
+    hints_fixed = 0
+    hints_created = 0
+    hints_deleted = 0
+    for counter in db.query(AiHintCounter).all():
+        key = (str(counter.user_id), str(counter.puzzle_id))
+        _, _, count = actual.pop(key, (None, None, 0))
+        if count == 0:
+            db.delete(counter)
+            hints_deleted += 1
+        elif counter.hints_used != count:
+            counter.hints_used = count
+            hints_fixed += 1
+
+    for user_id, puzzle_id, count in actual.values():
+        db.add(AiHintCounter(user_id=user_id, puzzle_id=puzzle_id, hints_used=count))
+        hints_created += 1
+
+    db.commit()
+    return {
+        "users_fixed": users_fixed,
+        "hint_counters_fixed": hints_fixed,
+        "hint_counters_created": hints_created,
+        "hint_counters_deleted": hints_deleted
+    }
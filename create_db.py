@@ -3,7 +3,7 @@ Simple script to create all database tables from scratch.
 Run this to initialize the database.
 """
 from db import Base, engine
-from models import User, Session, Puzzle, StoryPuzzle, DailyPuzzle, Solve, DailyRanking, AiHint
+from models import User, UserAvatar, Session, Puzzle, StoryPuzzle, DailyPuzzle, Solve, DailyRanking, AiHint, AiHintCounter
 
 print("Creating all tables from models (if they don't exist)...")
 Base.metadata.create_all(bind=engine)
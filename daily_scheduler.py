@@ -0,0 +1,297 @@
+"""
+Keeps the daily puzzles generated ahead of time and the next one warm.
+
+A daemon thread (started with the app, or standalone: `python daily_scheduler.py`)
+does two jobs:
+
+- top-up, once a day at DAILY_TOP_UP_AT (UTC, off-peak) and at startup: makes
+  sure a DailyPuzzle row exists for today and the next DAILY_HORIZON_DAYS days,
+  through backfill_daily_puzzles (one read, bulk inserts). Only the process holding the lock file
+  DAILY_SCHEDULER_LOCK_FILE does it, other workers on the host skip the run.
+- pre-warm, DAILY_PREWARM_MINUTES before the UTC rollover (and for today at
+  startup): loads the next day's puzzle into this worker's puzzle_cache and
+  pre-computes its initial-state deductions for /ai/hint (if mounted). Caches are per
+  process, so every worker pre-warms its own.
+
+Set DAILY_SCHEDULER_ENABLED=0 to run without the thread (e.g. when a separate
+`python daily_scheduler.py --once` cron job does the top-up).
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta
+
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from db import SessionLocal
+from models.models import Puzzle, DailyPuzzle
+import schemas
+from puzzles import generate_binary_puzzles
+from puzzle_cache import puzzle_cache, daily_key, invalidate_daily
+
+logger = logging.getLogger(__name__)
+
+DAILY_SCHEDULER_ENABLED = os.getenv("DAILY_SCHEDULER_ENABLED", "1").lower() not in {"0", "false", "no"}
+DAILY_HORIZON_DAYS = int(os.getenv("DAILY_HORIZON_DAYS", "30"))
+DAILY_TOP_UP_AT = os.getenv("DAILY_TOP_UP_AT", "03:00")
+DAILY_PREWARM_MINUTES = float(os.getenv("DAILY_PREWARM_MINUTES", "15"))
+# below DAILY_GENERATE_PARALLEL_MIN puzzles, spawning the pool costs more than it saves
+DAILY_GENERATE_WORKERS = int(os.getenv("DAILY_GENERATE_WORKERS", str(max(1, min(4, os.cpu_count() or 1)))))
+DAILY_GENERATE_PARALLEL_MIN = int(os.getenv("DAILY_GENERATE_PARALLEL_MIN", "2000"))
+DAILY_SCHEDULER_LOCK_FILE = os.getenv(
+    "DAILY_SCHEDULER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "binarygame-daily-scheduler.lock")
+)
+
+
+@contextmanager
+def try_lock(path: str):
+    """Non-blocking exclusive lock on a file; yields False if another process holds it."""
+    handle = open(path, "a+")
+    try:
+        try:
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        yield True
+        # the lock goes away with the file handle
+    finally:
+        handle.close()
+
+
+def backfill_daily_puzzles(db, start: date, end: date) -> tuple[int, int]:
+    """Generates a daily puzzle for every date in [start, end] that has none,
+    with one read and bulk inserts. Returns (created, skipped).
+
+    Raises IntegrityError (after a rollback) when another process inserted
+    some of the same dates meanwhile."""
+    days = (end - start).days + 1
+    existing = {
+        row.date for row in db.query(DailyPuzzle.date).filter(DailyPuzzle.date.between(start, end))
+    }
+    window = (start + timedelta(days=offset) for offset in range(days))
+    missing = [day for day in window if day not in existing]
+    if not missing:
+        return 0, len(existing)
+
+    workers = DAILY_GENERATE_WORKERS if len(missing) >= DAILY_GENERATE_PARALLEL_MIN else 1
+    grids = generate_binary_puzzles(len(missing), size=6, fullness=50, workers=workers)
+    now = datetime.utcnow()
+    puzzle_rows = [
+        {
+            "id": uuid.uuid4(),
+            "type": "daily",
+            "difficulty": 3,
+            "size": 6,
+            "grid_solution": solution,
+            "grid_initial": initial,
+            "created_at": now,
+        }
+        for solution, initial in grids
+    ]
+    daily_rows = [
+        {"date": day, "puzzle_id": row["id"]} for day, row in zip(missing, puzzle_rows)
+    ]
+    try:
+        # executemany batches in one transaction instead of a flush per row
+        db.execute(insert(Puzzle), puzzle_rows)
+        db.execute(insert(DailyPuzzle), daily_rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise
+    # drop cached "no puzzle for this date" results
+    invalidate_daily()
+    return len(missing), len(existing)
+
+
+def load_daily_puzzle(db, day: date) -> schemas.PuzzlePublic | None:
+    puzzle = (
+        db.query(Puzzle)
+        .join(DailyPuzzle, DailyPuzzle.puzzle_id == Puzzle.id)
+        .filter(DailyPuzzle.date == day)
+        .first()
+    )
+    return schemas.PuzzlePublic.model_validate(puzzle) if puzzle else None
+
+
+class DailyScheduler:
+    def __init__(self, horizon_days: int = DAILY_HORIZON_DAYS, top_up_at: str = DAILY_TOP_UP_AT,
+                 prewarm_minutes: float = DAILY_PREWARM_MINUTES, lock_path: str = DAILY_SCHEDULER_LOCK_FILE,
+                 enabled: bool = DAILY_SCHEDULER_ENABLED):
+        self.horizon_days = horizon_days
+        self.top_up_at = datetime.strptime(top_up_at, "%H:%M").time()
+        self.prewarm_minutes = prewarm_minutes
+        self.lock_path = lock_path
+        self.enabled = enabled
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._stats_lock = threading.Lock()
+
+        self.top_ups = 0
+        self.top_ups_skipped = 0
+        self.last_top_up_at: datetime | None = None
+        self.last_top_up_created = 0
+        self.total_created = 0
+        self.prewarms = 0
+        self.last_prewarm_at: datetime | None = None
+        self.last_prewarm_date: date | None = None
+        self.next_run_at: datetime | None = None
+        self.next_job: str | None = None
+        self.last_error: str | None = None
+
+    def top_up(self) -> int | None:
+        """Generates the missing daily puzzles up to the horizon. None: another process holds the lock."""
+        today = datetime.utcnow().date()
+        with try_lock(self.lock_path) as locked:
+            if not locked:
+                with self._stats_lock:
+                    self.top_ups_skipped += 1
+                return None
+            db = SessionLocal()
+            try:
+                created, _ = backfill_daily_puzzles(db, today, today + timedelta(days=self.horizon_days))
+            finally:
+                db.close()
+
+        with self._stats_lock:
+            self.top_ups += 1
+            self.last_top_up_at = datetime.utcnow()
+            self.last_top_up_created = created
+            self.total_created += created
+        return created
+
+    def prewarm(self, day: date) -> bool:
+        """Loads the day's puzzle into puzzle_cache and pre-computes its initial hints."""
+        db = SessionLocal()
+        try:
+            puzzle_cache.invalidate(daily_key(day))
+            puzzle = puzzle_cache.get_or_load(daily_key(day), lambda: load_daily_puzzle(db, day))
+        finally:
+            db.close()
+        # hints only where the AI routes are mounted (see main.AI_ROUTES_ENABLED)
+        ai = sys.modules.get("routers.ai")
+        if puzzle is not None and ai is not None:
+            ai.initial_moves(puzzle.grid_initial, puzzle.size)
+
+        with self._stats_lock:
+            self.prewarms += 1
+            self.last_prewarm_at = datetime.utcnow()
+            self.last_prewarm_date = day
+        return puzzle is not None
+
+    def next_run(self, now: datetime) -> tuple[datetime, str]:
+        """(when, job) of the next scheduled job after now."""
+        top_up = datetime.combine(now.date(), self.top_up_at)
+        if top_up <= now:
+            top_up += timedelta(days=1)
+        midnight = datetime.combine(now.date() + timedelta(days=1), dt_time.min)
+        prewarm = midnight - timedelta(minutes=self.prewarm_minutes)
+        if prewarm <= now:
+            prewarm += timedelta(days=1)
+        return (top_up, "top_up") if top_up < prewarm else (prewarm, "prewarm")
+
+    def _run_job(self, job: str) -> None:
+        try:
+            if job == "top_up":
+                created = self.top_up()
+                if created:
+                    logger.info(f"Daily scheduler: generated {created} daily puzzles")
+            else:
+                day = datetime.utcnow().date() + timedelta(days=1)
+                if not self.prewarm(day):
+                    logger.warning(f"Daily scheduler: no daily puzzle for {day.isoformat()} to pre-warm")
+            self.last_error = None
+        except IntegrityError as e:
+            # another process inserted some of the same dates meanwhile
+            self.last_error = repr(e)
+            logger.warning("Daily scheduler job skipped",
+                           extra={"job": job, "reason": "daily puzzles were created concurrently"})
+        except Exception as e:
+            self.last_error = repr(e)
+            logger.exception(f"Daily scheduler {job} failed")
+
+    def _loop(self) -> None:
+        # catch up right away: after downtime the horizon may have run short
+        self._run_job("top_up")
+        try:
+            self.prewarm(datetime.utcnow().date())
+        except Exception as e:
+            self.last_error = repr(e)
+            logger.exception("Daily scheduler prewarm failed")
+        while not self._stop.is_set():
+            run_at, job = self.next_run(datetime.utcnow())
+            self.next_run_at, self.next_job = run_at, job
+            if self._stop.wait(max(0.0, (run_at - datetime.utcnow()).total_seconds())):
+                break
+            self._run_job(job)
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="daily-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def info(self) -> dict:
+        with self._stats_lock:
+            return {
+                "running": self._thread is not None,
+                "horizon_days": self.horizon_days,
+                "top_up_at": self.top_up_at.strftime("%H:%M"),
+                "prewarm_minutes": self.prewarm_minutes,
+                "top_ups": self.top_ups,
+                "top_ups_skipped": self.top_ups_skipped,
+                "last_top_up_at": self.last_top_up_at.isoformat() if self.last_top_up_at else None,
+                "last_top_up_created": self.last_top_up_created,
+                "total_created": self.total_created,
+                "prewarms": self.prewarms,
+                "last_prewarm_at": self.last_prewarm_at.isoformat() if self.last_prewarm_at else None,
+                "last_prewarm_date": self.last_prewarm_date.isoformat() if self.last_prewarm_date else None,
+                "next_job": self.next_job,
+                "next_run_at": self.next_run_at.isoformat() if self.next_run_at else None,
+                "last_error": self.last_error,
+            }
+
+
+daily_scheduler = DailyScheduler()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates daily puzzles ahead of time.")
+    parser.add_argument("--once", action="store_true", help="run one top-up and exit (for cron)")
+    parser.add_argument("--horizon", type=int, default=DAILY_HORIZON_DAYS, help="days to keep generated ahead")
+    args = parser.parse_args()
+
+    scheduler = DailyScheduler(horizon_days=args.horizon, enabled=True)
+    if args.once:
+        created = scheduler.top_up()
+        print("Another process holds the lock, skipped" if created is None else f"Generated {created} daily puzzles")
+        return
+    scheduler.start()
+    try:
+        scheduler._thread.join()
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,154 @@
-import os
+import logging
+
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from settings import get_database_settings
+from metrics import count_statement
+from profiling import mark_statement_thread
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+db_settings = get_database_settings()
+DATABASE_URL = db_settings.url
+
+
+def engine_options(settings, is_async: bool = False) -> dict:
+    options = {
+        # DB_ECHO is applied as the sqlalchemy.engine log level below: echo=True
+        # would attach SQLAlchemy's own synchronous stdout handler
+        "echo": False,
+        "future": True,
+        "pool_pre_ping": settings.pool_pre_ping,
+    }
+    if settings.is_sqlite_memory:
+        # in-memory SQLite lives in one connection (SingletonThreadPool / StaticPool)
+        return options
+    options.update(
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+    )
+    if settings.is_pyodbc:
+        options["fast_executemany"] = settings.fast_executemany
+    if settings.is_sqlite and is_async:
+        # aiosqlite defaults to NullPool - a new connection (and pragmas) per session
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return options
+
+
+engine = create_engine(DATABASE_URL, **engine_options(db_settings))
+if db_settings.echo:
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+
+def set_statement_timeout(dbapi_connection, connection_record):
+    # pyodbc query timeout (seconds), applies to every cursor of the connection;
+    # under aioodbc the pyodbc connection sits behind the async adapter
+    raw = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+    raw = getattr(raw, "_conn", raw)
+    raw.timeout = db_settings.statement_timeout_seconds
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if not db_settings.is_sqlite_memory:
+        # WAL: readers don't block the writer; NORMAL is durable in WAL mode
+        # except for the last transactions on power loss
+        cursor.execute(f"PRAGMA journal_mode={db_settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA mmap_size={int(db_settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA synchronous={db_settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA cache_size=-{int(db_settings.sqlite_cache_size_kib)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(db_settings.sqlite_busy_timeout_ms)}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def install_connect_hooks(sync_engine) -> None:
+    if db_settings.is_pyodbc and db_settings.statement_timeout_seconds:
+        event.listen(sync_engine, "connect", set_statement_timeout)
+    if db_settings.is_sqlite:
+        event.listen(sync_engine, "connect", apply_sqlite_pragmas)
+    # per-request SQL statement counts for /metrics
+    event.listen(sync_engine, "before_cursor_execute", count_statement)
+    # threads running a profiled request's queries join its profile
+    event.listen(sync_engine, "before_cursor_execute", mark_statement_thread)
 
-if not DATABASE_URL:
-    DATABASE_URL = r"mssql+pyodbc://@(localdb)\MSSQLLocalDB/BinaryGame?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes"
 
-engine = create_engine(
-    DATABASE_URL,
-    echo=True,
-    future=True,
-    pool_pre_ping=True,
-)
+install_connect_hooks(engine)
+
+
+def describe_engine() -> str:
+    """One-line summary of the effective engine/pool configuration (for the startup log)."""
+    pool = engine.pool
+    parts = [
+        f"env={db_settings.app_env}",
+        f"url={engine.url.render_as_string(hide_password=True)}",
+        f"pool={type(pool).__name__}",
+    ]
+    if hasattr(pool, "size") and not db_settings.is_sqlite_memory:
+        parts += [
+            f"size={pool.size()}",
+            f"max_overflow={db_settings.max_overflow}",
+            f"timeout={db_settings.pool_timeout}s",
+            f"recycle={db_settings.pool_recycle}s",
+        ]
+    if db_settings.is_sqlite and not db_settings.is_sqlite_memory:
+        parts += [
+            f"journal_mode={db_settings.sqlite_journal_mode}",
+            f"synchronous={db_settings.sqlite_synchronous}",
+            f"mmap_size={db_settings.sqlite_mmap_size}",
+        ]
+    if db_settings.is_pyodbc:
+        parts += [
+            f"statement_timeout={db_settings.statement_timeout_seconds}s",
+            f"fast_executemany={db_settings.fast_executemany}",
+        ]
+    parts.append(f"echo={db_settings.echo}")
+    return " ".join(parts)
+
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+# Async path (get_async_db) - the engine is created on first use, so code that
+# only uses SessionLocal does not need the async driver (aioodbc / aiosqlite).
+_async_engine: AsyncEngine | None = None
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            db_settings.effective_async_url, **engine_options(db_settings, is_async=True)
+        )
+        install_connect_hooks(_async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,64 @@
+"""
+HTTP conditional caching helpers (ETag / If-None-Match / Cache-Control).
+
+Endpoints compute a strong ETag from data they already have (puzzle id and
+version fields, the ranking rows), then call conditional(): it sets the
+headers on the response and returns a bare 304 when the client's copy is
+current, which skips serializing the body.
+"""
+import hashlib
+from datetime import date, datetime, timedelta
+
+from fastapi import Request, Response
+
+NO_STORE = "no-store"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def public(max_age: int) -> str:
+    return f"public, max-age={max(0, int(max_age))}"
+
+
+def strong_etag(*parts) -> str:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it)."""
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def conditional(request: Request, response: Response, etag: str, cache_control: str) -> Response | None:
+    """Sets ETag / Cache-Control on response; returns the 304 to send instead, if any."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def seconds_until_midnight() -> int:
+    now = datetime.utcnow()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return int((midnight - now).total_seconds())
+
+
+def puzzle_etag(puzzle) -> str:
+    """Puzzle id + created_at identify the payload; difficulty and grid are
+    included because /admin/puzzles/{id} can still edit them."""
+    return strong_etag(puzzle.id, puzzle.created_at, puzzle.difficulty, puzzle.grid_initial)
+
+
+def daily_cache_control(day: date, max_age_today: int) -> str:
+    """Past days never change; today's content switches at the UTC rollover."""
+    today = datetime.utcnow().date()
+    if day < today - timedelta(days=1):
+        return IMMUTABLE
+    if day < today:
+        # late solves from players west of UTC still land on yesterday
+        return public(max_age_today * 10)
+    return public(min(max_age_today, seconds_until_midnight()))
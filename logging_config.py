@@ -0,0 +1,199 @@
+"""
+Structured, non-blocking logging for the API.
+
+configure_logging() routes every record through a bounded in-memory queue: the
+logging thread only enqueues it (QueueHandler), one QueueListener thread
+formats and writes to stdout. When the queue is full the record is dropped
+and counted instead of blocking the request (see logging_stats()).
+
+- LOG_FORMAT: json (one object per line: ts, level, logger, msg, request_id
+  and any `extra=` fields) or text.
+- LOG_LEVEL: root level; LOG_LEVELS: per-module overrides, e.g.
+  "routers.ai=DEBUG,sqlalchemy.engine=INFO".
+- LOG_DEBUG_SAMPLE_RATE: share of requests whose verbose debug payloads
+  (prompts, hint lists) are logged - guard them with debug_sampled().
+- Request IDs: RequestIdMiddleware takes X-Request-ID (or makes one), puts it
+  on every record logged while handling the request and echoes it back.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json | text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+_request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("request_id", default=None)
+_debug_sampled: contextvars.ContextVar[bool | None] = contextvars.ContextVar("debug_sampled", default=None)
+
+# attributes every LogRecord has; anything else came in through extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def get_request_id() -> str | None:
+    return _request_id.get()
+
+
+def debug_sampled(logger: logging.Logger) -> bool:
+    """True if verbose debug payloads should be logged for the current request.
+
+    Decided once per request (LOG_DEBUG_SAMPLE_RATE), so a sampled request
+    logs all of its payloads; checked before the payload is even built.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    sampled = _debug_sampled.get()
+    if sampled is None:
+        sampled = random.random() < LOG_DEBUG_SAMPLE_RATE
+        _debug_sampled.set(sampled)
+    return sampled
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # only what depends on the caller (request id, mutable args) is resolved
+        # here; the JSON / text formatting happens in the listener thread
+        record.request_id = _request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """Plain text line with the request id appended."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} [{request_id}]" if request_id else line
+
+
+_listener: logging.handlers.QueueListener | None = None
+_queue_handler: DroppingQueueHandler | None = None
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: str = LOG_LEVEL, levels: str = LOG_LEVELS, fmt: str = LOG_FORMAT) -> None:
+    """Installs the queue pipeline on the root logger (idempotent)."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    _queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(level)
+    for name, module_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Stops the listener after it has written everything still queued."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> dict:
+    handler = _queue_handler
+    return {
+        "queued": handler.queue.qsize() if handler else 0,
+        "queue_size": LOG_QUEUE_SIZE,
+        "dropped": handler.dropped if handler else 0,
+    }
+
+
+class RequestIdMiddleware:
+    """Pure ASGI middleware: sets the request id for the request's log records."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = _request_id.set(request_id)
+        sampled_token = _debug_sampled.set(None)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
+            _debug_sampled.reset(sampled_token)
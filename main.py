@@ -1,9 +1,26 @@
+import logging
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 
 # Import all routers
-from routers import auth, users, puzzles, solves, rankings, calendar, ai, admin
+from routers import auth, users, puzzles, solves, rankings, calendar, admin
+from db import describe_engine, dispose_async_engine
+from auth.hashing import password_hasher
+from auth.session_reaper import session_reaper
+from daily_scheduler import daily_scheduler
+from auth.session_cache import get_session_cache
+from puzzle_cache import puzzle_cache
+from metrics import MetricsMiddleware, metrics_response, registry
+from logging_config import configure_logging, logging_stats, RequestIdMiddleware
+from profiling import ProfilingMiddleware, profiler
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# AI_ROUTES_ENABLED=0: no /ai routes, and routers.ai / ai_model are never imported
+AI_ROUTES_ENABLED = os.getenv("AI_ROUTES_ENABLED", "1").lower() not in {"0", "false", "no"}
 
 app = FastAPI(
     title="Binary Game API",
@@ -19,6 +36,63 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# inside the timing middleware: profiles only the app's own work
+app.add_middleware(ProfilingMiddleware)
+# times every request, including CORS preflights
+app.add_middleware(MetricsMiddleware)
+# outermost: the request id is set before anything else logs
+app.add_middleware(RequestIdMiddleware)
+
+registry.register_collector("session_cache", lambda: get_session_cache().info())
+registry.register_collector("password_hashing", password_hasher.info)
+registry.register_collector("puzzle_cache", puzzle_cache.info)
+registry.register_collector("daily_scheduler", daily_scheduler.info)
+registry.register_collector("logging", logging_stats)
+registry.register_collector("profiling", profiler.info)
+
+
+@app.on_event("startup")
+def log_database_config():
+    logger.info("Database configured", extra={"database": describe_engine()})
+
+
+@app.on_event("shutdown")
+async def close_async_database():
+    await dispose_async_engine()
+
+
+@app.on_event("startup")
+def calibrate_password_hashing():
+    rounds = password_hasher.calibrate()
+    password_hasher.start()
+    logger.info("Password hashing calibrated", extra={
+        "scheme": "pbkdf2_sha256", "rounds": rounds, "pool": password_hasher.mode, "workers": password_hasher.workers,
+    })
+
+
+@app.on_event("shutdown")
+def stop_password_hashing():
+    password_hasher.shutdown()
+
+
+@app.on_event("startup")
+def start_session_reaper():
+    session_reaper.start()
+
+
+@app.on_event("shutdown")
+def stop_session_reaper():
+    session_reaper.stop()
+
+
+@app.on_event("startup")
+def start_daily_scheduler():
+    daily_scheduler.start()
+
+
+@app.on_event("shutdown")
+def stop_daily_scheduler():
+    daily_scheduler.stop()
 
 
 @app.get("/")
@@ -35,12 +109,18 @@ def root():
             "solves": "/solves",
             "rankings": "/rankings",
             "calendar": "/calendar",
-            "ai": "/ai",
+            **({"ai": "/ai"} if AI_ROUTES_ENABLED else {}),
             "admin": "/admin"
         }
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text format."""
+    return metrics_response()
+
+
 # Include all routers with their prefixes
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
@@ -48,5 +128,8 @@ app.include_router(puzzles.router, prefix="/puzzles", tags=["Puzzles"])
 app.include_router(solves.router, prefix="/solves", tags=["Solves"])
 app.include_router(rankings.router, prefix="/rankings", tags=["Rankings"])
 app.include_router(calendar.router, prefix="/calendar", tags=["Calendar"])
-app.include_router(ai.router, prefix="/ai", tags=["AI Hints"])
+if AI_ROUTES_ENABLED:
+    from routers import ai
+
+    app.include_router(ai.router, prefix="/ai", tags=["AI Hints"])
 app.include_router(admin.router, prefix="/admin", tags=["Admin"])
@@ -0,0 +1,231 @@
+"""
+In-process metrics in the Prometheus text exposition format (GET /metrics).
+
+Counters, gauges and histograms live in one registry, each labelled series is
+a few floats updated under a lock, so recording costs about a microsecond.
+Stats the app already keeps (session cache, password hashing, puzzle cache,
+daily scheduler) are exported through collectors called only on scrape.
+
+- MetricsMiddleware: request latency per route template and status, plus the
+  number of SQL statements each request issued (counted by count_statement,
+  a before_cursor_execute hook db.py installs on every engine).
+- ai_* metrics: LLM queue wait, generation time, completion tokens and the
+  model/fallback split (the fallback rate is their ratio).
+- puzzle_generation_seconds: generator time per board size.
+
+This module is imported by the puzzle generator processes - keep it free of
+app imports.
+"""
+import bisect
+import contextvars
+import math
+import threading
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def expose(self) -> list[str]:
+        with self._lock:
+            series = list(self._series.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in series]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._series[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self) -> list[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[tuple[str, object]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, prefix: str, info) -> None:
+        """Exports the numeric fields of info() (a stats dict) as gauges named prefix_<field>."""
+        self._collectors.append((prefix, info))
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.expose())
+        for prefix, info in self._collectors:
+            try:
+                stats = info()
+            except Exception as e:
+                lines.append(f"# {prefix}: collector failed: {e!r}")
+                continue
+            for field, value in stats.items():
+                if isinstance(value, (int, float)):  # bools too
+                    name = f"{prefix}_{field}"
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {_format_value(float(value))}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status"))
+HTTP_REQUEST_STATEMENTS = registry.histogram(
+    "http_request_db_statements", "SQL statements issued per HTTP request.", ("method", "route"), STATEMENT_BUCKETS)
+DB_STATEMENTS = registry.counter("db_statements_total", "SQL statements executed.")
+
+AI_QUEUE_WAIT_SECONDS = registry.histogram(
+    "ai_llm_queue_wait_seconds", "Time an AI request waited for the model (its lock, slot or the service).", ("kind",))
+AI_GENERATION_SECONDS = registry.histogram(
+    "ai_llm_generation_seconds", "LLM completion time, without the queue wait.", ("kind",))
+AI_TOKENS = registry.counter("ai_llm_completion_tokens_total", "Tokens generated by the LLM.", ("kind",))
+AI_RESPONSES = registry.counter(
+    "ai_responses_total", "AI responses by source (model, rule-based or fallback).", ("kind", "source"))
+AI_RATE_LIMITED = registry.counter(
+    "ai_rate_limit_total", "AI requests served by the model or throttled to rule-based text.", ("kind", "decision"))
+
+PUZZLE_GENERATION_SECONDS = registry.histogram(
+    "puzzle_generation_seconds", "Binary puzzle generator time.", ("size",),
+    (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1.0))
+
+# SQL statements of the current request; a mutable cell so that sync endpoints,
+# which run in a copy of the request's context, still count into it
+_request_statements: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_statements", default=None)
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    DB_STATEMENTS.inc()
+    cell = _request_statements.get()
+    if cell is not None:
+        cell[0] += 1
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no BaseHTTPMiddleware task/stream overhead)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        cell = [0]
+        token = _request_statements.set(cell)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_statements.reset(token)
+            # route template, not the raw path, keeps the label set bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            HTTP_REQUEST_SECONDS.observe(elapsed, method=method, route=route, status=status["code"])
+            HTTP_REQUEST_STATEMENTS.observe(cell[0], method=method, route=route)
+
+
+def metrics_response():
+    from fastapi import Response  # the generator processes never serve it
+
+    return Response(registry.expose(), media_type=CONTENT_TYPE)
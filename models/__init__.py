@@ -2,18 +2,20 @@
 from db import Base
 
 # Importujemy wszystkie klasy modeli z models.py
-from .models import User, Session, Puzzle, StoryPuzzle, DailyPuzzle, Solve, DailyRanking, AiHint
+from .models import User, UserAvatar, Session, Puzzle, StoryPuzzle, DailyPuzzle, Solve, DailyRanking, AiHint, AiHintCounter
 
 
 # Opcjonalnie: definiujemy co ma byc dostepne przy "from models import *"
 __all__ = [
     "Base",
     "User",
+    "UserAvatar",
     "Session",
     "Puzzle",
     "StoryPuzzle",
     "DailyPuzzle",
     "Solve",
     "DailyRanking",
-    "AiHint"
+    "AiHint",
+    "AiHintCounter"
 ]
\ No newline at end of file
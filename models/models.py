@@ -1,51 +1,80 @@
 import uuid
 from datetime import datetime
 from sqlalchemy import (
-    Column, String, Integer, Text, DateTime, Boolean, ForeignKey, Date
+    Column, String, Integer, Text, DateTime, Boolean, ForeignKey, Date, Index, LargeBinary, CHAR,
+    UniqueConstraint
 )
-from sqlalchemy.dialects.mssql import UNIQUEIDENTIFIER
-from sqlalchemy.orm import relationship
+from models.types import GUID
+from sqlalchemy.orm import relationship, deferred
 from db import Base
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
 
     login = Column(String(100), unique=True, nullable=False)
     email = Column(String(255), unique=True, nullable=False)
     password_hash = Column(String(255), nullable=False)
 
     nick = Column(String(100))
-    avatar = Column(Text)  # Supports base64 images
+    avatar_hash = Column(String(64), nullable=True)  # sha256 of UserAvatar.data, None = no avatar
 
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login = Column(DateTime, nullable=True)
 
+    # Denormalized counter of completed solves (see counters.py)
+    total_solves = Column(Integer, nullable=False, default=0, server_default="0")
+
     sessions = relationship("Session", back_populates="user", cascade="all, delete-orphan")
     solves = relationship("Solve", back_populates="user", cascade="all, delete-orphan")
     ai_hints = relationship("AiHint", back_populates="user", cascade="all, delete-orphan")
+    hint_counters = relationship("AiHintCounter", back_populates="user", cascade="all, delete-orphan")
+    avatar_image = relationship("UserAvatar", back_populates="user", uselist=False, cascade="all, delete-orphan")
+
+
+class UserAvatar(Base):
+    __tablename__ = "user_avatars"
+
+    user_id = Column(GUID, ForeignKey("users.id"), primary_key=True)
+
+    content_type = Column(String(50), nullable=False)
+    data = deferred(Column(LargeBinary, nullable=False))  # decoded image bytes, loaded only when served
+    etag = Column(String(64), nullable=False)  # sha256 hex of data
+
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    user = relationship("User", back_populates="avatar_image")
 
 
 class Session(Base):
     __tablename__ = "sessions"
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(UNIQUEIDENTIFIER, ForeignKey("users.id"), nullable=False)
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
 
-    token = Column(String(255), unique=True, nullable=False)
+    token_hash = Column(CHAR(64), nullable=False)  # sha256 hex of the bearer token
 
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=False)
 
     user = relationship("User", back_populates="sessions")
 
+    __table_args__ = (
+        UniqueConstraint("token_hash", name="uq_sessions_token_hash"),
+        Index("ix_sessions_token_hash_expires_at", "token_hash", "expires_at"),
+        # expired-session reaper
+        Index("ix_sessions_expires_at", "expires_at"),
+        # per-user session cap (oldest first)
+        Index("ix_sessions_user_id_created_at", "user_id", "created_at"),
+    )
+
 
 class Puzzle(Base):
     __tablename__ = "puzzles"
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
 
     type = Column(String(20), nullable=False)  # story | daily | random
     difficulty = Column(Integer, nullable=False)
@@ -60,34 +89,43 @@ class Puzzle(Base):
     daily_entry = relationship("DailyPuzzle", back_populates="puzzle", uselist=False)
     story_entry = relationship("StoryPuzzle", back_populates="puzzle", uselist=False)
     ai_hints = relationship("AiHint", back_populates="puzzle", cascade="all, delete-orphan")
+    hint_counters = relationship("AiHintCounter", back_populates="puzzle", cascade="all, delete-orphan")
 
 
 class StoryPuzzle(Base):
     __tablename__ = "story_puzzles"
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, default=lambda: str(uuid.uuid4()))
-    puzzle_id = Column(UNIQUEIDENTIFIER, ForeignKey("puzzles.id"), nullable=False)
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
+    puzzle_id = Column(GUID, ForeignKey("puzzles.id"), nullable=False)
 
     order_index = Column(Integer, nullable=False)
 
     puzzle = relationship("Puzzle", back_populates="story_entry")
 
+    __table_args__ = (
+        Index("ix_story_puzzles_order_index", "order_index"),
+    )
+
 
 class DailyPuzzle(Base):
     __tablename__ = "daily_puzzles"
 
     date = Column(Date, primary_key=True)
-    puzzle_id = Column(UNIQUEIDENTIFIER, ForeignKey("puzzles.id"), nullable=False)
+    puzzle_id = Column(GUID, ForeignKey("puzzles.id"), nullable=False)
 
     puzzle = relationship("Puzzle", back_populates="daily_entry")
 
+    __table_args__ = (
+        Index("ix_daily_puzzles_puzzle_id", "puzzle_id"),
+    )
+
 
 class Solve(Base):
     __tablename__ = "solves"
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(UNIQUEIDENTIFIER, ForeignKey("users.id"), nullable=False)
-    puzzle_id = Column(UNIQUEIDENTIFIER, ForeignKey("puzzles.id"), nullable=False)
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
+    puzzle_id = Column(GUID, ForeignKey("puzzles.id"), nullable=False)
 
     time_seconds = Column(Integer, nullable=True)
     mistakes = Column(Integer, nullable=False, default=0)
@@ -99,14 +137,23 @@ class Solve(Base):
     user = relationship("User", back_populates="solves")
     puzzle = relationship("Puzzle", back_populates="solves")
 
+    __table_args__ = (
+        # upsert in /solves, /solves/puzzle/{id}, calendar
+        Index("ix_solves_user_id_puzzle_id", "user_id", "puzzle_id"),
+        # daily ranking (all completed solves of a puzzle)
+        Index("ix_solves_puzzle_id_completed", "puzzle_id", "completed"),
+        # total_solves in profiles, user ranking history
+        Index("ix_solves_user_id_completed", "user_id", "completed"),
+    )
+
 
 class DailyRanking(Base):
     __tablename__ = "daily_rankings"
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
 
     date = Column(Date, nullable=False)
-    user_id = Column(UNIQUEIDENTIFIER, ForeignKey("users.id"), nullable=False)
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
 
     rank = Column(Integer, nullable=False)
     score = Column(Integer, nullable=False)
@@ -117,12 +164,29 @@ class DailyRanking(Base):
 class AiHint(Base):
     __tablename__ = "ai_hints"
 
-    id = Column(UNIQUEIDENTIFIER, primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = Column(UNIQUEIDENTIFIER, ForeignKey("users.id"), nullable=False)
-    puzzle_id = Column(UNIQUEIDENTIFIER, ForeignKey("puzzles.id"), nullable=False)
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False)
+    puzzle_id = Column(GUID, ForeignKey("puzzles.id"), nullable=False)
 
     hint_text = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="ai_hints")
     puzzle = relationship("Puzzle", back_populates="ai_hints")
+
+    __table_args__ = (
+        Index("ix_ai_hints_user_id_puzzle_id", "user_id", "puzzle_id"),
+    )
+
+
+class AiHintCounter(Base):
+    """Denormalized number of AI hints used per (user, puzzle) (see counters.py)."""
+    __tablename__ = "ai_hint_counters"
+
+    user_id = Column(GUID, ForeignKey("users.id"), primary_key=True)
+    puzzle_id = Column(GUID, ForeignKey("puzzles.id"), primary_key=True)
+
+    hints_used = Column(Integer, nullable=False, default=0, server_default="0")
+
+    user = relationship("User", back_populates="hint_counters")
+    puzzle = relationship("Puzzle", back_populates="hint_counters")
@@ -0,0 +1,62 @@
+import uuid
+
+from sqlalchemy.types import BINARY, TypeDecorator
+
+
+class GUID(TypeDecorator):
+    """UUID column: UNIQUEIDENTIFIER on SQL Server, UUID on PostgreSQL and 16 raw
+    bytes (BINARY(16), a BLOB) everywhere else, e.g. SQLite.
+
+    Accepts uuid.UUID or its string form as parameters, always returns uuid.UUID
+    (like UNIQUEIDENTIFIER(as_uuid=True) did), so str(row.id) is the same on every
+    backend.
+    """
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        # dialect packages imported on use: each costs tens of ms at startup
+        if dialect.name == "mssql":
+            from sqlalchemy.dialects.mssql import UNIQUEIDENTIFIER
+
+            return dialect.type_descriptor(UNIQUEIDENTIFIER(as_uuid=True))
+        if dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+            return dialect.type_descriptor(PG_UUID(as_uuid=True))
+        return dialect.type_descriptor(BINARY(16))
+
+    @staticmethod
+    def _to_uuid(value) -> uuid.UUID:
+        if isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, bytes) and len(value) == 16:
+            return uuid.UUID(bytes=value)
+        return uuid.UUID(str(value))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = self._to_uuid(value)
+        if dialect.name in ("mssql", "postgresql"):
+            return value
+        return value.bytes
+
+    def process_literal_param(self, value, dialect):
+        # quoted by the dialect type's literal processor
+        return str(self._to_uuid(value))
+
+    def literal_processor(self, dialect):
+        if dialect.name in ("mssql", "postgresql"):
+            return super().literal_processor(dialect)
+        # BINARY has no literal form of its own - render a blob literal
+        return lambda value: "NULL" if value is None else f"X'{self._to_uuid(value).hex}'"
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self._to_uuid(value)
+
+    @property
+    def python_type(self):
+        return uuid.UUID
@@ -0,0 +1,320 @@
+"""
+Opt-in sampling profiler for single requests, written as speedscope files.
+
+ProfilingMiddleware profiles a request when:
+- it carries `X-Profile: <PROFILE_TOKEN>` (the header is ignored while
+  PROFILE_TOKEN is empty), or
+- the admin toggle (PUT /admin/profiling, or PROFILE_SAMPLE_EVERY at startup)
+  selects it: the next `count` requests, or 1 in every `sample_every`,
+  optionally only under a path prefix.
+
+While the request runs, a sampler thread records the Python stacks of the
+threads working on it every PROFILE_INTERVAL_MS: the event loop thread, the
+threadpool thread of a sync endpoint (picked up at its first SQL statement),
+and the AI worker thread (routers.ai.in_request_profile). Idle stacks (loop waiting in
+select, pool threads waiting for work) are skipped. Work in other processes
+(the spawn pool of generate_binary_puzzles) is not visible, and concurrent
+requests on the event loop thread show up in the profile too.
+
+Profiles go to PROFILE_DIR as <time>-<method>-<route>-<request id>.speedscope.json
+(open at https://www.speedscope.app), the newest PROFILE_KEEP are kept, and the
+file name is returned in the X-Profile-Id response header.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from logging_config import get_request_id
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "binarygame-profiles"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))  # 1 in N requests, 0 = off
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_SUFFIX = ".speedscope.json"
+# never profiled: scrapes and the profile endpoints themselves
+SKIP_PATHS = ("/metrics", "/admin/profil")
+
+_active_profile: contextvars.ContextVar["RequestProfile | None"] = contextvars.ContextVar(
+    "active_profile", default=None
+)
+
+
+def current_profile() -> "RequestProfile | None":
+    return _active_profile.get()
+
+
+def _is_idle(frame) -> bool:
+    """Thread blocked waiting for work rather than working on the request."""
+    if frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py"):
+        return True
+    # pool worker threads wait in queue.get() -> Condition.wait()
+    for _ in range(3):
+        if frame is None:
+            return False
+        if frame.f_code.co_name == "get" and frame.f_code.co_filename.endswith("queue.py"):
+            return True
+        frame = frame.f_back
+    return False
+
+
+class RequestProfile:
+    """Samples the stacks of the threads added with add_thread() until stop()."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.threads: dict[int, str] = {}
+        self.frames: dict[tuple, int] = {}
+        self.samples: dict[int, list[list[int]]] = defaultdict(list)
+        self.weights: dict[int, list[float]] = defaultdict(list)
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_thread(self) -> None:
+        """Includes the calling thread in the profile."""
+        ident = threading.get_ident()
+        if ident not in self.threads:
+            self.threads[ident] = threading.current_thread().name
+
+    def _frame_index(self, frame) -> int:
+        code = frame.f_code
+        # co_qualname is 3.11+; 3.10 falls back to the bare function name
+        key = (getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno)
+        index = self.frames.get(key)
+        if index is None:
+            index = self.frames[key] = len(self.frames)
+        return index
+
+    def _sample(self, weight: float) -> None:
+        frames = sys._current_frames()
+        for ident in list(self.threads):
+            frame = frames.get(ident)
+            if frame is None or _is_idle(frame):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_index(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[ident].append(stack)
+            self.weights[ident].append(weight)
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            self._sample(now - last)
+            last = now
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def sample_count(self) -> int:
+        return sum(len(samples) for samples in self.samples.values())
+
+    def to_speedscope(self, name: str) -> dict:
+        frames = [None] * len(self.frames)
+        for (func, filename, line), index in self.frames.items():
+            frames[index] = {"name": func, "file": filename, "line": line}
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "binarygame profiling.py",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": self.threads[ident],
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(sum(self.weights[ident]), 6),
+                    "samples": self.samples[ident],
+                    "weights": [round(w, 6) for w in self.weights[ident]],
+                }
+                for ident in self.threads
+                if self.samples[ident]
+            ],
+        }
+
+
+def mark_statement_thread(conn, cursor, statement, parameters, context, executemany) -> None:
+    """before_cursor_execute hook: adds the thread running the query to the request's profile."""
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.add_thread()
+
+
+class Profiler:
+    """Decides which requests get profiled and stores the results."""
+
+    def __init__(self, directory: str = PROFILE_DIR, token: str = PROFILE_TOKEN,
+                 sample_every: int = PROFILE_SAMPLE_EVERY, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.token = token
+        self.sample_every = sample_every
+        self.path_prefix: str | None = None
+        self.remaining = 0
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._seen = 0
+        self.profiled = 0
+        self.last_profile: str | None = None
+
+    def configure(self, sample_every: int | None = None, count: int | None = None,
+                  path_prefix: str | None = None) -> dict:
+        with self._lock:
+            if sample_every is not None:
+                self.sample_every = max(0, sample_every)
+                self._seen = 0
+            if count is not None:
+                self.remaining = max(0, count)
+            self.path_prefix = path_prefix or None
+        return self.info()
+
+    def wants(self, path: str, header: str | None) -> bool:
+        if path.startswith(SKIP_PATHS):
+            return False
+        if header is not None and self.token and header == self.token:
+            return True
+        if self.path_prefix and not path.startswith(self.path_prefix):
+            return False
+        with self._lock:
+            if self.remaining > 0:
+                self.remaining -= 1
+                return True
+            if self.sample_every > 0:
+                self._seen += 1
+                return self._seen % self.sample_every == 0
+        return False
+
+    def file_name(self, method: str, route: str) -> str:
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")[:-3]
+        route_part = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        return f"{stamp}-{method}-{route_part}-{(get_request_id() or 'norequest')[:12]}{PROFILE_SUFFIX}"
+
+    def save(self, profile: RequestProfile, name: str, description: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(profile.to_speedscope(description), f, separators=(",", ":"))
+        with self._lock:
+            self.profiled += 1
+            self.last_profile = name
+        for old in self.list_profiles()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, old["name"]))
+            except OSError:
+                pass
+        return path
+
+    def list_profiles(self) -> list[dict]:
+        """Stored profiles, newest first."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(PROFILE_SUFFIX)]
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for name in sorted(names, reverse=True):
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            profiles.append({
+                "name": name,
+                "size_bytes": stat.st_size,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+            })
+        return profiles
+
+    def path_of(self, name: str) -> str | None:
+        """Path of a stored profile, None for anything that is not one (no traversal)."""
+        if os.path.basename(name) != name or not name.endswith(PROFILE_SUFFIX):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+    def info(self) -> dict:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "header_enabled": bool(self.token),
+                "sample_every": self.sample_every,
+                "remaining": self.remaining,
+                "path_prefix": self.path_prefix,
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "keep": self.keep,
+                "profiled": self.profiled,
+                "last_profile": self.last_profile,
+            }
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that profiles the requests the profiler selects."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for key, value in scope["headers"]:
+            if key == PROFILE_HEADER:
+                header = value.decode("latin-1")
+                break
+        if not profiler.wants(scope["path"], header):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        profile.add_thread()
+        status = {"code": 500}
+        name: list[str] = []
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                route = getattr(scope.get("route"), "path", "unmatched")
+                name.append(profiler.file_name(scope["method"], route))
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, name[0].encode("latin-1"))]
+            await send(message)
+
+        token = _active_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.stop()
+            _active_profile.reset(token)
+            file_name = name[0] if name else profiler.file_name(scope["method"], "unmatched")
+            description = (f"{scope['method']} {scope['path']} -> {status['code']} "
+                           f"in {profile.duration * 1000:.1f} ms ({profile.sample_count()} samples)")
+            # off the event loop: a long request makes a large file
+            await asyncio.get_running_loop().run_in_executor(None, profiler.save, profile, file_name, description)
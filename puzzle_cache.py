@@ -0,0 +1,223 @@
+"""
+Read-through cache for the daily and story puzzle payloads.
+
+Keys: ("daily", date) -> PuzzlePublic | None, ("story",) -> list[PuzzlePublic].
+Payloads are immutable pydantic models, shared by all requests of the worker.
+
+- Single flight: concurrent misses for one key (the burst right after midnight)
+  wait for one loader instead of each querying the database - per key a
+  threading.Event for sync callers, a shared asyncio.Task for async ones.
+- Invalidation: the admin write endpoints call invalidate_daily / invalidate_story
+  / invalidate_puzzle. Invalidation bumps a generation counter, so a load that
+  was already running when the data changed does not store its stale result.
+- TTL: PUZZLE_CACHE_TTL_SECONDS bounds how long another worker's admin change
+  stays invisible; entries of today's (or older) daily puzzles also expire at
+  the next UTC midnight, so the daily set is re-read fresh at the rollover.
+  Future dates are kept until their day starts plus the full TTL, so the entry
+  daily_scheduler pre-warms for tomorrow is still hot after midnight, however
+  long before it the pre-warm ran. "No puzzle" results are cached only
+  for PUZZLE_CACHE_MISS_TTL_SECONDS.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+PUZZLE_CACHE_ENABLED = os.getenv("PUZZLE_CACHE_ENABLED", "1").lower() not in {"0", "false", "no"}
+PUZZLE_CACHE_TTL_SECONDS = float(os.getenv("PUZZLE_CACHE_TTL_SECONDS", "600"))
+PUZZLE_CACHE_MISS_TTL_SECONDS = float(os.getenv("PUZZLE_CACHE_MISS_TTL_SECONDS", "30"))
+PUZZLE_CACHE_MAX_ENTRIES = int(os.getenv("PUZZLE_CACHE_MAX_ENTRIES", "1024"))
+
+STORY_KEY = ("story",)
+
+
+def daily_key(day: date) -> tuple:
+    return ("daily", day)
+
+
+def _seconds_until_midnight() -> float:
+    return _seconds_until_day(datetime.utcnow().date() + timedelta(days=1))
+
+
+def _seconds_until_day(day: date) -> float:
+    """Seconds until the (UTC) start of day."""
+    return (datetime.combine(day, datetime.min.time()) - datetime.utcnow()).total_seconds()
+
+
+class PuzzleCache:
+    def __init__(self, ttl_seconds: float = PUZZLE_CACHE_TTL_SECONDS,
+                 miss_ttl_seconds: float = PUZZLE_CACHE_MISS_TTL_SECONDS,
+                 max_entries: int = PUZZLE_CACHE_MAX_ENTRIES, enabled: bool = PUZZLE_CACHE_ENABLED):
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._generation = 0
+        self._sync_loads: dict[tuple, threading.Event] = {}
+        self._async_loads: dict[tuple, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _is_future(day) -> bool:
+        return isinstance(day, date) and day > datetime.utcnow().date()
+
+    def _deadline(self, key: tuple, value) -> float:
+        ttl = self.ttl_seconds if value is not None else self.miss_ttl_seconds
+        if key[0] == "daily":
+            if not self._is_future(key[1]):
+                ttl = min(ttl, _seconds_until_midnight())
+            elif value is not None:
+                # a pre-warmed puzzle must outlive its own rollover
+                ttl += _seconds_until_day(key[1])
+        return time.monotonic() + ttl
+
+    def _lookup(self, key: tuple):
+        """(found, value); caller holds the lock."""
+        item = self._entries.get(key)
+        if item is None:
+            return False, None
+        if item[0] <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, item[1]
+
+    def _store(self, key: tuple, value, generation: int) -> None:
+        """Caller holds the lock. Skips results loaded before an invalidation."""
+        if generation != self._generation:
+            return
+        self._entries[key] = (self._deadline(key, value), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_load(self, key: tuple, loader):
+        """Returns the cached value or loader() - run once for concurrent callers."""
+        if not self.enabled:
+            return loader()
+        while True:
+            with self._lock:
+                found, value = self._lookup(key)
+                if found:
+                    self.hits += 1
+                    return value
+                pending = self._sync_loads.get(key)
+                if pending is None:
+                    pending = self._sync_loads[key] = threading.Event()
+                    generation = self._generation
+                    self.misses += 1
+                    self.loads += 1
+                    break
+                self.coalesced += 1
+            pending.wait()
+            # the loader stored the value (or failed) - look it up again
+
+        try:
+            value = loader()
+            with self._lock:
+                self._store(key, value, generation)
+            return value
+        finally:
+            with self._lock:
+                self._sync_loads.pop(key, None)
+            pending.set()
+
+    async def aget_or_load(self, key: tuple, loader):
+        """Async get_or_load: loader is a coroutine function. Concurrent callers
+        await one shared task, which outlives a caller that gets cancelled."""
+        if not self.enabled:
+            return await loader()
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            task = self._async_loads.get(key)
+            if task is None:
+                task = asyncio.get_running_loop().create_task(self._aload(key, loader, self._generation))
+                # nobody may be left to await a failed load
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                self._async_loads[key] = task
+                self.misses += 1
+                self.loads += 1
+            else:
+                self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _aload(self, key: tuple, loader, generation: int):
+        try:
+            value = await loader()
+            with self._lock:
+                self._store(key, value, generation)
+            return value
+        finally:
+            with self._lock:
+                self._async_loads.pop(key, None)
+
+    def invalidate(self, key: tuple) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+            self.invalidations += 1
+
+    def invalidate_where(self, predicate) -> None:
+        """Drops every entry for which predicate(key, value) is true."""
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, (_, value) in self._entries.items() if predicate(k, value)]:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def info(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "coalesced": self.coalesced,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+puzzle_cache = PuzzleCache()
+
+
+def invalidate_daily(day: date | None = None) -> None:
+    """Drops the cached daily puzzle of one date (None: of all dates)."""
+    if day is not None:
+        puzzle_cache.invalidate(daily_key(day))
+    else:
+        puzzle_cache.invalidate_where(lambda key, value: key[0] == "daily")
+
+
+def invalidate_story() -> None:
+    puzzle_cache.invalidate(STORY_KEY)
+
+
+def invalidate_puzzle(puzzle_id) -> None:
+    """Drops every cached payload containing the puzzle (it was edited or deleted)."""
+    puzzle_id = str(puzzle_id)
+
+    def contains(key, value) -> bool:
+        values = value if isinstance(value, list) else [value]
+        return any(v is not None and str(v.id) == puzzle_id for v in values)
+
+    puzzle_cache.invalidate_where(contains)
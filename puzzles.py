@@ -1,4 +1,9 @@
+import multiprocessing
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import PUZZLE_GENERATION_SECONDS
 
 
 def generate_binary_puzzle(size: int, fullness: int):
@@ -19,6 +24,7 @@ def generate_binary_puzzle(size: int, fullness: int):
     Returns:
         (solution, initial) as flat strings with 0/1/. characters
     """
+    start = time.perf_counter()
     fullness = max(0, min(100, fullness))  # Clamp to 0-100
     
     # Generate a valid solution
@@ -46,9 +52,32 @@ def generate_binary_puzzle(size: int, fullness: int):
             for cell in row
         )
 
+    PUZZLE_GENERATION_SECONDS.observe(time.perf_counter() - start, size=size)
     return flatten(solution), flatten(puzzle)
 
 
+def _generate_batch(size: int, fullness: int, count: int) -> list[tuple[str, str]]:
+    return [generate_binary_puzzle(size, fullness) for _ in range(count)]
+
+
+def generate_binary_puzzles(count: int, size: int, fullness: int, workers: int = 1) -> list[tuple[str, str]]:
+    """
+    Generates count puzzles, split across up to `workers` processes.
+
+    Returns:
+        list of (solution, initial), like generate_binary_puzzle
+    """
+    if workers <= 1 or count < 2:
+        return _generate_batch(size, fullness, count)
+
+    workers = min(workers, count)
+    chunks = [count // workers + (1 if i < count % workers else 0) for i in range(workers)]
+    # spawn: forking a process with live threads/DB connections is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        batches = executor.map(_generate_batch, [size] * workers, [fullness] * workers, chunks)
+        return [puzzle for batch in batches for puzzle in batch]
+
+
 def _generate_valid_solution(size: int) -> list:
     """
     Generates a valid binary puzzle solution respecting all rules.
@@ -0,0 +1,18 @@
+"""
+Recomputes denormalized stats counters (users.total_solves, ai_hint_counters)
+from the solves / ai_hints tables and repairs any drift.
+Safe to run at any time, e.g. from a nightly job.
+"""
+from db import SessionLocal
+from counters import reconcile_counters
+
+print("Reconciling stats counters...")
+db = SessionLocal()
+try:
+    report = reconcile_counters(db)
+finally:
+    db.close()
+
+print("✅ Counters reconciled:")
+for key, value in report.items():
+    print(f"  - {key}: {value}")
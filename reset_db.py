@@ -1,30 +1,58 @@
 """
 Drops and recreates the BinaryGame database, then creates all tables.
+
+SQL Server (default): drops and recreates the database through master.
+SQLite (DATABASE_URL=sqlite:///...): deletes the database file (and its WAL
+files) and recreates it, see bootstrap_sqlite.py.
 """
-import pyodbc
-from db import engine, Base
-from models import User, Session, Puzzle, StoryPuzzle, DailyPuzzle, Solve, DailyRanking, AiHint
-
-print("Connecting to master database...")
-# Connect to master to drop/create database
-conn_str = r'DRIVER={ODBC Driver 17 for SQL Server};SERVER=(localdb)\MSSQLLocalDB;DATABASE=master;Trusted_Connection=yes;'
-conn = pyodbc.connect(conn_str, autocommit=True)
-cursor = conn.cursor()
-
-print("Dropping BinaryGame database if it exists...")
-try:
-    cursor.execute("ALTER DATABASE BinaryGame SET SINGLE_USER WITH ROLLBACK IMMEDIATE")
-    cursor.execute("DROP DATABASE BinaryGame")
-    print("  ✓ Dropped existing database")
-except Exception as e:
-    print(f"  - Database didn't exist or couldn't be dropped: {e}")
-
-print("Creating fresh BinaryGame database...")
-cursor.execute("CREATE DATABASE BinaryGame")
-print("  ✓ Database created")
-
-cursor.close()
-conn.close()
+import os
+
+from db import engine, Base, db_settings
+from models import User, UserAvatar, Session, Puzzle, StoryPuzzle, DailyPuzzle, Solve, DailyRanking, AiHint, AiHintCounter
+
+
+def reset_mssql():
+    import pyodbc
+
+    print("Connecting to master database...")
+    # Connect to master to drop/create database
+    conn_str = r'DRIVER={ODBC Driver 17 for SQL Server};SERVER=(localdb)\MSSQLLocalDB;DATABASE=master;Trusted_Connection=yes;'
+    conn = pyodbc.connect(conn_str, autocommit=True)
+    cursor = conn.cursor()
+
+    print("Dropping BinaryGame database if it exists...")
+    try:
+        cursor.execute("ALTER DATABASE BinaryGame SET SINGLE_USER WITH ROLLBACK IMMEDIATE")
+        cursor.execute("DROP DATABASE BinaryGame")
+        print("  ✓ Dropped existing database")
+    except Exception as e:
+        print(f"  - Database didn't exist or couldn't be dropped: {e}")
+
+    print("Creating fresh BinaryGame database...")
+    cursor.execute("CREATE DATABASE BinaryGame")
+    print("  ✓ Database created")
+
+    cursor.close()
+    conn.close()
+
+
+def reset_sqlite():
+    engine.dispose()
+    path = engine.url.database
+    if db_settings.is_sqlite_memory or not path:
+        print("In-memory SQLite database - nothing to drop")
+        return
+    print(f"Deleting SQLite database {path}...")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    print("  ✓ Deleted")
+
+
+if engine.dialect.name == "sqlite":
+    reset_sqlite()
+else:
+    reset_mssql()
 
 print("\nCreating all tables...")
 Base.metadata.create_all(bind=engine)
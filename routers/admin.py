@@ -1,17 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime, date, timedelta
+import os
 import uuid
 
 from db import get_db
 import schemas
 from models.models import User, Puzzle, DailyPuzzle, StoryPuzzle
 from auth.security import get_current_user
-from puzzles import generate_binary_puzzle
 from story_levels import STORY_LEVELS
+from counters import remove_puzzle_solves
+from auth.session_cache import get_session_cache
+from auth.hashing import password_hasher
+from auth.session_reaper import session_reaper
+from puzzle_cache import puzzle_cache, invalidate_daily, invalidate_story, invalidate_puzzle
+from daily_scheduler import daily_scheduler, backfill_daily_puzzles
+from profiling import profiler
 
 router = APIRouter()
 
+DAILY_FIRST_DATE = date(2026, 1, 1)
+DAILY_BACKFILL_MAX_DAYS = int(os.getenv("DAILY_BACKFILL_MAX_DAYS", "3660"))
+
 
 # Note: In production, add admin role check to get_current_user
 # For now, any authenticated user can access admin endpoints
@@ -57,6 +69,7 @@ def update_puzzle(
         puzzle.grid_initial = payload.grid_initial
     
     db.commit()
+    invalidate_puzzle(puzzle.id)
     db.refresh(puzzle)
     return puzzle
 
@@ -71,51 +84,39 @@ def delete_puzzle(
     if not puzzle:
         raise HTTPException(status_code=404, detail="Puzzle not found")
     
+    # the path may spell the UUID differently (case, no hyphens) than the cached rows
+    canonical_id = str(puzzle.id)
+    # Solves are deleted by cascade - keep users.total_solves in sync
+    remove_puzzle_solves(db, puzzle.id)
     db.delete(puzzle)
     db.commit()
+    invalidate_puzzle(canonical_id)
     return {"status": "deleted"}
 
 
 @router.post("/daily/generate-missing")
 def generate_missing_daily_puzzles(
+    start: str | None = None,
+    end: str | None = None,
     db: Session = Depends(get_db)  # current_user: User = Depends(get_current_user)
 ):
-    """Generuje brakujace daily puzzles od 2026-01-01 do dzis + 7 dni."""
-    start_date = date(2026, 1, 1)
-    end_date = date.today() + timedelta(days=7)
-
-    created = 0
-    skipped = 0
-
-    current_date = start_date
-    while current_date <= end_date:
-        exists = db.query(DailyPuzzle).filter(DailyPuzzle.date == current_date).first()
-        if exists:
-            skipped += 1
-            current_date += timedelta(days=1)
-            continue
+    """Generuje brakujace daily puzzles w zakresie dat (domyslnie od 2026-01-01 do dzis + 7 dni)."""
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d").date() if start else DAILY_FIRST_DATE
+        end_date = datetime.strptime(end, "%Y-%m-%d").date() if end else date.today() + timedelta(days=7)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    days = (end_date - start_date).days + 1
+    if days > DAILY_BACKFILL_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range too long (max {DAILY_BACKFILL_MAX_DAYS} days)")
 
-        solution, initial = generate_binary_puzzle(size=6, fullness=50)
-        puzzle = Puzzle(
-            id=str(uuid.uuid4()),
-            type="daily",
-            difficulty=3,
-            size=6,
-            grid_solution=solution,
-            grid_initial=initial,
-            created_at=datetime.utcnow()
-        )
-        db.add(puzzle)
-        db.flush()
-        daily_puzzle = DailyPuzzle(
-            date=current_date,
-            puzzle_id=puzzle.id
-        )
-        db.add(daily_puzzle)
-        created += 1
-        current_date += timedelta(days=1)
+    try:
+        created, skipped = backfill_daily_puzzles(db, start_date, end_date)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="Daily puzzles were created concurrently, try again")
 
-    db.commit()
     return {
         "status": "ok",
         "start_date": start_date.isoformat(),
@@ -154,6 +155,7 @@ def set_daily_puzzle(
         db.add(daily_puzzle)
     
     db.commit()
+    invalidate_daily(date_obj)
     return {"status": "assigned", "date": date_obj, "puzzle_id": payload.puzzle_id}
 
 
@@ -166,12 +168,20 @@ def populate_story_mode(
     updated = 0
     skipped = 0
 
+    # One read for all levels; new rows get client-side ids, so the inserts
+    # and updates go out as batched statements on commit.
+    existing = {}
+    for story_entry in db.query(StoryPuzzle).options(joinedload(StoryPuzzle.puzzle)).filter(
+        StoryPuzzle.order_index.between(1, len(STORY_LEVELS))
+    ):
+        existing.setdefault(story_entry.order_index, story_entry)
+
     for idx, level in enumerate(STORY_LEVELS, start=1):
-        story_entry = db.query(StoryPuzzle).filter(StoryPuzzle.order_index == idx).first()
+        story_entry = existing.get(idx)
         if story_entry:
-            puzzle = db.query(Puzzle).filter(Puzzle.id == story_entry.puzzle_id).first()
+            puzzle = story_entry.puzzle
             if not puzzle:
-                puzzle = Puzzle(
+                story_entry.puzzle = Puzzle(
                     id=str(uuid.uuid4()),
                     type="story",
                     difficulty=level.difficulty,
@@ -180,9 +190,6 @@ def populate_story_mode(
                     grid_initial=level.grid_initial,
                     created_at=datetime.utcnow()
                 )
-                db.add(puzzle)
-                db.flush()
-                story_entry.puzzle_id = puzzle.id
                 updated += 1
             else:
                 changed = False
@@ -217,7 +224,6 @@ def populate_story_mode(
             created_at=datetime.utcnow()
         )
         db.add(puzzle)
-        db.flush()
         story_puzzle = StoryPuzzle(
             id=str(uuid.uuid4()),
             puzzle_id=puzzle.id,
@@ -227,6 +233,7 @@ def populate_story_mode(
         created += 1
 
     db.commit()
+    invalidate_story()
     return {
         "status": "ok",
         "created": created,
@@ -254,4 +261,78 @@ def add_story_puzzle(
     )
     db.add(story_puzzle)
     db.commit()
+    invalidate_story()
     return {"status": "added", "puzzle_id": puzzle_id, "order_index": payload.order_index}
+
+
+@router.get("/stats/session-cache")
+def session_cache_stats():
+    """Zwraca statystyki cache sesji (hit rate, rozmiar, eviction) dla tego workera."""
+    return get_session_cache().info()
+
+
+@router.get("/stats/password-hashing")
+def password_hashing_stats():
+    """Zwraca statystyki puli hashowania hasel (kolejka, odrzucone, czas hasha)."""
+    return password_hasher.info()
+
+
+@router.get("/stats/puzzle-cache")
+def puzzle_cache_stats():
+    """Zwraca statystyki cache puzzli daily/story (trafienia, wspolne ladowania) dla tego workera."""
+    return puzzle_cache.info()
+
+
+@router.get("/stats/sessions")
+def sessions_stats(db: Session = Depends(get_db)):
+    """Zwraca rozmiar tabeli sesji i statystyki usuwania wygaslych sesji."""
+    return session_reaper.info(db)
+
+
+@router.get("/stats/daily-scheduler")
+def daily_scheduler_stats():
+    """Zwraca stan harmonogramu daily puzzli (horyzont, ostatnie uzupelnienie, pre-warm)."""
+    return daily_scheduler.info()
+
+
+@router.get("/stats/ai-backend")
+def ai_backend_stats():
+    """Zwraca backend modelu AI i jego statystyki (dla `remote`: stan circuit breakera, bledy)."""
+    # imported here: with AI_ROUTES_ENABLED=0 the AI modules stay unloaded until asked
+    from ai_model import backend_info
+    return backend_info()
+
+
+@router.get("/stats/ai-rate-limit")
+def ai_rate_limit_stats():
+    """Zwraca limity wywolan modelu AI (na uzytkownika i globalny) oraz liczbe zapytan obsluzonych i ograniczonych."""
+    from ai_rate_limit import rate_limiter
+    return rate_limiter.info()
+
+
+@router.get("/profiling")
+def profiling_settings():
+    """Zwraca ustawienia profilowania zadan i liczbe zapisanych profili."""
+    return profiler.info()
+
+
+@router.put("/profiling")
+def update_profiling(payload: schemas.ProfilingUpdate):
+    """Wlacza profilowanie: `count` nastepnych zadan i/lub co `sample_every`-te (0 wylacza), opcjonalnie od `path_prefix`."""
+    return profiler.configure(sample_every=payload.sample_every, count=payload.count,
+                              path_prefix=payload.path_prefix)
+
+
+@router.get("/profiles")
+def list_profiles(limit: int = 50):
+    """Zwraca ostatnie zapisane profile (najnowsze pierwsze)."""
+    return profiler.list_profiles()[:limit]
+
+
+@router.get("/profiles/{name}")
+def download_profile(name: str):
+    """Zwraca plik profilu w formacie speedscope (https://www.speedscope.app)."""
+    path = profiler.path_of(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=name)
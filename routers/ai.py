@@ -1,22 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from datetime import datetime
 import json
+import logging
 import os
 import concurrent.futures
 import random
+from functools import lru_cache
 
 from db import get_db
 import schemas
 from models.models import User, Puzzle, AiHint
-from auth.security import get_current_user
-from ai_model import generate_hint_text, generate_error_feedback
+from auth.security import get_current_session, get_current_user, optional_oauth2_scheme
+from ai_model import generate_hint_text, generate_error_feedback, backend_info
+from counters import increment_hints_used
+from metrics import AI_RESPONSES, AI_RATE_LIMITED, registry
+from ai_rate_limit import rate_limiter
+from profiling import current_profile
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "30.0"))
 AI_ENABLED = os.getenv("AI_ENABLED", "1").lower() not in {"0", "false", "no"}
 AI_DISABLE_TIMEOUT = os.getenv("AI_DISABLE_TIMEOUT", "0").lower() in {"1", "true", "yes"}
+INITIAL_MOVES_CACHE_SIZE = int(os.getenv("INITIAL_MOVES_CACHE_SIZE", "256"))
+
+registry.register_collector("ai_backend", backend_info)
+registry.register_collector("ai_rate_limit", rate_limiter.info)
+
+# response header of answers degraded to rule-based text by the rate limiter
+DEGRADED_HEADER = "X-AI-Degraded"
 
 
 def get_possible_moves(grid_state: str, size: int) -> list[dict]:
@@ -179,6 +193,72 @@ def get_possible_moves(grid_state: str, size: int) -> list[dict]:
     return hints
 
 
+@lru_cache(maxsize=INITIAL_MOVES_CACHE_SIZE)
+def _initial_moves(grid_initial: str, size: int) -> tuple[dict, ...]:
+    return tuple(get_possible_moves(grid_initial, size))
+
+
+def initial_moves(grid_initial: str, size: int) -> list[dict]:
+    """
+    get_possible_moves() for an untouched puzzle. The deductions are computed
+    once per puzzle (daily_scheduler pre-computes the next daily one), only the
+    order is shuffled per call.
+    """
+    moves = [dict(move) for move in _initial_moves(grid_initial, size)]
+    random.shuffle(moves)
+    return moves
+
+
+def in_request_profile(fn, **kwargs):
+    """fn(**kwargs) as a callable for the executor thread, sampled with the request's profile."""
+    # the executor thread does not inherit the request's context
+    profile = current_profile()
+
+    def run():
+        if profile is not None:
+            profile.add_thread()
+        return fn(**kwargs)
+    return run
+
+
+def rate_limit_key(request: Request, token: str | None, db: Session) -> str:
+    """The caller's bucket: the session's user, or the client address without a valid session."""
+    if token:
+        try:
+            return f"user:{get_current_session(token, db).user_id}"
+        except HTTPException:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def model_allowed(kind: str, request: Request, token: str | None, db: Session, response: Response) -> bool:
+    """Takes a rate-limit token for a model call; False (and the degraded header) when throttled."""
+    refused = rate_limiter.acquire(rate_limit_key(request, token, db))
+    if refused is None:
+        AI_RATE_LIMITED.inc(kind=kind, decision="served")
+        return True
+    AI_RATE_LIMITED.inc(kind=kind, decision=f"throttled_{refused}")
+    response.headers[DEGRADED_HEADER] = f"rate-limit-{refused}"
+    return False
+
+
+def rule_based_hint(hints: list[dict]) -> str | None:
+    """The first possible move in plain words, without the model."""
+    if not hints:
+        return None
+    h = hints[0]
+    return f"Try row {h['row'] + 1}, column {h['col']}: put {h['value']}. {h['reason']}."
+
+
+def rule_based_error_feedback(errors: list) -> str:
+    first = errors[0]
+    if isinstance(first, dict) and "row" in first and "col" in first:
+        where = f"row {first['row']}, column {first['col']}"
+        problem = f": {first['error_type']}" if "error_type" in first else ""
+        return f"Take another look at {where}{problem}. It breaks one of the puzzle rules."
+    return f"I see {len(errors)} mistake(s). Check that no row or column has three equal digits in a row."
+
+
 def parse_grid_state(grid_state: str, size: int) -> list[list[int | None]] | None:
     if not grid_state:
         return None
@@ -215,6 +295,9 @@ def parse_grid_state(grid_state: str, size: int) -> list[list[int | None]] | Non
 @router.post("/hint", response_model=schemas.AiHintResponse)
 def get_hint(
     payload: schemas.AiHintRequest,
+    request: Request,
+    response: Response,
+    token: str | None = Depends(optional_oauth2_scheme),
     db: Session = Depends(get_db)  # current_user: User = Depends(get_current_user)
 ):
     """
@@ -233,45 +316,56 @@ def get_hint(
     puzzle_size = puzzle.size if puzzle else 6
     
     # Get possible moves using function calling
-    possible_hints = get_possible_moves(payload.grid_state, puzzle_size)
+    if puzzle and payload.grid_state == puzzle.grid_initial:
+        possible_hints = initial_moves(puzzle.grid_initial, puzzle_size)
+    else:
+        possible_hints = get_possible_moves(payload.grid_state, puzzle_size)
     
     # Use AI model to generate natural language hint (with optional timeout)
     grid_for_ai = json.dumps(parse_grid_state(payload.grid_state, puzzle_size)) if payload.grid_state else payload.grid_state
     hint_text = None
+    throttled = False
 
-    if AI_ENABLED:
+    if AI_ENABLED and not model_allowed("hint", request, token, db, response):
+        # over the user's or the model's rate: answer now instead of queueing
+        throttled = True
+        hint_text = rule_based_hint(possible_hints)
+    elif AI_ENABLED:
         try:
             if AI_DISABLE_TIMEOUT:
-                hint_text = generate_hint_text(grid=grid_for_ai, hints=possible_hints)
+                hint_text = in_request_profile(generate_hint_text, grid=grid_for_ai, hints=possible_hints)()
             else:
                 with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(generate_hint_text, grid=grid_for_ai, hints=possible_hints)
+                    future = executor.submit(in_request_profile(generate_hint_text, grid=grid_for_ai, hints=possible_hints))
                     hint_text = future.result(timeout=AI_TIMEOUT_SECONDS)
-        except (FileNotFoundError, concurrent.futures.TimeoutError, RuntimeError, ValueError):
+        except (FileNotFoundError, concurrent.futures.TimeoutError, RuntimeError, ValueError) as e:
             hint_text = None
-            print("AI hint generation failed or timed out.")
+            logger.warning("AI hint generation failed or timed out", extra={"error": repr(e)})
 
     if not hint_text:
         hint_text = "Hmm, hats a tough one... i dunno."
-        print("AI hint: FALLBACK")
+        logger.info("AI hint", extra={"source": "fallback"})
+        AI_RESPONSES.inc(kind="hint", source="fallback")
+    elif throttled:
+        logger.info("AI hint", extra={"source": "rules"})
+        AI_RESPONSES.inc(kind="hint", source="rules")
     else:
-        print("AI hint: MODEL")
+        logger.info("AI hint", extra={"source": "model"})
+        AI_RESPONSES.inc(kind="hint", source="model")
     
     # Save hint to database (only if both user and puzzle exist)
     if current_user and puzzle:
-        ai_hint = AiHint(
-            user_id=current_user.id,
-            puzzle_id=payload.puzzle_id,
-            hint_text=hint_text,
-            created_at=datetime.utcnow()
-        )
-        db.add(ai_hint)
+        # throttled answers are derived from the grid, no need to keep them
+        if not throttled:
+            ai_hint = AiHint(
+                user_id=current_user.id,
+                puzzle_id=payload.puzzle_id,
+                hint_text=hint_text,
+                created_at=datetime.utcnow()
+            )
+            db.add(ai_hint)
+        hints_used = increment_hints_used(db, current_user.id, payload.puzzle_id)
         db.commit()
-        
-        hints_used = db.query(AiHint).filter(
-            AiHint.user_id == current_user.id,
-            AiHint.puzzle_id == payload.puzzle_id
-        ).count()
     else:
         hints_used = 0
     
@@ -284,6 +378,9 @@ def get_hint(
 @router.post("/error-feedback", response_model=schemas.AiErrorFeedback)
 def get_error_feedback(
     payload: schemas.AiErrorResponse,
+    request: Request,
+    response: Response,
+    token: str | None = Depends(optional_oauth2_scheme),
     db: Session = Depends(get_db)
 ):
     """
@@ -303,24 +400,35 @@ def get_error_feedback(
     # Use AI model to generate natural language error feedback (with optional timeout)
     grid_for_ai = json.dumps(parse_grid_state(payload.grid_state, 0)) if payload.grid_state else payload.grid_state
     feedback_text = None
+    throttled = False
 
-    if AI_ENABLED:
+    if AI_ENABLED and not model_allowed("error_feedback", request, token, db, response):
+        throttled = True
+        feedback_text = rule_based_error_feedback(payload.errors)
+    elif AI_ENABLED:
         try:
             if AI_DISABLE_TIMEOUT:
-                feedback_text = generate_error_feedback(grid=grid_for_ai, errors=payload.errors)
+                feedback_text = in_request_profile(generate_error_feedback, grid=grid_for_ai, errors=payload.errors)()
             else:
                 with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(generate_error_feedback, grid=grid_for_ai, errors=payload.errors)
+                    future = executor.submit(
+                        in_request_profile(generate_error_feedback, grid=grid_for_ai, errors=payload.errors)
+                    )
                     feedback_text = future.result(timeout=AI_TIMEOUT_SECONDS)
-        except (FileNotFoundError, concurrent.futures.TimeoutError, RuntimeError, ValueError):
-            print("AI error feedback generation failed or timed out.")
+        except (FileNotFoundError, concurrent.futures.TimeoutError, RuntimeError, ValueError) as e:
+            logger.warning("AI error feedback generation failed or timed out", extra={"error": repr(e)})
             feedback_text = None
     if not feedback_text:
         error_count = len(payload.errors)
         feedback_text = f"Oops! I see you made {error_count} mistake(s). But i cannot figure out what they are..."
-        print("AI error feedback: FALLBACK")
+        logger.info("AI error feedback", extra={"source": "fallback"})
+        AI_RESPONSES.inc(kind="error_feedback", source="fallback")
+    elif throttled:
+        logger.info("AI error feedback", extra={"source": "rules"})
+        AI_RESPONSES.inc(kind="error_feedback", source="rules")
     else:
-        print("AI error feedback: MODEL")
+        logger.info("AI error feedback", extra={"source": "model"})
+        AI_RESPONSES.inc(kind="error_feedback", source="model")
     return {
         "message": feedback_text,
         "errors_corrected": len(payload.errors)
@@ -1,17 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from datetime import datetime
-import base64
 
 from db import get_db
 import schemas
 from models.models import User, Session as DbSession
-from auth.security import hash_password, verify_password, create_session, get_current_user
+from auth.security import (
+    hash_password, verify_password, password_needs_rehash, create_session, get_current_user,
+    optional_oauth2_scheme, invalidate_session, invalidate_user_sessions, hash_token,
+)
+from avatars import MAX_AVATAR_BYTES, set_avatar, avatar_url
 
 router = APIRouter()
 
-MAX_AVATAR_BYTES = 500 * 1024
-
 
 def normalize_email(value: str) -> str:
     return value.strip().lower()
@@ -21,7 +22,7 @@ def normalize_login(value: str) -> str:
     return value.strip()
 
 
-def normalize_avatar(value: str | None, seed: str) -> str:
+def normalize_avatar(value: str | None) -> str | None:
     if value:
         trimmed = value.strip()
         if trimmed.startswith("data:image/") and "," in trimmed:
@@ -34,11 +35,8 @@ def normalize_avatar(value: str | None, seed: str) -> str:
             return trimmed
         raise HTTPException(status_code=400, detail="Avatar must be base64 data URL.")
 
-    # fallback svg avatar
-    initials = (seed.strip()[:2] or "BG").upper()
-    svg = f"<svg xmlns='http://www.w3.org/2000/svg' width='200' height='200'><rect width='100%' height='100%' fill='#2b2b2b'/><text x='50%' y='54%' text-anchor='middle' font-family='Arial' font-size='72' fill='#ffffff'>{initials}</text></svg>"
-    encoded = base64.b64encode(svg.encode("utf-8")).decode("utf-8")
-    return f"data:image/svg+xml;base64,{encoded}"
+    # no avatar - avatar_url() falls back to the shared initials SVG
+    return None
 
 
 @router.post("/check", response_model=schemas.UserCheckResponse)
@@ -75,16 +73,16 @@ def register(payload: schemas.UserCreate, db: Session = Depends(get_db)):
     if db.query(User).filter(User.email == email).first():
         raise HTTPException(status_code=400, detail="Email zajety")
 
-    avatar = normalize_avatar(payload.avatar_url, payload.nick or login)
+    avatar = normalize_avatar(payload.avatar_url)
     
     user = User(
         login=login,
         email=email,
         password_hash=hash_password(payload.password),
         nick=payload.nick,
-        avatar=avatar,
         created_at=datetime.utcnow()
     )
+    set_avatar(user, avatar)
     db.add(user)
     db.commit()
     db.refresh(user)
@@ -107,6 +105,9 @@ def login(payload: schemas.UserLogin, db: Session = Depends(get_db)):
     if not user or not verify_password(payload.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Niepoprawne dane logowania")
 
+    # Transparent upgrade of hashes made with fewer rounds than the current target
+    if password_needs_rehash(user.password_hash):
+        user.password_hash = hash_password(payload.password)
     user.last_login = datetime.utcnow()
     db.commit()
 
@@ -115,19 +116,16 @@ def login(payload: schemas.UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/logout")
-def logout(db: Session = Depends(get_db)):  # current_user: User = Depends(get_current_user)
+def logout(token: str | None = Depends(optional_oauth2_scheme), db: Session = Depends(get_db)):  # current_user: User = Depends(get_current_user)
     """Usuwa aktualna sesje (uniewaznia token)."""
-    # DISABLED FOR PRESENTATION
-    return {"status": "logged out (auth disabled)"}
-    # # Token is in the dependency, we need to get it from the request
-    # from fastapi.security import OAuth2PasswordBearer
-    # from fastapi import Request
-    # 
-    # # We'll delete all active sessions for this user for simplicity
-    # # In production, you'd want to track the specific token
-    # db.query(DbSession).filter(DbSession.user_id == current_user.id).delete()
-    # db.commit()
-    # return {"status": "logged out"}
+    # DISABLED FOR PRESENTATION - token is optional, without it nothing is revoked
+    if not token:
+        return {"status": "logged out (auth disabled)"}
+
+    db.query(DbSession).filter(DbSession.token_hash == hash_token(token)).delete(synchronize_session=False)
+    db.commit()
+    invalidate_session(token)
+    return {"status": "logged out"}
 
 
 @router.get("/me", response_model=schemas.UserPublic)
@@ -137,7 +135,11 @@ def me(db: Session = Depends(get_db)):  # current_user: User = Depends(get_curre
     user = db.query(User).first()
     if not user:
         raise HTTPException(status_code=404, detail="No users in database")
-    return user
+    return {
+        "id": str(user.id),
+        "nick": user.nick,
+        "avatar_url": avatar_url(user)
+    }
 
 
 @router.post("/forgot", response_model=schemas.ForgotPasswordResponse)
@@ -155,6 +157,7 @@ def forgot_password(payload: schemas.ForgotPasswordRequest, db: Session = Depend
 
     user.password_hash = hash_password("")
     db.commit()
+    invalidate_user_sessions(user.id)
     return {"message": "Password reset to empty string."}
 
 
@@ -167,4 +170,5 @@ def change_password(payload: schemas.ChangePasswordRequest, db: Session = Depend
         raise HTTPException(status_code=400, detail="Old password incorrect")
     user.password_hash = hash_password(payload.new_password)
     db.commit()
+    invalidate_user_sessions(user.id)
     return {"message": "Password changed."}
@@ -1,30 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 import random
 
-from db import get_db
+from db import get_db, get_async_engine, AsyncSessionLocal
 import schemas
 from models.models import Puzzle, StoryPuzzle, DailyPuzzle
 from puzzles import generate_binary_puzzle
+from puzzle_cache import puzzle_cache, daily_key, STORY_KEY
+from http_cache import conditional, strong_etag, puzzle_etag, public, seconds_until_midnight, NO_STORE
+
+STORY_MAX_AGE = 300
+PUZZLE_MAX_AGE = 86400
+DAILY_TODAY_MAX_AGE = 300
 
 router = APIRouter()
 
 
 @router.get("/story", response_model=list[schemas.PuzzlePublic])
-def get_story_puzzles(db: Session = Depends(get_db)):
+def get_story_puzzles(request: Request, response: Response, db: Session = Depends(get_db)):
     """Zwraca liste puzzli trybu story w kolejnosci."""
-    story_puzzles = db.query(StoryPuzzle).order_by(StoryPuzzle.order_index).all()
-    puzzles = []
-    for sp in story_puzzles:
-        puzzle = db.query(Puzzle).filter(Puzzle.id == sp.puzzle_id).first()
-        if puzzle:
-            puzzles.append(puzzle)
-    return puzzles
+    def load():
+        # one query regardless of the number of levels
+        puzzles = db.query(Puzzle).join(
+            StoryPuzzle, StoryPuzzle.puzzle_id == Puzzle.id
+        ).order_by(StoryPuzzle.order_index).all()
+        return [schemas.PuzzlePublic.model_validate(puzzle) for puzzle in puzzles]
+
+    puzzles = puzzle_cache.get_or_load(STORY_KEY, load)
+    etag = strong_etag(*(puzzle_etag(p) for p in puzzles))
+    return conditional(request, response, etag, public(STORY_MAX_AGE)) or puzzles
 
 
 @router.get("/story/{puzzle_id}", response_model=schemas.PuzzlePublic)
-def get_story_puzzle(puzzle_id: str, db: Session = Depends(get_db)):
+def get_story_puzzle(puzzle_id: str, request: Request, response: Response, db: Session = Depends(get_db)):
     """Zwraca pojedynczy puzzle story (grid poczatkowy)."""
     puzzle = db.query(Puzzle).filter(
         Puzzle.id == puzzle_id,
@@ -32,42 +42,65 @@ def get_story_puzzle(puzzle_id: str, db: Session = Depends(get_db)):
     ).first()
     if not puzzle:
         raise HTTPException(status_code=404, detail="Story puzzle not found")
-    return puzzle
+    return conditional(request, response, puzzle_etag(puzzle), public(PUZZLE_MAX_AGE)) or puzzle
+
+
+async def get_daily_puzzle(puzzle_date: date) -> schemas.PuzzlePublic | None:
+    """Daily puzzle payload for the date, read through puzzle_cache."""
+    async def load():
+        # the load is shared by every request waiting for this date and may
+        # outlive the one that started it: it needs its own session
+        get_async_engine()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Puzzle)
+                .join(DailyPuzzle, DailyPuzzle.puzzle_id == Puzzle.id)
+                .where(DailyPuzzle.date == puzzle_date)
+                .limit(1)
+            )
+            puzzle = result.scalars().first()
+            return schemas.PuzzlePublic.model_validate(puzzle) if puzzle else None
+
+    return await puzzle_cache.aget_or_load(daily_key(puzzle_date), load)
+
+
+def daily_puzzle_cache_control(puzzle_date: date) -> str:
+    today = datetime.utcnow().date()
+    if puzzle_date < today:
+        return public(PUZZLE_MAX_AGE)
+    if puzzle_date == today:
+        return public(min(DAILY_TODAY_MAX_AGE, seconds_until_midnight()))
+    # future dates can still be (re)assigned by admin
+    return public(60)
 
 
 @router.get("/daily/today", response_model=schemas.PuzzlePublic)
-def get_daily_today(db: Session = Depends(get_db)):
+async def get_daily_today(request: Request, response: Response):
     """Zwraca dzisiejszy daily puzzle."""
     today = datetime.utcnow().date()
-    dp = db.query(DailyPuzzle).filter(DailyPuzzle.date == today).first()
-    if not dp:
-        raise HTTPException(status_code=404, detail="Brak daily puzzle na dzis")
-    puzzle = db.query(Puzzle).filter(Puzzle.id == dp.puzzle_id).first()
+    puzzle = await get_daily_puzzle(today)
     if not puzzle:
-        raise HTTPException(status_code=404, detail="Puzzle nie istnieje")
-    return puzzle
+        raise HTTPException(status_code=404, detail="Brak daily puzzle na dzis")
+    return conditional(request, response, puzzle_etag(puzzle), daily_puzzle_cache_control(today)) or puzzle
 
 
 @router.get("/daily/{date}", response_model=schemas.PuzzlePublic)
-def get_daily_by_date(date: str, db: Session = Depends(get_db)):
+async def get_daily_by_date(date: str, request: Request, response: Response):
     """Zwraca daily puzzle dla konkretnej daty."""
     try:
         puzzle_date = datetime.strptime(date, "%Y-%m-%d").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
-    
-    dp = db.query(DailyPuzzle).filter(DailyPuzzle.date == puzzle_date).first()
-    if not dp:
-        raise HTTPException(status_code=404, detail="Brak daily puzzle na ta date")
-    
-    puzzle = db.query(Puzzle).filter(Puzzle.id == dp.puzzle_id).first()
+
+    puzzle = await get_daily_puzzle(puzzle_date)
     if not puzzle:
-        raise HTTPException(status_code=404, detail="Puzzle nie istnieje")
-    return puzzle
+        raise HTTPException(status_code=404, detail="Brak daily puzzle na ta date")
+    return conditional(request, response, puzzle_etag(puzzle), daily_puzzle_cache_control(puzzle_date)) or puzzle
 
 
 @router.get("/random", response_model=schemas.PuzzlePublic)
 def get_random_puzzle(
+    response: Response,
     size: int = 6,
     fullness: int = 50,
     difficulty: int | None = None,
@@ -98,4 +131,6 @@ def get_random_puzzle(
     db.add(new_puzzle)
     db.commit()
     db.refresh(new_puzzle)
+    # every call creates a new puzzle - must not be served from a cache
+    response.headers["Cache-Control"] = NO_STORE
     return new_puzzle
@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, select
 from datetime import datetime
 
-from db import get_db
+from db import get_db, get_async_db
 import schemas
 from models.models import DailyRanking, DailyPuzzle, Solve, User
+from http_cache import conditional, strong_etag, daily_cache_control
+
+# today's ranking changes with every solve
+RANKING_TODAY_MAX_AGE = 30
+
+
+def ranking_etag(date_obj, rows: list[dict]) -> str:
+    """Version of a ranking response: the date plus every row that is sent."""
+    return strong_etag(date_obj, *(
+        (r["rank"], r["user_id"], r["user_nick"], r["score"], r["mistakes"], r["hints_used"], r["time_seconds"])
+        for r in rows
+    ))
 
 router = APIRouter()
 
@@ -32,6 +45,20 @@ def calculate_daily_ranking(date_obj, db: Session):
         )
     ).all()
     
+    return rank_solves(solves)
+
+
+async def calculate_daily_ranking_async(date_obj, db: AsyncSession):
+    """calculate_daily_ranking na AsyncSession (jedno zapytanie z joinem)."""
+    result = await db.execute(
+        select(Solve)
+        .join(DailyPuzzle, DailyPuzzle.puzzle_id == Solve.puzzle_id)
+        .where(DailyPuzzle.date == date_obj, Solve.completed == True)
+    )
+    return rank_solves(result.scalars().all())
+
+
+def rank_solves(solves):
     # Sort by ranking criteria
     sorted_solves = sorted(
         solves,
@@ -56,7 +83,7 @@ def calculate_daily_ranking(date_obj, db: Session):
 
 
 @router.get("/daily/{date}", response_model=list[schemas.DailyRankingPublic])
-def get_daily_ranking(date: str, db: Session = Depends(get_db)):
+def get_daily_ranking(date: str, request: Request, response: Response, db: Session = Depends(get_db)):
     """Zwraca pelny ranking daily puzzle dla danej daty."""
     try:
         date_obj = datetime.strptime(date, "%Y-%m-%d").date()
@@ -79,35 +106,44 @@ def get_daily_ranking(date: str, db: Session = Depends(get_db)):
             "time_seconds": r["time_seconds"]
         })
     
-    return result
+    etag = ranking_etag(date_obj, result)
+    return conditional(request, response, etag, daily_cache_control(date_obj, RANKING_TODAY_MAX_AGE)) or result
 
 
 @router.get("/daily/{date}/top", response_model=list[schemas.DailyRankingPublic])
-def get_daily_top(date: str, limit: int = 10, db: Session = Depends(get_db)):
+async def get_daily_top(date: str, request: Request, response: Response, limit: int = 10,
+                        db: AsyncSession = Depends(get_async_db)):
     """Zwraca TOP N (np. 10) wynikow dla daily puzzle."""
     try:
         date_obj = datetime.strptime(date, "%Y-%m-%d").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     
-    rankings = calculate_daily_ranking(date_obj, db)
+    rankings = await calculate_daily_ranking_async(date_obj, db)
     top_rankings = rankings[:limit]
     
-    # Enrich with user data
+    # Enrich with user data (one query for all nicks)
+    nicks = {}
+    if top_rankings:
+        result = await db.execute(
+            select(User.id, User.nick).where(User.id.in_([r["user_id"] for r in top_rankings]))
+        )
+        nicks = {str(user_id): nick for user_id, nick in result.all()}
+
     result = []
     for r in top_rankings:
-        user = db.query(User).filter(User.id == r["user_id"]).first()
         result.append({
             "rank": r["rank"],
             "user_id": r["user_id"],
-            "user_nick": user.nick if user else "Unknown",
+            "user_nick": nicks.get(str(r["user_id"]), "Unknown"),
             "score": r["score"],
             "mistakes": r["mistakes"],
             "hints_used": r["hints_used"],
             "time_seconds": r["time_seconds"]
         })
     
-    return result
+    etag = ranking_etag(date_obj, result)
+    return conditional(request, response, etag, daily_cache_control(date_obj, RANKING_TODAY_MAX_AGE)) or result
 
 
 @router.get("/user/{user_id}", response_model=list[schemas.UserRankingHistory])
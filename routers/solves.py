@@ -6,6 +6,7 @@ from db import get_db
 import schemas
 from models.models import User, Solve, Puzzle
 from auth.security import get_current_user
+from counters import add_completed_solves
 
 router = APIRouter()
 
@@ -38,6 +39,7 @@ def submit_solve(
 
     if existing:
         # Update existing solve
+        add_completed_solves(db, current_user.id, int(payload.completed) - int(existing.completed))
         existing.time_seconds = payload.time_seconds
         existing.mistakes = payload.mistakes
         existing.hints_used = payload.hints_used
@@ -57,6 +59,7 @@ def submit_solve(
             created_at=datetime.utcnow()
         )
         db.add(new_solve)
+        add_completed_solves(db, current_user.id, int(payload.completed))
         db.commit()
         db.refresh(new_solve)
         return {"status": "created", "solve": new_solve}
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import RedirectResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-import base64
+import hashlib
 
-from db import get_db
+from db import get_db, get_async_db
 import schemas
-from models.models import User, Solve
-from auth.security import get_current_user
+from models.models import User, UserAvatar
+from auth.security import get_current_user, invalidate_user_sessions
+from http_cache import not_modified
+from avatars import AVATAR_CONTENT_TYPES, MAX_AVATAR_BYTES, set_avatar, avatar_url, initials_for, initials_svg
 
 router = APIRouter()
 
-MAX_AVATAR_BYTES = 500 * 1024
+AVATAR_CACHE_CONTROL = "public, max-age=86400"
+AVATAR_VERSIONED_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Uploaded bytes are never sniffed or rendered as a document, even if opened directly
+AVATAR_SECURITY_HEADERS = {"X-Content-Type-Options": "nosniff", "Content-Security-Policy": "sandbox"}
 
 
 def normalize_avatar(value: str | None) -> str | None:
@@ -36,20 +43,15 @@ def get_me(db: Session = Depends(get_db)):  # current_user: User = Depends(get_c
     if not current_user:
         raise HTTPException(status_code=404, detail="No users in database")
     
-    total_solves = db.query(func.count(Solve.id)).filter(
-        Solve.user_id == current_user.id,
-        Solve.completed == True
-    ).scalar()
-    
     return {
         "id": str(current_user.id),
         "login": current_user.login,
         "email": current_user.email,
         "nick": current_user.nick,
-        "avatar_url": current_user.avatar,
+        "avatar_url": avatar_url(current_user),
         "created_at": current_user.created_at,
         "last_login": current_user.last_login,
-        "total_solves": total_solves or 0
+        "total_solves": current_user.total_solves or 0
     }
 
 
@@ -67,43 +69,77 @@ def update_me(
     if payload.nick is not None:
         current_user.nick = payload.nick
     if payload.avatar_url is not None:
-        current_user.avatar = normalize_avatar(payload.avatar_url)
+        set_avatar(current_user, normalize_avatar(payload.avatar_url))
     
     db.commit()
     db.refresh(current_user)
-
-    total_solves = db.query(func.count(Solve.id)).filter(
-        Solve.user_id == current_user.id,
-        Solve.completed == True
-    ).scalar()
+    # cached sessions carry the nick
+    invalidate_user_sessions(current_user.id)
 
     return {
         "id": str(current_user.id),
         "login": current_user.login,
         "email": current_user.email,
         "nick": current_user.nick,
-        "avatar_url": current_user.avatar,
+        "avatar_url": avatar_url(current_user),
         "created_at": current_user.created_at,
         "last_login": current_user.last_login,
-        "total_solves": total_solves or 0
+        "total_solves": current_user.total_solves or 0
     }
 
 
 @router.get("/{user_id}", response_model=schemas.UserPublicProfile)
-def get_public_profile(user_id: str, db: Session = Depends(get_db)):
+async def get_public_profile(user_id: str, db: AsyncSession = Depends(get_async_db)):
     """Zwraca publiczny profil uzytkownika (nick, avatar, podstawowe staty)."""
-    user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(
+        select(User.id, User.login, User.nick, User.avatar_hash, User.total_solves)
+        .where(User.id == user_id)
+    )
+    user = result.first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    total_solves = db.query(func.count(Solve.id)).filter(
-        Solve.user_id == user.id,
-        Solve.completed == True
-    ).scalar()
-    
     return {
         "id": str(user.id),
         "nick": user.nick,
-        "avatar_url": user.avatar,
-        "total_solves": total_solves or 0
+        "avatar_url": avatar_url(user),
+        "total_solves": user.total_solves or 0
     }
+
+
+@router.get("/avatars/initials/{initials}.svg")
+def get_initials_avatar(initials: str, request: Request):
+    """Zwraca wspolny avatar SVG z inicjalami (dla uzytkownikow bez wlasnego avatara)."""
+    if not initials or initials != initials_for(initials):
+        raise HTTPException(status_code=404, detail="Avatar not found")
+
+    data = initials_svg(initials)
+    etag = f'"{hashlib.sha256(data).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": AVATAR_VERSIONED_CACHE_CONTROL}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type="image/svg+xml", headers=headers)
+
+
+@router.get("/{user_id}/avatar")
+def get_avatar(user_id: str, request: Request, v: str | None = None, db: Session = Depends(get_db)):
+    """Zwraca obrazek avatara uzytkownika (ETag + Cache-Control, 304 gdy niezmieniony)."""
+    # UserAvatar.data is deferred - this only loads content type and etag
+    avatar = db.query(UserAvatar).filter(UserAvatar.user_id == user_id).first()
+    if not avatar:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(status_code=404, detail="Avatar not found")
+        return RedirectResponse(avatar_url(user), status_code=307)
+
+    etag = f'"{avatar.etag}"'
+    # ?v= is the version from avatar_url() - a matching URL never changes content
+    cache_control = AVATAR_VERSIONED_CACHE_CONTROL if v == avatar.etag[:16] else AVATAR_CACHE_CONTROL
+    headers = {"ETag": etag, "Cache-Control": cache_control, **AVATAR_SECURITY_HEADERS}
+
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    # rows stored before the raster-only check may carry any client-sent type
+    media_type = avatar.content_type if avatar.content_type in AVATAR_CONTENT_TYPES else "application/octet-stream"
+    return Response(content=avatar.data, media_type=media_type, headers=headers)
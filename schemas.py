@@ -47,7 +47,7 @@ class ChangePasswordResponse(BaseModel):
 class UserPublic(BaseModel):
     id: UUID | str
     nick: str | None = None
-    avatar_url: str | None = Field(default=None, alias="avatar")  # Base64 image data
+    avatar_url: str | None = Field(default=None, alias="avatar")  # URL of GET /users/{id}/avatar
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
@@ -57,7 +57,7 @@ class UserProfile(BaseModel):
     login: str
     email: str
     nick: str | None = None
-    avatar_url: str | None = Field(default=None, alias="avatar")  # Base64 image data
+    avatar_url: str | None = Field(default=None, alias="avatar")  # URL of GET /users/{id}/avatar
     created_at: datetime | None = None
     last_login: datetime | None = None
     total_solves: int = 0
@@ -68,9 +68,11 @@ class UserProfile(BaseModel):
 class UserPublicProfile(BaseModel):
     id: UUID | str
     nick: str | None = None
-    avatar_url: str | None = Field(default=None, alias="avatar")  # Base64 image data
+    avatar_url: str | None = Field(default=None, alias="avatar")  # URL of GET /users/{id}/avatar
     total_solves: int = 0
 
+    model_config = ConfigDict(populate_by_name=True)
+
 
 class UserUpdate(BaseModel):
     nick: str | None = None
@@ -186,6 +188,12 @@ class StoryPuzzleAssign(BaseModel):
     order_index: int
 
 
+class ProfilingUpdate(BaseModel):
+    sample_every: int | None = None
+    count: int | None = None
+    path_prefix: str | None = None
+
+
 class DailyRankingRow(BaseModel):
     user_id: UUID
     rank: int
@@ -0,0 +1,142 @@
+"""
+Database engine settings.
+
+Read from the environment (and .env) by pydantic-settings. APP_ENV selects a
+preset (development | test | production); any DB_* variable overrides the
+single value from the preset, e.g.
+
+    APP_ENV=production DB_POOL_SIZE=40 DB_ECHO=1
+
+For SQLite (DATABASE_URL=sqlite:///binarygame.db, see bootstrap_sqlite.py)
+the DB_SQLITE_* values set the per-connection pragmas.
+
+SQL echo is off in every preset - it logs each statement and its parameters
+synchronously, which is only useful when debugging locally (DB_ECHO=1).
+
+LlamaSettings (LLAMA_* variables) configure the llama.cpp model of
+ai_backends.LlamaCppBackend; unset values are tuned to the host at load.
+"""
+from typing import Literal
+
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+DEFAULT_DATABASE_URL = r"mssql+pyodbc://@(localdb)\MSSQLLocalDB/BinaryGame?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes"
+
+ASYNC_DRIVERS = {
+    "mssql+pyodbc": "mssql+aioodbc",
+    "mssql": "mssql+aioodbc",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+ENGINE_PRESETS = {
+    "development": {
+        "pool_size": 5,
+        "max_overflow": 5,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "statement_timeout_seconds": 60,
+    },
+    "test": {
+        "pool_size": 2,
+        "max_overflow": 0,
+        "pool_timeout": 5,
+        "pool_recycle": -1,
+        "statement_timeout_seconds": 10,
+    },
+    "production": {
+        # sync endpoints run on anyio's threadpool (40 threads by default)
+        "pool_size": 20,
+        "max_overflow": 20,
+        "pool_timeout": 10,
+        # below the server/firewall idle timeout, so pooled connections are
+        # replaced before they are silently dropped
+        "pool_recycle": 1800,
+        "statement_timeout_seconds": 15,
+    },
+}
+
+
+class DatabaseSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="DB_", env_file=".env", extra="ignore")
+
+    app_env: Literal["development", "test", "production"] = Field(
+        "development", validation_alias="APP_ENV"
+    )
+    url: str = Field(DEFAULT_DATABASE_URL, validation_alias="DATABASE_URL")
+    # async driver URL for get_async_db; derived from url when not set
+    async_url: str | None = Field(None, validation_alias="ASYNC_DATABASE_URL")
+
+    echo: bool = False
+    pool_pre_ping: bool = True
+    pool_size: int | None = None
+    max_overflow: int | None = None
+    pool_timeout: float | None = None
+    pool_recycle: int | None = None
+    # 0 disables; applied per connection (pyodbc query timeout)
+    statement_timeout_seconds: int | None = None
+    # pyodbc only: send executemany() parameter batches in one round trip
+    fast_executemany: bool = True
+
+    # SQLite only, applied to every new connection (see db.apply_sqlite_pragmas)
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+
+    @model_validator(mode="after")
+    def apply_preset(self):
+        for name, value in ENGINE_PRESETS[self.app_env].items():
+            if getattr(self, name) is None:
+                setattr(self, name, value)
+        return self
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith("sqlite")
+
+    @property
+    def is_sqlite_memory(self) -> bool:
+        database = self.url.split("///", 1)[1] if "///" in self.url else ""
+        return self.is_sqlite and (database in ("", ":memory:") or "mode=memory" in self.url)
+
+    @property
+    def is_pyodbc(self) -> bool:
+        return self.url.startswith("mssql+pyodbc")
+
+    @property
+    def effective_async_url(self) -> str:
+        if self.async_url:
+            return self.async_url
+        for sync_driver, async_driver in ASYNC_DRIVERS.items():
+            if self.url.startswith(sync_driver + ":"):
+                return async_driver + self.url[len(sync_driver):]
+        raise ValueError(f"No async driver known for {self.url.split(':', 1)[0]}, set ASYNC_DATABASE_URL")
+
+
+def get_database_settings() -> DatabaseSettings:
+    return DatabaseSettings()
+
+
+class LlamaSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="LLAMA_", env_file=".env", extra="ignore")
+
+    # None: auto - physical cores for generation, all usable cores for prompt processing
+    n_threads: int | None = None
+    n_threads_batch: int | None = None
+    # None: auto - the longest prompt the app sends (in the chat template) plus its
+    # max_tokens and some headroom, rounded up
+    n_ctx: int | None = None
+    n_ctx_step: int = 256
+    n_batch: int = 512
+    n_gpu_layers: int = 0
+    # map the GGUF file instead of reading it (pages shared between processes);
+    # mlock keeps it resident, needs a high enough RLIMIT_MEMLOCK
+    use_mmap: bool = True
+    use_mlock: bool = False
+
+
+def get_llama_settings() -> LlamaSettings:
+    return LlamaSettings()
@@ -0,0 +1,97 @@
+"""
+Deterministic replies and the llama-compatible response shape of
+ai_backends.StubBackend, and the host-tuned llama.cpp options.
+
+Run: python -m pytest -q test_ai_backends.py
+"""
+import json
+import os
+import sys
+import threading
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from ai_backends import CHAT_TEMPLATE_HEADROOM_TOKENS, StubBackend, context_size, cpu_topology, llama_options
+from ai_model import AI_PROMPT_MAX_BOARD, error_feedback_prompt, worst_case_prompts
+from settings import LlamaSettings
+
+PROMPT = "Possible next moves:\n- Row 2, Column 3: Put 1 (gap between two 0s)\n"
+
+
+def test_stub_reply_is_deterministic():
+    backend = StubBackend(first_token_ms=0, tokens_per_second=0)
+    messages = [{"role": "user", "content": PROMPT}]
+
+    first = backend.create_chat_completion(messages, max_tokens=100)
+    second = backend.create_chat_completion(messages, max_tokens=100)
+
+    text = first["choices"][0]["message"]["content"]
+    assert text == second["choices"][0]["message"]["content"]
+    assert "Row 2, Column 3: Put 1" in text
+    assert first["usage"]["completion_tokens"] == backend.reply_tokens
+
+
+def test_stub_stream_matches_reply_and_respects_max_tokens():
+    backend = StubBackend(first_token_ms=0, tokens_per_second=0)
+    messages = [{"role": "user", "content": PROMPT}]
+
+    chunks = list(backend.create_chat_completion(messages, max_tokens=5, stream=True))
+    streamed = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+    assert streamed == backend.create_chat_completion(messages, max_tokens=5)["choices"][0]["message"]["content"]
+    assert len(streamed.split()) == 5
+
+
+def test_queue_wait_is_measured_at_the_model_slot():
+    backend = StubBackend(first_token_ms=100, tokens_per_second=0, concurrency=1)
+    messages = [{"role": "user", "content": PROMPT}]
+    waits = []
+
+    calls = [threading.Thread(target=backend.create_chat_completion, args=(messages,),
+                              kwargs={"max_tokens": 3, "queue_wait": waits.append}) for _ in range(2)]
+    for call in calls:
+        call.start()
+    for call in calls:
+        call.join()
+
+    # the second call waited for the first one's generation
+    assert min(waits) < 0.05
+    assert max(waits) >= 0.08
+
+
+def test_context_size_fits_the_longest_prompt_and_reply():
+    prompts = worst_case_prompts()
+    count_words = lambda text: len(text.split())
+
+    n_ctx = context_size(prompts, count_words, step=256)
+
+    needed = [count_words(prompt) + max_tokens + CHAT_TEMPLATE_HEADROOM_TOKENS for prompt, max_tokens in prompts]
+    assert n_ctx % 256 == 0
+    assert max(needed) <= n_ctx < max(needed) + 256
+
+
+def test_client_errors_cannot_outgrow_the_worst_case_prompt():
+    size = AI_PROMPT_MAX_BOARD
+    grid = json.dumps([[None] * size for _ in range(size)])
+    errors = [{"row": 1, "col": "A", "error_type": "ż" * 10_000}, "x " * 10_000] * 100
+
+    prompt = error_feedback_prompt(grid, errors)
+    worst_prompt, _ = worst_case_prompts()[1]
+
+    assert len(prompt) <= len(worst_prompt)
+    assert prompt.isascii()
+
+
+def test_llama_options_tune_only_unset_values():
+    physical, logical = cpu_topology()
+
+    options = llama_options("unused.gguf", LlamaSettings(n_ctx=384, n_threads_batch=3, use_mlock=True))
+
+    assert 1 <= physical <= logical
+    assert options["n_threads"] == physical
+    assert options["n_threads_batch"] == 3
+    assert (options["n_ctx"], options["n_batch"]) == (384, 384)
+    assert options["use_mmap"] and options["use_mlock"]
@@ -0,0 +1,84 @@
+"""
+Token buckets of ai_rate_limit: per-user and global refusals, refill over
+time, and the SQLite file shared between processes.
+
+Run: python -m pytest -q test_ai_rate_limit.py
+"""
+import os
+import sqlite3
+import sys
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from ai_rate_limit import FileRateLimiter, MemoryRateLimiter, NullRateLimiter
+
+LIMITS = {"user_rate_per_minute": 60, "user_burst": 2, "global_rate_per_minute": 600, "global_burst": 3}
+
+
+def drain(limiter, key, now):
+    return [limiter._take([(f"user:{key}", 1.0, 2), ("global", 10.0, 3)], now) for _ in range(3)]
+
+
+def check_buckets(limiter):
+    # burst of 2 for one user, then refused by the user bucket
+    assert drain(limiter, "alice", now=100.0) == [None, None, "user"]
+    # the global bucket had 3: bob gets the last token, then global refuses him
+    assert drain(limiter, "bob", now=100.0) == [None, "global", "global"]
+    # a global refusal must not have cost bob a user token: after the global
+    # bucket refills (0.1 s at 10/s) he still has his second one
+    assert limiter._take([("user:bob", 1.0, 2), ("global", 10.0, 3)], 100.2) is None
+    assert limiter._take([("user:alice", 1.0, 2), ("global", 10.0, 3)], 100.2) == "user"
+    # one second refills one user token
+    assert limiter._take([("user:alice", 1.0, 2), ("global", 10.0, 3)], 101.1) is None
+
+
+def test_memory_buckets():
+    check_buckets(MemoryRateLimiter(**LIMITS))
+
+
+def test_file_buckets(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    check_buckets(FileRateLimiter(path=path, **LIMITS))
+    # another process opening the same file sees the drained buckets
+    other = FileRateLimiter(path=path, **LIMITS)
+    assert other._take([("user:alice", 1.0, 2), ("global", 10.0, 3)], 101.1) == "user"
+
+
+def test_memory_evicts_least_recent_keys():
+    limiter = MemoryRateLimiter(max_keys=3, **LIMITS)
+    for user in ("a", "b", "c"):
+        limiter.acquire(f"user:{user}")
+    # user:a, user:b, user:c, global: the oldest one is evicted
+    assert limiter.info()["keys"] == 3
+    assert "user:a" not in limiter._buckets and "user:c" in limiter._buckets
+
+
+def test_acquire_counts_decisions():
+    limiter = MemoryRateLimiter(**{**LIMITS, "global_burst": 10})
+    results = [limiter.acquire("user:alice") for _ in range(3)]
+    assert results == [None, None, "user"]
+    info = limiter.info()
+    assert (info["allowed"], info["throttled_user"], info["throttled_global"]) == (2, 1, 0)
+    # the caller's key is the bucket name, not prefixed again
+    assert set(limiter._buckets) == {"user:alice", "global"}
+
+    off = NullRateLimiter(**LIMITS)
+    assert all(off.acquire("user:alice") is None for _ in range(10))
+
+
+def test_file_locked_by_another_process_throttles(tmp_path):
+    path = str(tmp_path / "limits.sqlite3")
+    limiter = FileRateLimiter(path=path, lock_timeout=0.05, **LIMITS)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        # answered (as throttled), not raised as "database is locked"
+        assert limiter.acquire("user:alice") == "global"
+        info = limiter.info()
+        assert (info["store_errors"], info["throttled_global"], info["allowed"]) == (1, 1, 0)
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+    assert limiter.acquire("user:alice") is None
@@ -0,0 +1,78 @@
+"""
+The inference service (ai_service.py) on the stub backend, reached through
+ai_backends.RemoteBackend, and the client's circuit breaker.
+
+Run: python -m pytest -q test_ai_service.py
+"""
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+import ai_service
+from ai_backends import CircuitBreaker, RemoteBackend, StubBackend
+
+MESSAGES = [{"role": "user", "content": "Possible next moves:\n- Row 1, Column A: Put 0 (gap)\n"}]
+
+
+def test_remote_backend_returns_the_service_reply(monkeypatch):
+    monkeypatch.setattr(ai_service, "service", ai_service.InferenceService(backend_name="stub"))
+    with TestClient(ai_service.app) as client:
+        assert ai_service.service.loaded.wait(5)
+        backend = RemoteBackend(client=client)
+        assert backend.health()["status"] == "ok"
+        waits = []
+        response = backend.create_chat_completion(MESSAGES, max_tokens=8, queue_wait=waits.append)
+
+    expected = StubBackend(first_token_ms=0, tokens_per_second=0).create_chat_completion(MESSAGES, max_tokens=8)
+    assert response["choices"][0]["message"]["content"] == expected["choices"][0]["message"]["content"]
+    assert backend.info()["circuit_state"] == "closed"
+    assert len(waits) == 1 and waits[0] >= 0
+
+
+def test_circuit_opens_after_consecutive_failures_and_fails_fast():
+    # nothing listens on port 9 (discard)
+    backend = RemoteBackend(url="http://127.0.0.1:9", breaker=CircuitBreaker(threshold=2, retry_seconds=60))
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="AI service:"):
+            backend.create_chat_completion(MESSAGES)
+    with pytest.raises(RuntimeError, match="circuit open"):
+        backend.create_chat_completion(MESSAGES)
+
+    info = backend.info()
+    assert info["circuit_state"] == "open"
+    assert (info["requests"], info["failures"], info["rejected"]) == (2, 2, 1)
+
+
+def test_healthy_probe_closes_the_circuit_even_when_the_service_is_busy(monkeypatch):
+    service = ai_service.InferenceService(backend_name="stub", max_pending=0)
+    monkeypatch.setattr(ai_service, "service", service)
+    breaker = CircuitBreaker(threshold=1, retry_seconds=0)
+    breaker.record_failure()
+    with TestClient(ai_service.app) as client:
+        assert service.loaded.wait(5)
+        service._slots.acquire()  # every slot taken: the POST gets 503 "busy"
+        backend = RemoteBackend(client=client, breaker=breaker)
+        with pytest.raises(RuntimeError, match="busy"):
+            backend.create_chat_completion(MESSAGES)
+
+    assert backend.info()["circuit_state"] == "closed"
+
+
+def test_health_is_503_until_the_model_is_loaded(monkeypatch):
+    service = ai_service.InferenceService(backend_name="stub")
+    monkeypatch.setattr(ai_service, "service", service)
+    # not loaded yet: the startup hook is not run outside `with TestClient`
+    client = TestClient(ai_service.app)
+    response = client.get("/health")
+    assert response.status_code == 503
+    assert response.json()["detail"]["status"] == "loading"
+
+    service.load()
+    assert client.get("/health").json()["status"] == "ok"
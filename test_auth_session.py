@@ -0,0 +1,61 @@
+"""
+auth.security dependencies: get_current_session (cached session) and
+get_current_user (the ORM user, for routes that read or change it).
+
+Run: python -m pytest -q test_auth_session.py
+"""
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+# db.py builds its engine at import time; keep it off SQL Server / pyodbc.
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from db import Base
+from models import User
+from auth import session_cache
+from auth.security import create_session, get_current_session, get_current_user
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session_cache.configure_session_cache("memory")
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_current_user_is_the_orm_user_and_session_is_cached(db):
+    user = User(login="alice", email="alice@example.com", password_hash="x", nick="Alice")
+    db.add(user)
+    db.commit()
+    token = create_session(db, user)
+
+    current = get_current_session(token, db)
+    assert (current.user_id, current.login, current.nick) == (str(user.id), "alice", "Alice")
+    assert session_cache.get_session_cache().info()["misses"] == 1
+
+    orm_user = get_current_user(token, db)
+    assert isinstance(orm_user, User)
+    assert orm_user.email == "alice@example.com"
+    assert session_cache.get_session_cache().info()["hits"] == 1
+
+
+def test_unknown_token_is_rejected(db):
+    with pytest.raises(HTTPException) as error:
+        get_current_user("not-a-token", db)
+    assert error.value.status_code == 401
@@ -0,0 +1,129 @@
+"""
+Initials avatars: every URL avatar_url() hands out for a user without an
+upload must be served by GET /users/avatars/initials/{initials}.svg.
+Uploads: raster types only, served so the browser never renders them as a
+document.
+
+Run: python -m pytest -q test_avatars.py
+"""
+import base64
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+# db.py builds its engine at import time; keep it off SQL Server / pyodbc.
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import avatars
+from avatars import avatar_url, decode_data_url, initials_for, set_avatar
+from db import Base, get_db
+from models.models import User, UserAvatar
+from routers import users
+
+PNG = base64.b64encode(b"\x89PNG\r\n\x1a\n").decode()
+
+
+@pytest.fixture()
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(avatars, "AVATAR_CACHE_DIR", str(tmp_path))
+    avatars.initials_svg.cache_clear()
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("nick, initials", [
+    ("a/b", "AB"),
+    ("/etc", "ET"),
+    ("x.y", "XY"),
+    ("  zo ", "ZO"),
+    ("Łukasz", "UK"),
+    ("ßx", "SS"),
+    ("Żółw", "W"),
+    ("Ωμέγα", "BG"),
+    ("?!", "BG"),
+])
+def test_initials_avatar_url_is_served(client, nick, initials):
+    user = SimpleNamespace(id="u1", nick=nick, login="login", avatar_hash=None)
+
+    assert initials_for(nick) == initials
+    response = client.get(avatar_url(user))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("image/svg+xml")
+    assert f">{initials}</text>" in response.text
+
+
+@pytest.mark.parametrize("initials", ["ŁU", "ab", "%CE%A9%CE%A9", "ABC"])
+def test_only_normalized_initials_are_rendered(client, tmp_path, initials):
+    response = client.get(f"/users/avatars/initials/{initials}.svg")
+
+    assert response.status_code == 404
+    assert os.listdir(tmp_path) == []
+
+
+def test_initials_avatar_is_not_modified_for_its_etag(client):
+    first = client.get("/users/avatars/initials/AB.svg")
+    second = client.get("/users/avatars/initials/AB.svg", headers={"If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+@pytest.mark.parametrize("content_type", [
+    "image/svg+xml",
+    "image/html",
+    "image/" + "x" * 60,
+])
+def test_only_raster_uploads_are_accepted(content_type):
+    with pytest.raises(HTTPException) as error:
+        decode_data_url(f"data:{content_type};base64,{PNG}")
+
+    assert error.value.status_code == 400
+
+
+def test_uploaded_avatar_is_not_rendered_as_a_document():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(login="alice", email="alice@example.com", password_hash="x", nick="alice")
+    set_avatar(user, f"data:image/PNG;base64,{PNG}")
+    db.add(user)
+    db.commit()
+    assert user.avatar_image.content_type == "image/png"
+    # a row stored before the check, with a client-chosen type
+    svg_user = User(login="bob", email="bob@example.com", password_hash="x", nick="bob")
+    db.add(svg_user)
+    db.flush()
+    db.add(UserAvatar(user_id=svg_user.id, content_type="image/svg+xml", data=b"<svg/>", etag="e" * 64))
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+    try:
+        png = client.get(f"/users/{user.id}/avatar")
+        svg = client.get(f"/users/{svg_user.id}/avatar")
+        cached = client.get(f"/users/{user.id}/avatar", headers={"If-None-Match": png.headers["etag"]})
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert png.headers["content-type"] == "image/png"
+    assert svg.headers["content-type"] == "application/octet-stream"
+    assert cached.status_code == 304
+    for response in (png, svg, cached):
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert response.headers["content-security-policy"] == "sandbox"
@@ -0,0 +1,137 @@
+"""
+Denormalized counters (counters.py): users.total_solves and ai_hint_counters
+kept in step with solves / ai_hints, and reconcile_counters() repairing drift.
+
+Run: python -m pytest -q test_counters.py
+"""
+import os
+import sys
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+# db.py builds its engine at import time; keep it off SQL Server / pyodbc.
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from db import Base
+from models.models import User, Puzzle, Solve, AiHint, AiHintCounter
+from counters import add_completed_solves, remove_puzzle_solves, increment_hints_used, reconcile_counters
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def add_user(db, name: str) -> User:
+    user = User(id=str(uuid.uuid4()), login=name, email=f"{name}@example.com", password_hash="x")
+    db.add(user)
+    return user
+
+
+def add_puzzle(db) -> Puzzle:
+    puzzle = Puzzle(id=str(uuid.uuid4()), type="daily", difficulty=3, size=4,
+                    grid_solution="0" * 16, grid_initial="." * 16, created_at=datetime.utcnow())
+    db.add(puzzle)
+    return puzzle
+
+
+def solve(db, user: User, puzzle: Puzzle, completed: bool = True) -> None:
+    db.add(Solve(user_id=user.id, puzzle_id=puzzle.id, time_seconds=60, completed=completed))
+    add_completed_solves(db, user.id, int(completed))
+
+
+def total_solves(db, user: User) -> int:
+    db.expire_all()
+    return db.get(User, user.id).total_solves
+
+
+def test_completed_solves_increment_and_decrement(db):
+    alice = add_user(db, "alice")
+    first, second = add_puzzle(db), add_puzzle(db)
+    db.flush()
+
+    solve(db, alice, first)
+    solve(db, alice, second, completed=False)
+    db.commit()
+    assert total_solves(db, alice) == 1
+
+    # the second solve gets completed later; a no-op delta changes nothing
+    add_completed_solves(db, alice.id, 1)
+    add_completed_solves(db, alice.id, 0)
+    db.commit()
+    assert total_solves(db, alice) == 2
+
+    add_completed_solves(db, alice.id, -1)
+    db.commit()
+    assert total_solves(db, alice) == 1
+
+
+def test_removing_a_puzzle_decrements_each_solver_by_exactly_one(db):
+    alice, bob, carol = add_user(db, "alice"), add_user(db, "bob"), add_user(db, "carol")
+    deleted, kept = add_puzzle(db), add_puzzle(db)
+    db.flush()
+    solve(db, alice, deleted)
+    solve(db, alice, kept)
+    solve(db, bob, deleted)
+    solve(db, carol, deleted, completed=False)
+    solve(db, carol, kept)
+    db.commit()
+
+    remove_puzzle_solves(db, deleted.id)
+    db.delete(db.get(Puzzle, deleted.id))
+    db.commit()
+
+    assert [total_solves(db, user) for user in (alice, bob, carol)] == [1, 0, 1]
+    # the counters agree with what is left in solves
+    assert reconcile_counters(db)["users_fixed"] == 0
+
+
+def test_hint_counter_starts_at_one_and_increments(db):
+    alice = add_user(db, "alice")
+    puzzle = add_puzzle(db)
+    db.flush()
+
+    assert [increment_hints_used(db, alice.id, puzzle.id) for _ in range(3)] == [1, 2, 3]
+    db.commit()
+    assert db.query(AiHintCounter).one().hints_used == 3
+
+
+def test_reconcile_repairs_drifted_counters(db):
+    alice, bob = add_user(db, "alice"), add_user(db, "bob")
+    puzzle, other = add_puzzle(db), add_puzzle(db)
+    db.flush()
+    db.add(Solve(user_id=alice.id, puzzle_id=puzzle.id, completed=True))
+    db.add(Solve(user_id=alice.id, puzzle_id=other.id, completed=True))
+    bob.total_solves = 5
+    db.add_all([AiHint(user_id=alice.id, puzzle_id=puzzle.id, hint_text="h") for _ in range(2)])
+    db.add(AiHint(user_id=bob.id, puzzle_id=puzzle.id, hint_text="h"))
+    # wrong count, no hints behind it, and bob's counter missing
+    db.add(AiHintCounter(user_id=alice.id, puzzle_id=puzzle.id, hints_used=7))
+    db.add(AiHintCounter(user_id=alice.id, puzzle_id=other.id, hints_used=1))
+    db.commit()
+
+    report = reconcile_counters(db)
+
+    assert report == {"users_fixed": 2, "hint_counters_fixed": 1,
+                      "hint_counters_created": 1, "hint_counters_deleted": 1}
+    assert (total_solves(db, alice), total_solves(db, bob)) == (2, 0)
+    counters = {(str(c.user_id), str(c.puzzle_id)): c.hints_used for c in db.query(AiHintCounter)}
+    assert counters == {(str(alice.id), str(puzzle.id)): 2, (str(bob.id), str(puzzle.id)): 1}
+    # a second run finds nothing to fix
+    assert set(reconcile_counters(db).values()) == {0}
@@ -0,0 +1,131 @@
+"""
+Conditional GETs (http_cache.py) on the daily puzzle and daily ranking routes:
+a strong ETag and Cache-Control on the first response, 304 without a body
+when If-None-Match carries that ETag.
+
+Run: python -m pytest -q test_http_cache.py
+"""
+import os
+import sys
+import uuid
+from datetime import datetime, date, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+# db.py builds its engine at import time; keep it off SQL Server / pyodbc.
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import schemas
+from db import Base, get_db
+from http_cache import IMMUTABLE
+from models.models import User, Puzzle, DailyPuzzle, Solve
+from puzzle_cache import puzzle_cache, daily_key
+from routers import puzzles, rankings
+
+PAST = date(2020, 1, 1)
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture()
+def client(db):
+    app = FastAPI()
+    app.include_router(puzzles.router, prefix="/puzzles")
+    app.include_router(rankings.router, prefix="/rankings")
+    app.dependency_overrides[get_db] = lambda: db
+    return TestClient(app)
+
+
+def add_daily(db, day: date) -> Puzzle:
+    puzzle = Puzzle(id=str(uuid.uuid4()), type="daily", difficulty=3, size=4,
+                    grid_solution="0" * 16, grid_initial="." * 16, created_at=datetime(2019, 12, 31))
+    db.add(puzzle)
+    db.add(DailyPuzzle(date=day, puzzle_id=puzzle.id))
+    db.commit()
+    return puzzle
+
+
+@pytest.fixture()
+def past_daily(db):
+    puzzle = add_daily(db, PAST)
+    # the daily routes read through puzzle_cache (the async DB is not this one)
+    puzzle_cache.invalidate(daily_key(PAST))
+    puzzle_cache.get_or_load(daily_key(PAST), lambda: schemas.PuzzlePublic.model_validate(puzzle))
+    yield puzzle
+    puzzle_cache.invalidate(daily_key(PAST))
+
+
+def test_daily_puzzle_is_304_for_its_etag(client, past_daily):
+    first = client.get(f"/puzzles/daily/{PAST.isoformat()}")
+    assert first.status_code == 200
+    assert first.json()["id"] == str(past_daily.id)
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    assert first.headers["cache-control"] == f"public, max-age={puzzles.PUZZLE_MAX_AGE}"
+
+    second = client.get(f"/puzzles/daily/{PAST.isoformat()}", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+    # weak comparison, and a list of tags
+    weak = client.get(f"/puzzles/daily/{PAST.isoformat()}", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert weak.status_code == 304
+
+    stale = client.get(f"/puzzles/daily/{PAST.isoformat()}", headers={"If-None-Match": '"other"'})
+    assert stale.status_code == 200
+    assert stale.headers["etag"] == etag
+
+
+def test_daily_ranking_etag_follows_the_rows(client, db):
+    puzzle = add_daily(db, PAST)
+    user = User(id=str(uuid.uuid4()), login="alice", email="alice@example.com", password_hash="x", nick="Alice")
+    db.add(user)
+    db.add(Solve(user_id=user.id, puzzle_id=puzzle.id, time_seconds=90, mistakes=1, completed=True))
+    db.commit()
+
+    first = client.get(f"/rankings/daily/{PAST.isoformat()}")
+    assert first.status_code == 200
+    assert [row["user_nick"] for row in first.json()] == ["Alice"]
+    # rankings older than yesterday do not change any more
+    assert first.headers["cache-control"] == IMMUTABLE
+
+    etag = first.headers["etag"]
+    assert client.get(f"/rankings/daily/{PAST.isoformat()}", headers={"If-None-Match": etag}).status_code == 304
+
+    user.nick = "Alicja"
+    db.commit()
+    changed = client.get(f"/rankings/daily/{PAST.isoformat()}", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_todays_ranking_gets_a_short_max_age(client, db):
+    today = datetime.utcnow().date()
+    add_daily(db, today)
+
+    response = client.get(f"/rankings/daily/{today.isoformat()}")
+
+    max_age = int(response.headers["cache-control"].removeprefix("public, max-age="))
+    assert 0 <= max_age <= rankings.RANKING_TODAY_MAX_AGE
+    yesterday = client.get(f"/rankings/daily/{(today - timedelta(days=1)).isoformat()}")
+    assert yesterday.headers["cache-control"] == f"public, max-age={rankings.RANKING_TODAY_MAX_AGE * 10}"
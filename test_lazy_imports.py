@@ -0,0 +1,36 @@
+"""
+What importing the app pulls in: no AI modules with AI_ROUTES_ENABLED=0, no
+fastapi in the password-hashing pool processes, no llama_cpp anywhere.
+
+Run: python -m pytest -q test_lazy_imports.py
+"""
+import json
+import os
+import subprocess
+import sys
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def loaded_modules(module: str, tmp_path, **env) -> set[str]:
+    code = f"import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))"
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'lazy.db'}", **env}
+    result = subprocess.run([sys.executable, "-c", code], cwd=CURRENT_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return set(json.loads(result.stdout.splitlines()[-1]))
+
+
+def test_ai_routes_can_be_left_out(tmp_path):
+    with_ai = loaded_modules("main", tmp_path)
+    without_ai = loaded_modules("main", tmp_path, AI_ROUTES_ENABLED="0")
+
+    assert {"routers.ai", "ai_model", "ai_backends"} <= with_ai
+    assert not {"routers.ai", "ai_model", "ai_backends"} & without_ai
+    assert "llama_cpp" not in with_ai
+
+
+def test_hash_worker_does_not_import_fastapi(tmp_path):
+    modules = loaded_modules("auth.hashing", tmp_path)
+
+    assert "passlib" in modules
+    assert "fastapi" not in modules
@@ -0,0 +1,60 @@
+"""
+Prometheus text output of metrics.Registry and the per-request statement count
+of MetricsMiddleware.
+
+Run: python -m pytest -q test_metrics.py
+"""
+import os
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import StaticPool
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from metrics import Registry, MetricsMiddleware, count_statement, registry
+
+
+def test_histogram_exposition_is_cumulative():
+    reg = Registry()
+    latency = reg.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, route='/a"b')
+    reg.register_collector("cache", lambda: {"hits": 3, "enabled": True, "backend": "memory"})
+
+    lines = reg.expose().splitlines()
+
+    assert 'latency_seconds_bucket{route="/a\\"b",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a\\"b",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{route="/a\\"b",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{route="/a\\"b"} 4' in lines
+    assert "cache_hits 3" in lines
+    assert "cache_enabled 1" in lines
+    assert not any(line.startswith("cache_backend") for line in lines)
+
+
+def test_middleware_counts_statements_per_route():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    event.listen(engine, "before_cursor_execute", count_statement)
+
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            for _ in range(item_id):
+                conn.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    client = TestClient(app)
+    client.get("/items/3")
+    client.get("/items/2")
+
+    lines = registry.expose().splitlines()
+    assert 'http_request_db_statements_sum{method="GET",route="/items/{item_id}"} 5' in lines
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in lines
@@ -0,0 +1,54 @@
+"""
+Admission of auth.hashing.PasswordHasher: the cap that keeps queued hashes
+from taking over the sync endpoints' threadpool, and abandoned jobs that
+keep their slot until the pool process is done with them.
+
+Run: python -m pytest -q test_password_hashing.py
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from auth import hashing
+from auth.hashing import MAX_ADMITTED, PasswordHasher
+
+
+def test_admission_stays_far_below_the_threadpool():
+    hasher = PasswordHasher(workers=2, max_pending=32, mode="inline")
+    assert hasher.workers + hasher.max_pending == MAX_ADMITTED
+    assert MAX_ADMITTED <= 40 // 4
+
+
+def test_abandoned_job_keeps_its_slot_until_it_finishes(monkeypatch):
+    monkeypatch.setattr(hashing, "PASSWORD_HASH_TIMEOUT_SECONDS", 0.05)
+    hasher = PasswordHasher(workers=1, max_pending=0)
+    # stands in for the process pool: a job that is running and cannot be cancelled
+    hasher._executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+
+    def slow_job():
+        release.wait(5)
+        return "done", 0.0
+
+    with pytest.raises(HTTPException) as busy:
+        hasher._run(slow_job)
+    assert busy.value.status_code == 503
+    assert hasher.info()["abandoned"] == 1
+    # the pool is still busy with it, so a new job is rejected up front
+    with pytest.raises(HTTPException):
+        hasher._run(lambda: ("ok", 0.0))
+    assert hasher.info()["rejected"] == 1
+
+    release.set()
+    hasher._executor.shutdown(wait=True)
+    hasher._executor = ThreadPoolExecutor(max_workers=1)
+    assert hasher._run(lambda: ("ok", 0.0)) == "ok"
+    hasher._executor.shutdown(wait=True)
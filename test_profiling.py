@@ -0,0 +1,61 @@
+"""
+Request selection of profiling.Profiler and the speedscope output of
+profiling.RequestProfile.
+
+Run: python -m pytest -q test_profiling.py
+"""
+import os
+import sys
+import time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+from profiling import Profiler, RequestProfile
+
+
+def busy_loop(seconds: float) -> int:
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+    return n
+
+
+def test_profile_records_the_added_thread(tmp_path):
+    profile = RequestProfile(interval=0.001)
+    profile.add_thread()
+    profile.start()
+    busy_loop(0.1)
+    profile.stop()
+
+    profiler = Profiler(directory=str(tmp_path), keep=1)
+    profiler.save(profile, "a.speedscope.json", "test")
+    profiler.save(profile, "b.speedscope.json", "test")
+    doc = profile.to_speedscope("test")
+
+    names = {frame["name"] for frame in doc["shared"]["frames"]}
+    assert "busy_loop" in names
+    (thread_profile,) = doc["profiles"]
+    assert len(thread_profile["samples"]) == len(thread_profile["weights"]) > 0
+    # only the newest file is kept
+    assert [p["name"] for p in profiler.list_profiles()] == ["b.speedscope.json"]
+    assert profiler.path_of("../b.speedscope.json") is None
+
+
+def test_request_selection(tmp_path):
+    profiler = Profiler(directory=str(tmp_path), token="s3cret", sample_every=0)
+
+    assert not profiler.wants("/puzzles/daily/today", None)
+    assert not profiler.wants("/puzzles/daily/today", "wrong")
+    assert profiler.wants("/puzzles/daily/today", "s3cret")
+    assert not profiler.wants("/metrics", "s3cret")
+
+    profiler.configure(count=1, path_prefix="/ai")
+    assert not profiler.wants("/puzzles/daily/today", None)
+    assert profiler.wants("/ai/hint", None)
+    assert not profiler.wants("/ai/hint", None)
+
+    profiler.configure(sample_every=3)
+    assert [profiler.wants("/ai/hint", None) for _ in range(6)] == [False, False, True, False, False, True]
@@ -0,0 +1,124 @@
+"""
+Single-flight and invalidation behaviour of puzzle_cache.PuzzleCache.
+
+Run: python -m pytest -q test_puzzle_cache.py
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+# db.py builds its engine at import time; keep it off SQL Server / pyodbc.
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import puzzle_cache as puzzle_cache_module
+from db import Base
+from models.models import Puzzle
+from puzzle_cache import PuzzleCache, daily_key, puzzle_cache
+from routers import admin
+
+
+def test_concurrent_sync_misses_load_once():
+    cache = PuzzleCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        return "puzzle"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load(("daily", 1), loader)))
+        for _ in range(50)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == ["puzzle"] * 50
+
+
+def test_concurrent_async_misses_load_once():
+    cache = PuzzleCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "puzzle"
+
+    async def burst():
+        return await asyncio.gather(*(cache.aget_or_load(("daily", 1), loader) for _ in range(200)))
+
+    assert asyncio.run(burst()) == ["puzzle"] * 200
+    assert len(calls) == 1
+
+
+def test_invalidation_during_load_is_not_overwritten():
+    cache = PuzzleCache()
+
+    def stale_loader():
+        cache.invalidate(("story",))  # admin write lands while the load runs
+        return "stale"
+
+    assert cache.get_or_load(("story",), stale_loader) == "stale"
+    assert cache.get_or_load(("story",), lambda: "fresh") == "fresh"
+
+
+def test_prewarmed_daily_entry_survives_the_rollover(monkeypatch):
+    # pre-warmed 15 minutes before midnight with a 10 minute TTL
+    clock = {"now": datetime(2026, 3, 1, 23, 45), "monotonic": 1000.0}
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return clock["now"]
+
+    def advance(seconds):
+        clock["now"] += timedelta(seconds=seconds)
+        clock["monotonic"] += seconds
+
+    monkeypatch.setattr(puzzle_cache_module, "datetime", FakeDatetime)
+    monkeypatch.setattr(puzzle_cache_module, "time", SimpleNamespace(monotonic=lambda: clock["monotonic"]))
+    cache = PuzzleCache(ttl_seconds=600)
+    tomorrow = daily_key(date(2026, 3, 2))
+    cache.get_or_load(tomorrow, lambda: "tomorrow's puzzle")
+
+    advance(15 * 60 + 1)  # just after midnight
+    assert cache.get_or_load(tomorrow, lambda: "reloaded") == "tomorrow's puzzle"
+    advance(600)  # the usual TTL after the rollover
+    assert cache.get_or_load(tomorrow, lambda: "reloaded") == "reloaded"
+
+
+def test_deleting_a_puzzle_by_any_uuid_spelling_drops_its_cached_entries():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    puzzle = Puzzle(type="story", difficulty=1, size=4, grid_solution="0" * 16, grid_initial="." * 16,
+                    created_at=datetime.utcnow())
+    db.add(puzzle)
+    db.commit()
+    puzzle_cache.clear()
+    cached = SimpleNamespace(id=puzzle.id)
+    puzzle_cache.get_or_load(("story",), lambda: [cached])
+    try:
+        admin.delete_puzzle(puzzle_id=puzzle.id.hex.upper(), db=db)
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert puzzle_cache.get_or_load(("story",), lambda: []) == []
@@ -0,0 +1,117 @@
+"""
+Query-plan regression test for the hot query predicates used in routers/*.
+
+Builds the schema in an in-memory SQLite database and runs EXPLAIN QUERY PLAN
+for every hot query; each step touching a table has to go through an index
+instead of a full table scan.
+
+Run: python -m pytest -q test_query_plans.py
+"""
+import os
+import sys
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, func, and_
+from sqlalchemy.orm import sessionmaker
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+# db.py builds its engine at import time; keep it off SQL Server / pyodbc.
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from db import Base
+from models import User, Session as DbSession, StoryPuzzle, DailyPuzzle, Solve, AiHint
+
+
+USER_ID = "6f1c7a52-8d0e-4a52-9c1e-5d1b3f6b2a10"
+PUZZLE_ID = "0b7e2f4c-1a3d-4e5f-8a9b-c1d2e3f4a5b6"
+
+
+@pytest.fixture(scope="module")
+def db():
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def hot_queries(db):
+    """Same predicates as in routers/* (and auth.security)."""
+    now = datetime.utcnow()
+    return {
+        "auth.get_current_user": db.query(DbSession).filter(
+            DbSession.token_hash == "0" * 64,
+            DbSession.expires_at > now
+        ),
+        "auth.evict_oldest_sessions": db.query(DbSession.id, DbSession.token_hash).filter(
+            DbSession.user_id == USER_ID
+        ).order_by(DbSession.created_at.desc()).offset(10),
+        "session_reaper.delete_expired_batch": db.query(DbSession.id).filter(
+            DbSession.expires_at <= now
+        ).order_by(DbSession.expires_at).limit(500),
+        "users.total_solves": db.query(func.count(Solve.id)).filter(
+            Solve.user_id == USER_ID,
+            Solve.completed == True
+        ),
+        "puzzles.get_story_puzzles": db.query(StoryPuzzle).order_by(StoryPuzzle.order_index),
+        "admin.populate_story_mode": db.query(StoryPuzzle).filter(StoryPuzzle.order_index == 1),
+        "solves.submit_solve": db.query(Solve).filter(
+            Solve.user_id == USER_ID,
+            Solve.puzzle_id == PUZZLE_ID
+        ),
+        "solves.get_my_solves": db.query(Solve).filter(Solve.user_id == USER_ID),
+        "rankings.calculate_daily_ranking": db.query(Solve).filter(
+            and_(
+                Solve.puzzle_id == PUZZLE_ID,
+                Solve.completed == True
+            )
+        ),
+        "rankings.get_user_rankings": db.query(DailyPuzzle).filter(
+            DailyPuzzle.puzzle_id == PUZZLE_ID
+        ),
+        "calendar.get_daily_calendar": db.query(Solve).filter(
+            and_(
+                Solve.user_id == USER_ID,
+                Solve.puzzle_id == PUZZLE_ID,
+                Solve.completed == True
+            )
+        ),
+        "puzzles.get_daily_today": db.query(DailyPuzzle).filter(DailyPuzzle.date == date.today()),
+        "ai.hints_used": db.query(AiHint).filter(
+            AiHint.user_id == USER_ID,
+            AiHint.puzzle_id == PUZZLE_ID
+        ),
+        "auth.login": db.query(User).filter(User.login == "login"),
+    }
+
+
+HOT_QUERY_NAMES = sorted(hot_queries(sessionmaker()()))
+
+
+def explain(db, query) -> list[str]:
+    compiled = query.statement.compile(dialect=db.bind.dialect)
+    params = compiled.construct_params()
+    positional = tuple(params[name] for name in compiled.positiontup)
+    with db.bind.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", positional).all()
+    return [row[-1] for row in rows]
+
+
+def is_table_scan(step: str) -> bool:
+    return step.startswith("SCAN ") and " USING " not in step
+
+
+@pytest.mark.parametrize("name", HOT_QUERY_NAMES)
+def test_hot_query_uses_index(db, name):
+    plan = explain(db, hot_queries(db)[name])
+    assert plan, f"{name}: empty query plan"
+    scans = [step for step in plan if is_table_scan(step)]
+    assert not scans, f"{name}: table scan in plan {plan}"
+    assert any("USING" in step for step in plan), f"{name}: no index used in plan {plan}"
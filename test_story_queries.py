@@ -0,0 +1,107 @@
+"""
+Statement-count regression test for the story mode queries: the story list is
+one query and populate_story_mode a fixed number of statements, however many
+levels the story has.
+
+Run: python -m pytest -q test_story_queries.py
+"""
+import os
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.insert(0, CURRENT_DIR)
+
+# db.py builds its engine at import time; keep it off SQL Server / pyodbc.
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from db import Base, get_db
+from puzzle_cache import puzzle_cache
+from routers import admin, puzzles
+
+
+@pytest.fixture()
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture()
+def statements(engine):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+@pytest.fixture(autouse=True)
+def no_puzzle_cache(monkeypatch):
+    monkeypatch.setattr(puzzle_cache, "enabled", False)
+
+
+def story_levels(count):
+    return [admin.STORY_LEVELS[i % len(admin.STORY_LEVELS)] for i in range(count)]
+
+
+@pytest.mark.parametrize("levels", [6, 24])
+def test_story_list_is_one_query(monkeypatch, engine, db, statements, levels):
+    monkeypatch.setattr(admin, "STORY_LEVELS", story_levels(levels))
+    admin.populate_story_mode(db=db)
+
+    app = FastAPI()
+    app.include_router(puzzles.router)
+    app.dependency_overrides[get_db] = lambda: db
+    statements.clear()
+
+    response = TestClient(app).get("/story")
+
+    assert response.status_code == 200
+    assert len(response.json()) == levels
+    assert len(statements) == 1
+
+
+def populate_statements(monkeypatch, levels):
+    """Statements issued by a first (create) and a second (no-op) populate run."""
+    monkeypatch.setattr(admin, "STORY_LEVELS", story_levels(levels))
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    executed = []
+    event.listen(engine, "before_cursor_execute", lambda *args: executed.append(args[2]))
+    try:
+        counts = []
+        for expected in ("created", "skipped"):
+            executed.clear()
+            result = admin.populate_story_mode(db=db)
+            assert result[expected] == levels
+            counts.append(len(executed))
+        return counts
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_populate_statement_count_does_not_grow_with_levels(monkeypatch):
+    assert populate_statements(monkeypatch, 6) == populate_statements(monkeypatch, 24)